@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the time needed to build the completion popup model with a
+QStandardItemModel (one QStandardItem and one QIcon per completion) and with
+the CompletionListModel used by the CodeCompletionMode.
+
+"""
+import sys
+import timeit
+from pyqode.qt import QtCore, QtGui, QtWidgets
+from pyqode.core.modes.code_completion import CompletionListModel
+
+
+NB_ITEMS = 5000
+ICONS = [':/pyqode-icons/rc/edit-undo.png', ':/pyqode-icons/rc/edit-redo.png',
+         ['text-x-generic', ':/pyqode-icons/rc/text-x-generic.png']]
+
+
+def make_completions(nb_items):
+    return [{'name': 'completion_%d' % i, 'icon': ICONS[i % len(ICONS)]}
+            for i in range(nb_items)]
+
+
+def standard_item_model(completions):
+    model = QtGui.QStandardItemModel()
+    for completion in completions:
+        item = QtGui.QStandardItem()
+        item.setData(completion['name'], QtCore.Qt.DisplayRole)
+        icon = completion['icon']
+        if isinstance(icon, list):
+            icon = QtGui.QIcon.fromTheme(icon[0], QtGui.QIcon(icon[1]))
+        else:
+            icon = QtGui.QIcon(icon)
+        item.setData(icon, QtCore.Qt.DecorationRole)
+        model.appendRow(item)
+    return model
+
+
+def main():
+    app = QtWidgets.QApplication(sys.argv)
+    completions = make_completions(NB_ITEMS)
+    model = CompletionListModel()
+    repeat = 20
+
+    elapsed = timeit.timeit(lambda: standard_item_model(completions),
+                            number=repeat) / repeat
+    print('QStandardItemModel:  %8.3f ms' % (elapsed * 1000))
+
+    def reset():
+        model.set_completions(completions)
+        # simulate the view asking for the icons of a popup page
+        for row in range(20):
+            model.data(model.index(row), QtCore.Qt.DecorationRole)
+
+    elapsed = timeit.timeit(reset, number=repeat) / repeat
+    print('CompletionListModel: %8.3f ms' % (elapsed * 1000))
+    del app
+
+
+if __name__ == '__main__':
+    main()
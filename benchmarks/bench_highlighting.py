@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Highlighting throughput benchmark suite.
+
+Measures PygmentsSH for python, C, C++, JSON and plain text documents of 1k,
+10k and 100k lines:
+
+    - full-cold: synchronous rehighlight of the whole document, nothing is
+      cached (lexing + formats + fold detection), in us/block
+    - full-warm: synchronous rehighlight of the whole document, the blocks
+      are already tokenized (formats + fold detection, this is where
+      ``_get_format`` regressions show up), in us/block
+    - fold: ``FoldDetector.process_block`` alone, in us/block
+    - edit: re-highlighting after a single character has been typed in the
+      middle of the document, in ms/edit
+    - scroll: highlighting of the visible blocks while scrolling through a
+      document that is highlighted lazily (the background pass is paused),
+      in ms/page
+
+Results are written as JSON (``--output``) and compared against a stored
+baseline (``--baseline``, default is ``highlighting_baseline.json`` next to
+this script). The script exits with status 1 if a measure is slower than its
+baseline by more than ``--tolerance`` (default is 25%).
+
+Each measure is the best of several runs, but timings still depend on the
+machine and on its load: use ``--save-baseline`` to record a new baseline on
+the reference machine and compare results on a quiet machine.
+
+Usage::
+
+    python benchmarks/bench_highlighting.py
+    python benchmarks/bench_highlighting.py --sizes 1000,10000 --languages c
+    python benchmarks/bench_highlighting.py --save-baseline
+
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+from pyqode.qt import QtWidgets
+from pyqode.core import api, modes
+
+
+SIZES = [1000, 10000, 100000]
+SCENARIOS = ['full-cold', 'full-warm', 'fold', 'edit', 'scroll']
+UNITS = {
+    'full-cold': 'us/block',
+    'full-warm': 'us/block',
+    'fold': 'us/block',
+    'edit': 'ms/edit',
+    'scroll': 'ms/page',
+}
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'highlighting_baseline.json')
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+C_SAMPLE = '''/*
+ * Multi-line comment, the lexer state must be propagated to the next
+ * blocks.
+ */
+#include <stdio.h>
+#include "foo.h"
+
+#define MAX(a, b) ((a) > (b) ? (a) : (b))
+
+static int counter = 0;  // a line comment
+
+struct point {
+    int x;
+    int y;
+};
+
+int compute(const struct point *p, int n)
+{
+    int i, total = 0;
+    for (i = 0; i < n; ++i) {
+        if (p[i].x > 0x10 && p[i].y != -1) {
+            total += MAX(p[i].x, p[i].y) * 3.14f;
+        } else {
+            printf("negative value: %d\\n", p[i].x);
+        }
+    }
+    return total;
+}
+'''
+
+CPP_SAMPLE = '''/**
+ * Doxygen comment.
+ */
+#include <vector>
+#include <string>
+
+namespace geometry {
+
+template <typename T>
+class Polygon : public Shape<T>
+{
+public:
+    explicit Polygon(std::vector<Point<T>> points)
+        : m_points(std::move(points)) {}
+
+    virtual ~Polygon() override = default;
+
+    T area() const
+    {
+        T result = 0;
+        for (auto it = m_points.begin(); it != m_points.end(); ++it) {
+            result += it->x * 2 - it->y; /* inline comment */
+        }
+        return result > 0 ? result : -result;
+    }
+
+private:
+    std::vector<Point<T>> m_points;
+    static constexpr const char *NAME = "polygon";
+};
+
+}  // namespace geometry
+'''
+
+
+def _json_sample():
+    item = {
+        'id': 12345,
+        'name': 'highlighting benchmark',
+        'enabled': True,
+        'ratio': 0.75,
+        'tags': ['python', 'c', 'json'],
+        'owner': {'name': 'pyqode', 'email': None},
+    }
+    return json.dumps({'items': [item] * 4}, indent=4) + '\n'
+
+
+def _read(*path):
+    with open(os.path.join(ROOT, *path)) as f:
+        return f.read()
+
+
+#: name: (sample text callback, mime type, fold detector factory)
+LANGUAGES = {
+    'python': (lambda: _read('pyqode', 'core', 'api', 'code_edit.py'),
+               'text/x-python', api.IndentFoldDetector),
+    'c': (lambda: C_SAMPLE, 'text/x-csrc', api.CharBasedFoldDetector),
+    'cpp': (lambda: CPP_SAMPLE, 'text/x-c++src', api.CharBasedFoldDetector),
+    'json': (_json_sample, 'application/json', api.CharBasedFoldDetector),
+    'text': (lambda: _read('README.rst'), 'text/plain',
+             api.IndentFoldDetector),
+}
+
+
+def make_text(sample, nb_lines):
+    lines = sample.splitlines()
+    return '\n'.join((lines * (nb_lines // len(lines) + 1))[:nb_lines])
+
+
+def clear_tokens(document):
+    block = document.firstBlock()
+    while block.isValid():
+        usd = block.userData()
+        if usd is not None:
+            usd.tokens = None
+        block = block.next()
+
+
+def best_of(repeat, func, setup=None):
+    """
+    Returns the best duration of ``repeat`` calls to ``func`` (the garbage
+    collector is disabled while ``func`` runs).
+    """
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.disable()
+        try:
+            start = time.time()
+            func()
+            durations.append(time.time() - start)
+        finally:
+            gc.enable()
+    return min(durations)
+
+
+def bench_full(editor, highlighter, cold, repeat):
+    document = editor.document()
+    setup = (lambda: clear_tokens(document)) if cold else None
+    duration = best_of(repeat, highlighter.rehighlight, setup)
+    return duration * 1e6 / document.blockCount()
+
+
+def bench_fold(editor, highlighter, repeat):
+    document = editor.document()
+    detector = highlighter.fold_detector
+
+    def process_blocks():
+        block = document.firstBlock()
+        while block.isValid():
+            previous = highlighter._find_prev_non_blank_block(block)
+            detector.process_block(block, previous, block.text())
+            block = block.next()
+
+    return best_of(repeat, process_blocks) * 1e6 / document.blockCount()
+
+
+def bench_edit(editor, repeat, nb_edits=20):
+    document = editor.document()
+    block = document.findBlockByNumber(document.blockCount() // 2)
+    cursor = editor.textCursor()
+    cursor.setPosition(block.position())
+
+    def type_text():
+        for _ in range(nb_edits):
+            cursor.insertText('x')
+
+    def undo():
+        for _ in range(nb_edits):
+            cursor.deletePreviousChar()
+
+    duration = best_of(repeat * 2, type_text, undo)
+    undo()
+    return duration * 1000 / nb_edits
+
+
+def bench_scroll(editor, highlighter, text, mime_type, repeat,
+                 max_pages=100):
+    highlighter.lazy_threshold = 0
+    highlighter.background_tokenization = False
+    scrollbar = editor.verticalScrollBar()
+    pages = []
+
+    def setup():
+        editor.setPlainText(text, mime_type, 'utf-8')
+        # pause the lazy highlighting pass: only the visible blocks are
+        # highlighted
+        highlighter._lazy_timer.stop()
+        page = max(1, scrollbar.pageStep())
+        nb_pages = min(max_pages, max(1, scrollbar.maximum() // page))
+        step = max(page, scrollbar.maximum() // nb_pages)
+        pages[:] = [i * step for i in range(1, nb_pages + 1)]
+
+    def scroll():
+        for value in pages:
+            scrollbar.setValue(value)
+
+    duration = best_of(repeat, scroll, setup)
+    highlighter._stop_lazy_highlighting()
+    return duration * 1000 / len(pages)
+
+
+def run(app, languages, sizes, scenarios):
+    results = []
+    for language in languages:
+        get_sample, mime_type, detector_factory = LANGUAGES[language]
+        sample = get_sample()
+        for nb_lines in sizes:
+            text = make_text(sample, nb_lines)
+            # small documents are measured more times, their timings are
+            # noisier
+            repeat = max(2, min(20, 50000 // nb_lines))
+            editor = api.CodeEdit()
+            editor.resize(800, 600)
+            editor.show()
+            highlighter = editor.modes.append(
+                modes.PygmentsSH(editor.document()))
+            highlighter.fold_detector = detector_factory()
+            highlighter.lazy_threshold = -1
+            highlighter.set_mime_type(mime_type)
+            editor.setPlainText(text, mime_type, 'utf-8')
+            app.processEvents()
+            benches = {
+                'full-cold': lambda: bench_full(
+                    editor, highlighter, True, repeat),
+                'full-warm': lambda: bench_full(
+                    editor, highlighter, False, repeat),
+                'fold': lambda: bench_fold(editor, highlighter, repeat),
+                'edit': lambda: bench_edit(editor, repeat),
+                'scroll': lambda: bench_scroll(
+                    editor, highlighter, text, mime_type, repeat),
+            }
+            for scenario in scenarios:
+                result = {
+                    'language': language, 'lines': nb_lines,
+                    'scenario': scenario,
+                    'value': round(benches[scenario](), 3),
+                    'unit': UNITS[scenario]}
+                results.append(result)
+                print('%-6s %6d lines  %-9s %10.3f %s' % (
+                    language, nb_lines, scenario, result['value'],
+                    result['unit']))
+                sys.stdout.flush()
+            editor.close()
+            editor.setParent(None)
+            app.processEvents()
+    return results
+
+
+def _key(result):
+    return result['language'], result['lines'], result['scenario']
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares the results with the baseline results, returns the list of
+    regressions as (result, baseline result) tuples.
+    """
+    reference = dict((_key(result), result) for result in baseline)
+    regressions = []
+    for result in results:
+        try:
+            base = reference[_key(result)]
+        except KeyError:
+            continue
+        if result['value'] > base['value'] * (1 + tolerance):
+            regressions.append((result, base))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--languages', default=','.join(sorted(LANGUAGES)),
+                        help='comma separated list of languages')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in SIZES),
+                        help='comma separated list of document sizes')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help='comma separated list of scenarios')
+    parser.add_argument('--output', help='path of the JSON results file')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='path of the baseline JSON results file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='maximum slowdown before a measure is reported '
+                        'as a regression (0.25 = 25%%)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='save the results as the new baseline')
+    args = parser.parse_args()
+    app = QtWidgets.QApplication(sys.argv[:1])
+    results = run(app, args.languages.split(','),
+                  [int(size) for size in args.sizes.split(',')],
+                  args.scenarios.split(','))
+    report = {
+        'python': sys.version.split()[0],
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print('baseline saved to %s' % args.baseline)
+        return 0
+    if not os.path.exists(args.baseline):
+        print('no baseline found (%s)' % args.baseline)
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.tolerance)
+    for result, base in regressions:
+        print('REGRESSION %-6s %6d lines  %-9s %10.3f %s (baseline: %.3f, '
+              '%+d%%)' % (
+                  result['language'], result['lines'], result['scenario'],
+                  result['value'], result['unit'], base['value'],
+                  100 * result['value'] / base['value'] - 100))
+    if regressions:
+        return 1
+    print('no regression (tolerance: %d%%)' % (args.tolerance * 100))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
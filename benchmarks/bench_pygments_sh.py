@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures the time PygmentsSH spends per block when the whole document is
+rehighlighted (synchronously):
+
+    - cold: the blocks are tokenized and their formats applied
+    - warm: the blocks have already been tokenized (e.g. after a color scheme
+      change), only their formats are applied
+
+"""
+import os
+import sys
+import time
+from pyqode.qt import QtWidgets
+from pyqode.core import api, modes
+
+
+NB_LINES = 20000
+SOURCE = os.path.join(os.path.dirname(__file__), os.pardir, 'pyqode', 'core',
+                      'api', 'code_edit.py')
+
+
+def rehighlight(editor, highlighter, cold):
+    if cold:
+        block = editor.document().firstBlock()
+        while block.isValid():
+            usd = block.userData()
+            if usd is not None:
+                usd.tokens = None
+            block = block.next()
+    start = time.time()
+    highlighter.rehighlight()
+    return time.time() - start
+
+
+def main():
+    app = QtWidgets.QApplication(sys.argv)
+    editor = api.CodeEdit()
+    highlighter = editor.modes.append(modes.PygmentsSH(editor.document()))
+    highlighter.fold_detector = api.IndentFoldDetector()
+    highlighter.lazy_threshold = -1
+    with open(SOURCE) as f:
+        source = f.read()
+    text = '\n'.join((source.splitlines() * NB_LINES)[:NB_LINES])
+    editor.setPlainText(text, 'text/x-python', 'utf-8')
+    nb_blocks = editor.document().blockCount()
+    print('%d blocks' % nb_blocks)
+    for show_whitespaces in (False, True):
+        editor.show_whitespaces = show_whitespaces
+        for cold in (True, False):
+            duration = min(rehighlight(editor, highlighter, cold)
+                           for _ in range(3))
+            print('show_whitespaces=%-5s %s: %.1f us/block' % (
+                show_whitespaces, 'cold' if cold else 'warm',
+                duration * 1e6 / nb_blocks))
+    editor.close()
+    del app
+
+
+if __name__ == '__main__':
+    main()
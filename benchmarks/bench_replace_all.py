@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmarks SearchAndReplacePanel.replace_all (single pass replacement)
+against the previous implementation (one replace() call per occurrence).
+
+"""
+import sys
+import time
+from pyqode.qt import QtWidgets
+from pyqode.core import api, modes, panels
+from pyqode.core.backend.workers import findall
+
+
+#: the legacy implementation is quadratic, skip it for bigger inputs
+MAX_LEGACY = 10000
+LINE = 'def foo(self, value):  # foo is called with a value\n'
+
+
+def setup(editor, panel, nb_occurrences):
+    editor.setPlainText(LINE * (nb_occurrences // 2), 'text/x-python',
+                        'utf-8')
+    panel._offset = 0
+    panel._on_results_available(findall({
+        'string': editor.toPlainText(), 'sub': 'foo', 'regex': False,
+        'whole_word': True, 'case_sensitive': True}))
+    assert panel.cpt_occurences == nb_occurrences
+
+
+def legacy_replace_all(panel, text):
+    cursor = panel.editor.textCursor()
+    cursor.beginEditBlock()
+    remains = panel.replace(text=text)
+    while remains:
+        remains = panel.replace(text=text)
+    cursor.endEditBlock()
+
+
+def main():
+    app = QtWidgets.QApplication(sys.argv)
+    editor = api.CodeEdit()
+    editor.modes.append(modes.PygmentsSH(editor.document()))
+    panel = editor.panels.append(panels.SearchAndReplacePanel(),
+                                 api.Panel.Position.BOTTOM)
+    for nb_occurrences in [1000, 10000]:
+        print('%d occurrences' % nb_occurrences)
+        if nb_occurrences <= MAX_LEGACY:
+            setup(editor, panel, nb_occurrences)
+            t = time.time()
+            legacy_replace_all(panel, 'bar')
+            print('    legacy:      %8.1f ms' % ((time.time() - t) * 1000))
+            assert 'foo' not in editor.toPlainText()
+        setup(editor, panel, nb_occurrences)
+        t = time.time()
+        panel.replace_all('bar')
+        print('    replace_all: %8.1f ms' % ((time.time() - t) * 1000))
+        assert 'foo' not in editor.toPlainText()
+        editor.undo()
+        assert editor.toPlainText().count('foo') == nb_occurrences
+    del app
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmarks the findall search engine over multi-MB inputs and compares it
+with the previous implementation (lowercase copy of the text + str.find loop
+with whole word filtering done in python).
+
+"""
+import re
+import timeit
+from pyqode.core.backend import search
+from pyqode.core.backend.workers import finditer_noregex
+
+
+LINE = ('    def import_data(self, Path, encoding="utf-8"):  '
+        '# IMPORT path importer\n')
+SIZES_MB = [1, 4]
+
+
+def legacy_findalliter(string, sub, regex=False, case_sensitive=False,
+                       whole_word=False):
+    if regex:
+        flags = re.MULTILINE
+        if not case_sensitive:
+            flags |= re.IGNORECASE
+        for val in re.finditer(sub, string, flags):
+            yield val.span()
+    else:
+        if not case_sensitive:
+            string = string.lower()
+            sub = sub.lower()
+        for val in finditer_noregex(string, sub, whole_word):
+            yield val, val + len(sub)
+
+
+def main():
+    cases = [
+        ('import', dict(case_sensitive=True)),
+        ('import', dict(case_sensitive=False)),
+        ('path', dict(case_sensitive=False, whole_word=True)),
+        (r'\bimport\w*', dict(regex=True)),
+    ]
+    for size in SIZES_MB:
+        text = LINE * (size * 1024 * 1024 // len(LINE))
+        print('%d MB (%d lines)' % (size, text.count('\n')))
+        for sub, options in cases:
+            legacy = timeit.timeit(
+                lambda: list(legacy_findalliter(text, sub, **options)),
+                number=3) / 3
+            new = timeit.timeit(
+                lambda: list(search.finditer(text, sub, **options)),
+                number=3) / 3
+            capped = timeit.timeit(
+                lambda: search.search(text, sub, max_results=1000,
+                                      **options),
+                number=3) / 3
+            print('    %-12s %-48r legacy: %8.2f ms  new: %8.2f ms  '
+                  'capped: %8.2f ms' % (sub, options, legacy * 1000,
+                                        new * 1000, capped * 1000))
+
+
+if __name__ == '__main__':
+    main()
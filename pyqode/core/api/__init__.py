@@ -15,16 +15,19 @@ from .syntax_highlighter import SyntaxHighlighter
 from .syntax_highlighter import TextBlockUserData
 from .utils import TextHelper, TextBlockHelper
 from .utils import get_block_symbol_data
-from .utils import DelayJobRunner
+from .utils import AnalysisScheduler, DelayJobRunner
+from .utils import IntervalTree, PositionIndex
 from .folding import FoldDetector
 from .folding import IndentFoldDetector
 from .folding import CharBasedFoldDetector
 from .folding import FoldScope
+from .folding import FoldIndex
 
 
 __all__ = [
     'convert_to_codec_key',
     'get_block_symbol_data',
+    'AnalysisScheduler',
     'CharBasedFoldDetector',
     'CodeEdit',
     'ColorScheme',
@@ -32,10 +35,13 @@ __all__ = [
     'ENCODINGS_MAP',
     'FoldDetector',
     'IndentFoldDetector',
+    'IntervalTree',
     'FoldScope',
+    'FoldIndex',
     'Manager',
     'Mode',
     'Panel',
+    'PositionIndex',
     'PYGMENTS_STYLES',
     'SyntaxHighlighter',
     'TextBlockUserData',
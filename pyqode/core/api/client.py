@@ -177,7 +177,7 @@ class JsonTcpClient(QtNetwork.QTcpSocket):
     finished = QtCore.Signal(QtNetwork.QTcpSocket)
 
     def __init__(self, parent, port, worker_class_or_function, args,
-                 on_receive=None):
+                 on_receive=None, on_error=None):
         super(JsonTcpClient, self).__init__(parent)
         self._port = port
         self._worker = worker_class_or_function
@@ -186,14 +186,8 @@ class JsonTcpClient(QtNetwork.QTcpSocket):
         self._header_buf = bytes()
         self._to_read = 0
         self._data_buf = bytes()
-        if on_receive:
-            try:
-                self._callback = WeakMethod(on_receive)
-            except TypeError:
-                # unbound method (i.e. free function)
-                self._callback = ref(on_receive)
-        else:
-            self._callback = None
+        self._callback = self._weak_callback(on_receive)
+        self._error_callback = self._weak_callback(on_error)
         self.is_connected = False
         self._closed = False
         self.connected.connect(self._on_connected)
@@ -202,10 +196,21 @@ class JsonTcpClient(QtNetwork.QTcpSocket):
         self.readyRead.connect(self._on_ready_read)
         self._connect()
 
+    @staticmethod
+    def _weak_callback(callback):
+        if not callback:
+            return None
+        try:
+            return WeakMethod(callback)
+        except TypeError:
+            # unbound method (i.e. free function)
+            return ref(callback)
+
     def close(self):
         self._closed = True  # fix issue with QTimer.singleShot
         super(JsonTcpClient, self).close()
         self._callback = None
+        self._error_callback = None
 
     def _send_request(self):
         """
@@ -327,9 +332,16 @@ class JsonTcpClient(QtNetwork.QTcpSocket):
             # possible callback
             if self._callback and self._callback():
                 self._callback()(results)
+            # the worker failed
+            if (isinstance(obj, dict) and obj.get('error', False) and
+                    self._error_callback and self._error_callback()):
+                self._error_callback()()
             self._header_complete = False
             self._data_buf = bytes()
-            self.finished.emit(self)
+            # generator workers send partial responses, the request is
+            # finished when the final response is received.
+            if not (isinstance(obj, dict) and obj.get('partial', False)):
+                self.finished.emit(self)
 
     def _on_ready_read(self):
         """ Read bytes when ready read """
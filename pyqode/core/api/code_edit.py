@@ -650,6 +650,11 @@ class CodeEdit(QtWidgets.QPlainTextEdit):
         self.file._encoding = encoding
         self._original_text = txt
         self._modified_lines.clear()
+        highlighter = self.syntax_highlighter
+        if highlighter is not None and highlighter.enabled and \
+                highlighter.needs_lazy_highlighting(txt.count('\n') + 1):
+            # big document: only the visible blocks are highlighted now
+            highlighter.lazy_rehighlight()
         import time
         t = time.time()
         super(CodeEdit, self).setPlainText(txt)
@@ -1084,10 +1089,9 @@ class CodeEdit(QtWidgets.QPlainTextEdit):
         self.mouse_pressed.emit(event)
         if event.button() == QtCore.Qt.LeftButton:
             cursor = self.cursorForPosition(event.pos())
-            for sel in self.decorations:
+            for sel in self.decorations.containing(cursor):
                 if sel.cursor.blockNumber() == cursor.blockNumber():
-                    if sel.contains_cursor(cursor):
-                        sel.signals.clicked.emit(sel)
+                    sel.signals.clicked.emit(sel)
         if not event.isAccepted():
             event.setAccepted(initial_state)
             super(CodeEdit, self).mousePressEvent(event)
@@ -1128,8 +1132,8 @@ class CodeEdit(QtWidgets.QPlainTextEdit):
         cursor = self.cursorForPosition(event.pos())
         self._last_mouse_pos = event.pos()
         block_found = False
-        for sel in self.decorations:
-            if sel.contains_cursor(cursor) and sel.tooltip:
+        for sel in self.decorations.containing(cursor):
+            if sel.tooltip:
                 if (self._prev_tooltip_block_nbr != cursor.blockNumber() or
                         not QtWidgets.QToolTip.isVisible()):
                     pos = event.pos()
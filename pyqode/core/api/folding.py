@@ -38,6 +38,396 @@ def _logger():
     return logging.getLogger(__name__)
 
 
+_INF = sys.maxsize
+
+
+def _fold_info(block):
+    """
+    Returns the fold level of a block and its fold level as a trigger (the
+    fold level if the block is a fold trigger, sys.maxsize otherwise).
+    """
+    state = block.userState()
+    if state == -1:
+        return 0, _INF
+    level = (state & 0x03FF0000) >> 16
+    return level, level if state & 0x04000000 else _INF
+
+
+class _ChunkTree(object):
+    """
+    Segment tree over the chunks of a :class:`FoldIndex`. For each chunk,
+    the tree stores the number of blocks, the minimum fold level and the
+    minimum fold level of the fold triggers.
+    """
+    def __init__(self, chunks):
+        n = 1
+        while n < len(chunks):
+            n *= 2
+        self.n = n
+        self.sizes = [0] * (2 * n)
+        self.levels = [_INF] * (2 * n)
+        self.triggers = [_INF] * (2 * n)
+        for i, (levels, triggers) in enumerate(chunks):
+            self._set_leaf(i, levels, triggers)
+        for i in range(n - 1, 0, -1):
+            self._pull(i)
+
+    def _set_leaf(self, index, levels, triggers):
+        i = index + self.n
+        self.sizes[i] = len(levels)
+        self.levels[i] = min(levels) if levels else _INF
+        self.triggers[i] = min(triggers) if triggers else _INF
+
+    def _pull(self, i):
+        left, right = 2 * i, 2 * i + 1
+        self.sizes[i] = self.sizes[left] + self.sizes[right]
+        self.levels[i] = min(self.levels[left], self.levels[right])
+        self.triggers[i] = min(self.triggers[left], self.triggers[right])
+
+    def update(self, index, levels, triggers):
+        """ Updates the data of a chunk """
+        self._set_leaf(index, levels, triggers)
+        i = (index + self.n) // 2
+        while i:
+            self._pull(i)
+            i //= 2
+
+    def locate(self, position):
+        """
+        Returns the index of the chunk that contains the block at
+        ``position`` and the offset of the block in the chunk.
+        """
+        sizes = self.sizes
+        i = 1
+        while i < self.n:
+            i *= 2
+            if position >= sizes[i]:
+                position -= sizes[i]
+                i += 1
+        return i - self.n, position
+
+    def start(self, index):
+        """ Returns the position of the first block of a chunk """
+        sizes = self.sizes
+        position = 0
+        i = index + self.n
+        while i > 1:
+            if i & 1:
+                position += sizes[i - 1]
+            i //= 2
+        return position
+
+    def find_next(self, values, index, max_value):
+        """
+        Returns the index of the first chunk, starting at ``index``, whose
+        value is lower or equal to ``max_value`` (-1 if there is none).
+        """
+        i = index + self.n
+        while True:
+            if values[i] <= max_value:
+                while i < self.n:
+                    i *= 2
+                    if values[i] > max_value:
+                        i += 1
+                return i - self.n
+            while i & 1:
+                i //= 2
+            if not i:
+                return -1
+            i += 1
+
+    def find_previous(self, values, index, max_value):
+        """
+        Returns the index of the last chunk, up to ``index``, whose value is
+        lower or equal to ``max_value`` (-1 if there is none).
+        """
+        i = index + self.n
+        while True:
+            if values[i] <= max_value:
+                while i < self.n:
+                    i = 2 * i + 1
+                    if values[i] > max_value:
+                        i -= 1
+                return i - self.n
+            while not i & 1:
+                i //= 2
+            if i == 1:
+                return -1
+            i -= 1
+
+
+class FoldIndex(object):
+    """
+    Index of the fold levels and fold triggers of a document.
+
+    The index is maintained incrementally: the fold detector updates the
+    blocks it processes and the index follows the blocks that are inserted
+    or removed. It answers the queries needed by :class:`FoldScope` (end of
+    a fold scope, parent scope, child scopes) in logarithmic time instead of
+    walking the document block by block.
+
+    Blocks are stored in chunks of about :attr:`CHUNK_SIZE` blocks, a
+    segment tree over the chunks keeps their sizes and their minimum fold
+    levels.
+
+    There is one index per document, it is created by the fold detector the
+    first time it processes a block of the document. Use :meth:`get` to
+    retrieve the index of a document.
+    """
+    #: Number of blocks per chunk.
+    CHUNK_SIZE = 256
+
+    @staticmethod
+    def get(document):
+        """
+        Returns the fold index of a document, None if the document has not
+        been processed by a fold detector.
+
+        :param document: QTextDocument
+        """
+        return getattr(document, '_pyqode_fold_index', None)
+
+    @property
+    def document(self):
+        """
+        Returns the indexed document.
+        """
+        return self._document
+
+    def __init__(self, document):
+        self._document = document
+        self._chunks = []
+        self._tree = None
+        self._nb_blocks = 0
+        # blocks processed while the index did not follow the last change of
+        # the document yet
+        self._pending = []
+        document._pyqode_fold_index = self
+        document.contentsChange.connect(self._on_contents_change)
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Rebuilds the index from the blocks user states. You only need to
+        call this method if you changed the blocks fold levels without using
+        a fold detector.
+        """
+        levels = []
+        triggers = []
+        block = self._document.firstBlock()
+        while block.isValid():
+            level, trigger = _fold_info(block)
+            levels.append(level)
+            triggers.append(trigger)
+            block = block.next()
+        self._set_blocks(levels, triggers)
+        del self._pending[:]
+
+    @property
+    def up_to_date(self):
+        """
+        Returns True if the index follows the document, False if blocks
+        have been inserted or removed and the index has not been updated yet.
+        """
+        return (not self._pending and
+                self._nb_blocks == self._document.blockCount())
+
+    def update(self, first_block, last_block):
+        """
+        Updates the fold information of a range of blocks.
+
+        :param first_block: first block of the range
+        :param last_block: last block of the range
+        """
+        if self._nb_blocks != self._document.blockCount():
+            # blocks inserted or removed, we need to follow the change first
+            self._pending.append((first_block, last_block))
+        else:
+            self._read(first_block.blockNumber(), last_block.blockNumber())
+
+    def fold_level(self, line):
+        """
+        Returns the fold level of a block.
+
+        :param line: block number
+        """
+        index, offset = self._tree.locate(line)
+        return self._chunks[index][0][offset]
+
+    def find_next_level(self, line, max_level):
+        """
+        Finds the first block after ``line`` whose fold level is lower or
+        equal to ``max_level``.
+
+        :param line: block number
+        :param max_level: maximum fold level
+        :returns: the block number, -1 if there is none.
+        """
+        return self._find_next(0, line, max_level)
+
+    def find_next_trigger(self, line, max_level):
+        """
+        Finds the first fold trigger after ``line`` whose fold level is lower
+        or equal to ``max_level``.
+
+        :param line: block number
+        :param max_level: maximum fold level
+        :returns: the block number, -1 if there is none.
+        """
+        return self._find_next(1, line, max_level)
+
+    def find_previous_trigger(self, line, max_level):
+        """
+        Finds the last fold trigger before ``line`` whose fold level is lower
+        or equal to ``max_level``.
+
+        :param line: block number
+        :param max_level: maximum fold level
+        :returns: the block number, -1 if there is none.
+        """
+        tree = self._tree
+        line = min(line, self._nb_blocks) - 1
+        if line < 0:
+            return -1
+        index, offset = tree.locate(line)
+        values = self._chunks[index][1]
+        for i in range(offset, -1, -1):
+            if values[i] <= max_level:
+                return tree.start(index) + i
+        if not index:
+            return -1
+        index = tree.find_previous(tree.triggers, index - 1, max_level)
+        if index == -1:
+            return -1
+        values = self._chunks[index][1]
+        for i in range(len(values) - 1, -1, -1):
+            if values[i] <= max_level:
+                return tree.start(index) + i
+
+    def _find_next(self, column, line, max_level):
+        tree = self._tree
+        line += 1
+        if line >= self._nb_blocks:
+            return -1
+        index, offset = tree.locate(line)
+        values = self._chunks[index][column]
+        for i in range(offset, len(values)):
+            if values[i] <= max_level:
+                return tree.start(index) + i
+        if index + 1 >= len(self._chunks):
+            return -1
+        index = tree.find_next(tree.triggers if column else tree.levels,
+                               index + 1, max_level)
+        if index == -1:
+            return -1
+        values = self._chunks[index][column]
+        for i, value in enumerate(values):
+            if value <= max_level:
+                return tree.start(index) + i
+
+    def _set_blocks(self, levels, triggers):
+        size = self.CHUNK_SIZE
+        self._chunks = [(levels[i:i + size], triggers[i:i + size])
+                        for i in range(0, len(levels), size)]
+        self._tree = _ChunkTree(self._chunks)
+        self._nb_blocks = len(levels)
+
+    def _read(self, first, last):
+        """
+        Reads the fold information of a range of blocks from their user
+        states.
+        """
+        last = min(last, self._nb_blocks - 1)
+        if first > last:
+            return
+        block = self._document.findBlockByNumber(first)
+        index, offset = self._tree.locate(first)
+        line = first
+        while line <= last and block.isValid():
+            levels, triggers = self._chunks[index]
+            while offset < len(levels) and line <= last:
+                levels[offset], triggers[offset] = _fold_info(block)
+                block = block.next()
+                offset += 1
+                line += 1
+            self._tree.update(index, levels, triggers)
+            index += 1
+            offset = 0
+
+    def _insert(self, line, count):
+        """ Inserts ``count`` blank entries before ``line`` """
+        if line >= self._nb_blocks:
+            index = len(self._chunks) - 1
+            offset = len(self._chunks[index][0])
+        else:
+            index, offset = self._tree.locate(line)
+        levels, triggers = self._chunks[index]
+        levels[offset:offset] = [0] * count
+        triggers[offset:offset] = [_INF] * count
+        self._nb_blocks += count
+        if len(levels) > 2 * self.CHUNK_SIZE:
+            self._rechunk()
+        else:
+            self._tree.update(index, levels, triggers)
+
+    def _remove(self, line, count):
+        """ Removes ``count`` entries, starting at ``line`` """
+        count = min(count, self._nb_blocks - line)
+        self._nb_blocks -= count
+        while count > 0:
+            index, offset = self._tree.locate(line)
+            levels, triggers = self._chunks[index]
+            nb = min(count, len(levels) - offset)
+            del levels[offset:offset + nb]
+            del triggers[offset:offset + nb]
+            count -= nb
+            if levels:
+                self._tree.update(index, levels, triggers)
+            else:
+                del self._chunks[index]
+                self._tree = _ChunkTree(self._chunks)
+        if len(self._chunks) > 2 * (self._nb_blocks // self.CHUNK_SIZE + 1):
+            # too many small chunks
+            self._rechunk()
+
+    def _rechunk(self):
+        levels = []
+        triggers = []
+        for chunk_levels, chunk_triggers in self._chunks:
+            levels += chunk_levels
+            triggers += chunk_triggers
+        self._set_blocks(levels, triggers)
+
+    def _on_contents_change(self, position, removed, added):
+        document = self._document
+        nb_blocks = document.blockCount()
+        delta = nb_blocks - self._nb_blocks
+        first = document.findBlock(position)
+        if not first.isValid():
+            first = document.lastBlock()
+        last = document.findBlock(position + added)
+        if not last.isValid():
+            last = document.lastBlock()
+        first = first.blockNumber()
+        last = last.blockNumber()
+        if (last - first > nb_blocks // 2 or
+                -delta > self._nb_blocks // 2 or not self._chunks):
+            # big change (e.g. setPlainText)
+            self.rebuild()
+            return
+        if delta > 0:
+            self._insert(first + 1, delta)
+        elif delta < 0:
+            self._remove(first + 1, -delta)
+        self._read(first, last)
+        pending = self._pending
+        self._pending = []
+        for first_block, last_block in pending:
+            if first_block.isValid() and last_block.isValid():
+                self._read(first_block.blockNumber(),
+                           last_block.blockNumber())
+
+
 class FoldDetector(object):
     """
     Base class for fold detectors.
@@ -62,6 +452,16 @@ class FoldDetector(object):
         #: Fold level limit, any level greater or equal is skipped.
         #: Default is sys.maxsize (i.e. all levels are accepted)
         self.limit = sys.maxsize
+        self._index = None
+
+    def _get_index(self, document):
+        index = self._index
+        if index is None or index.document is not document:
+            index = FoldIndex.get(document)
+            if index is None:
+                index = FoldIndex(document)
+            self._index = index
+        return index
 
     def process_block(self, current_block, previous_block, text):
         """
@@ -87,6 +487,8 @@ class FoldDetector(object):
 
         prev_fold_level = TextBlockHelper.get_fold_lvl(previous_block)
 
+        # first block whose fold info may be changed
+        first_block = previous_block
         if fold_level > prev_fold_level:
             # apply on previous blank lines
             block = current_block.previous()
@@ -95,6 +497,8 @@ class FoldDetector(object):
                 block = block.previous()
             TextBlockHelper.set_fold_trigger(
                 block, True)
+            first_block = (block if block.isValid() else
+                           current_block.document().firstBlock())
 
         # update block fold level
         if text.strip():
@@ -117,6 +521,14 @@ class FoldDetector(object):
             TextBlockHelper.set_fold_trigger(prev, False)
             TextBlockHelper.set_collapsed(prev, False)
 
+        if first_block is None or not first_block.isValid():
+            first_block = current_block
+        elif (prev is not None and prev.isValid() and
+                prev.blockNumber() < first_block.blockNumber()):
+            first_block = prev
+        self._get_index(current_block.document()).update(
+            first_block, current_block)
+
     def detect_fold_level(self, prev_block, block):
         """
         Detects the block fold level.
@@ -226,6 +638,17 @@ class FoldScope(object):
             raise ValueError('Not a fold trigger')
         self._trigger = block
 
+    @staticmethod
+    def _get_index(block):
+        """
+        Returns the fold index of the block document if it can be used, None
+        if the blocks must be walked.
+        """
+        index = FoldIndex.get(block.document())
+        if index is not None and index.up_to_date:
+            return index
+        return None
+
     def get_range(self, ignore_blank_lines=True):
         """
         Gets the fold region range (start and end line).
@@ -245,10 +668,17 @@ class FoldScope(object):
         if ref_lvl == lvl:  # for zone set programmatically such as imports
                             # in pyqode.python
             ref_lvl -= 1
-        while (block.isValid() and
-                TextBlockHelper.get_fold_lvl(block) > ref_lvl):
-            last_line = block.blockNumber()
-            block = block.next()
+        index = self._get_index(self._trigger)
+        if index is None:
+            while (block.isValid() and
+                    TextBlockHelper.get_fold_lvl(block) > ref_lvl):
+                last_line = block.blockNumber()
+                block = block.next()
+        elif block.isValid():
+            end = index.find_next_level(first_line, ref_lvl)
+            if end == -1:
+                end = block.document().blockCount()
+            last_line = max(end - 1, last_line)
 
         if ignore_blank_lines and last_line:
             block = block.document().findBlockByNumber(last_line)
@@ -264,7 +694,9 @@ class FoldScope(object):
         start, end = self.get_range()
         TextBlockHelper.set_collapsed(self._trigger, True)
         block = self._trigger.next()
-        while block.blockNumber() <= end and block.isValid():
+        for _ in range(end - start):
+            if not block.isValid():
+                break
             block.setVisible(False)
             block = block.next()
 
@@ -289,7 +721,9 @@ class FoldScope(object):
         """
         start, end = self.get_range(ignore_blank_lines=ignore_blank_lines)
         block = self._trigger.next()
-        while block.blockNumber() <= end and block.isValid():
+        for _ in range(end - start):
+            if not block.isValid():
+                break
             yield block
             block = block.next()
 
@@ -300,6 +734,15 @@ class FoldScope(object):
         start, end = self.get_range()
         block = self._trigger.next()
         ref_lvl = self.scope_level
+        index = self._get_index(self._trigger)
+        if index is not None:
+            document = block.document()
+            line = index.find_next_trigger(start, ref_lvl)
+            while line != -1 and line <= end:
+                if index.fold_level(line) == ref_lvl:
+                    yield FoldScope(document.findBlockByNumber(line))
+                line = index.find_next_trigger(line, ref_lvl)
+            return
         while block.blockNumber() <= end and block.isValid():
             lvl = TextBlockHelper.get_fold_lvl(block)
             trigger = TextBlockHelper.is_fold_trigger(block)
@@ -317,6 +760,11 @@ class FoldScope(object):
                 self._trigger.blockNumber():
             block = self._trigger.previous()
             ref_lvl = self.trigger_level - 1
+            index = self._get_index(self._trigger)
+            if index is not None:
+                line = index.find_previous_trigger(
+                    self._trigger.blockNumber(), ref_lvl)
+                block = block.document().findBlockByNumber(max(line, 0))
             while (block.blockNumber() and
                     (not TextBlockHelper.is_fold_trigger(block) or
                      TextBlockHelper.get_fold_lvl(block) > ref_lvl)):
@@ -335,20 +783,87 @@ class FoldScope(object):
         :return: str
         """
         ret_val = []
-        block = self._trigger.next()
-        _, end = self.get_range()
-        while (block.isValid() and block.blockNumber() <= end and
-               len(ret_val) < max_lines):
+        for block in self.blocks():
+            if len(ret_val) >= max_lines:
+                break
             ret_val.append(block.text())
-            block = block.next()
         return '\n'.join(ret_val)
 
+    @staticmethod
+    def fold_all(document):
+        """
+        Folds all the regions of a document, in a single pass over the
+        blocks.
+
+        All the fold triggers are collapsed and all the blocks whose fold
+        level is greater than 0 are hidden, except the blank lines that
+        precede a top level trigger and the blank lines at the end of the
+        document.
+
+        .. note:: The document layout is not updated, call
+            ``QTextDocument.markContentsDirty`` once all the regions have been
+            folded.
+
+        :param document: QTextDocument
+        """
+        block = document.firstBlock()
+        while block.isValid():
+            state = block.userState()
+            if state == -1:
+                state = 0
+            level = state & 0x03FF0000
+            if state & 0x04000000:
+                block.setUserState(state | 0x08000000)
+                if not level:
+                    FoldScope._show_previous_blank_lines(block)
+            block.setVisible(not level)
+            block = block.next()
+        block = document.lastBlock()
+        if block.text().strip() == '':
+            block.setVisible(True)
+            FoldScope._show_previous_blank_lines(block)
+
+    @staticmethod
+    def unfold_all(document):
+        """
+        Unfolds all the regions of a document, in a single pass over the
+        blocks.
+
+        .. note:: The document layout is not updated, call
+            ``QTextDocument.markContentsDirty`` once all the regions have been
+            unfolded.
+
+        :param document: QTextDocument
+        """
+        block = document.firstBlock()
+        while block.isValid():
+            state = block.userState()
+            if state != -1 and state & 0x08000000:
+                block.setUserState(state & 0x77FFFFFF)
+            block.setVisible(True)
+            block = block.next()
+
+    @staticmethod
+    def _show_previous_blank_lines(block):
+        """
+        Shows the blank lines that precede a block.
+        """
+        block = block.previous()
+        while block.isValid() and block.text().strip() == '':
+            block.setVisible(True)
+            block = block.previous()
+
     @staticmethod
     def find_parent_scope(block):
         """
         Find parent scope, if the block is not a fold trigger.
 
+        The search uses the document :class:`FoldIndex` if there is one,
+        otherwise the blocks are walked backwards (and the search gives up
+        after 5000 blocks).
+
         :param block: block from which the research will start
+        :returns: the fold trigger block or None
         """
         # if we moved up for more than n lines, just give up otherwise this
         # would take too much time.
@@ -361,6 +876,11 @@ class FoldScope(object):
                 block = block.next()
             ref_lvl = TextBlockHelper.get_fold_lvl(block) - 1
             block = original
+            index = FoldScope._get_index(block)
+            if index is not None:
+                line = index.find_previous_trigger(
+                    block.blockNumber() + 1, ref_lvl)
+                return block.document().findBlockByNumber(max(line, 0))
             while (block.blockNumber() and counter < limit and
                    (not TextBlockHelper.is_fold_trigger(block) or
                     TextBlockHelper.get_fold_lvl(block) > ref_lvl)):
@@ -5,11 +5,10 @@ import logging
 import sys
 import time
 import weakref
-from pygments.styles import get_style_by_name, get_all_styles
 from pygments.token import Token, Punctuation
 from pygments.util import ClassNotFound
 from pyqode.core.api.mode import Mode
-from pyqode.core.api.utils import drift_color
+from pyqode.core.api.utils import drift_color, LazyList
 from pyqode.qt import QtGui, QtCore, QtWidgets
 
 
@@ -17,8 +16,14 @@ def _logger():
     return logging.getLogger(__name__)
 
 
-#: A sorted list of available pygments styles, for convenience
-PYGMENTS_STYLES = sorted(set(list(get_all_styles()) + ['darcula', 'qt']))
+def _get_all_styles():
+    from pygments.styles import get_all_styles
+    return sorted(set(list(get_all_styles()) + ['darcula', 'qt']))
+
+
+#: A sorted list of available pygments styles, for convenience. The list is
+#: loaded the first time it is used.
+PYGMENTS_STYLES = LazyList(_get_all_styles)
 
 
 #: The list of color schemes keys (and their associated pygments token)
@@ -114,6 +119,7 @@ class ColorScheme(object):
         #: Dictionary of formats colors (keys are the same as for
         #: :attr:`pyqode.core.api.COLOR_SCHEME_KEYS`
         self.formats = {}
+        from pygments.styles import get_style_by_name
         try:
             style = get_style_by_name(style)
         except ClassNotFound:
@@ -223,6 +229,15 @@ class SyntaxHighlighter(QtGui.QSyntaxHighlighter, Mode):
     #: highlighter instance and the current text block
     block_highlight_finished = QtCore.Signal(object, object)
 
+    #: Signal emitted while a document is highlighted lazily. The parameter is
+    #: the percentage of the document that has been highlighted (100 once the
+    #: whole document has been highlighted).
+    highlighting_progress = QtCore.Signal(int)
+
+    #: Maximum number of blocks highlighted by a single call to
+    #: ``rehighlightBlock`` when a document is highlighted lazily.
+    LAZY_BATCH_SIZE = 64
+
     @property
     def formats(self):
         """
@@ -242,10 +257,34 @@ class SyntaxHighlighter(QtGui.QSyntaxHighlighter, Mode):
     def color_scheme(self, color_scheme):
         if isinstance(color_scheme, str):
             color_scheme = ColorScheme(color_scheme)
-        if color_scheme.name != self._color_scheme.name:
-            self._color_scheme = color_scheme
-            self.refresh_editor(color_scheme)
-            self.rehighlight()
+        # the color scheme is shared by all the views of the document
+        highlighter = self.document_highlighter
+        if color_scheme.name != highlighter._color_scheme.name:
+            for view in [highlighter] + highlighter._views:
+                view._color_scheme = color_scheme
+                if view.editor is not None:
+                    view.refresh_editor(color_scheme)
+            highlighter.rehighlight()
+
+    @property
+    def document_highlighter(self):
+        """
+        Returns the highlighter that highlights the editor's document.
+
+        Cloned editors (see :meth:`pyqode.core.api.CodeEdit.split`) share
+        the document of the original editor. The document is highlighted
+        once, by the highlighter of the original editor, the highlighters of
+        the clones are views of the document highlighter (see
+        :meth:`share_document`).
+
+        Returns self if the document is not shared or if this highlighter is
+        the document highlighter.
+
+        **READ ONLY**
+        """
+        if self._document_highlighter is not None:
+            return self._document_highlighter
+        return self
 
     def refresh_editor(self, color_scheme):
         """
@@ -291,14 +330,112 @@ class SyntaxHighlighter(QtGui.QSyntaxHighlighter, Mode):
         #: to work. Default is None
         self.fold_detector = None
         self.WHITESPACES = QtCore.QRegExp(r'\s+')
+        #: Documents with more blocks than this are highlighted lazily: the
+        #: visible blocks first, then the rest of the document in small
+        #: chunks from the event loop. Set it to -1 to always highlight
+        #: documents synchronously.
+        self.lazy_threshold = 10000
+        #: Maximum duration (in milliseconds) of a lazy highlighting chunk.
+        self.lazy_chunk_duration = 20
+        # blocks after the frontier are not highlighted yet (unless they
+        # are in the viewport). The frontier is a cursor so that it follows
+        # the text when the document is edited.
+        self._frontier = None
+        # visible blocks ranges of the views of the document
+        self._viewports = []
+        # range of blocks highlighted by the current batch
+        self._batch = (-1, -1)
+        self._last_highlighted = -1
+        # numbers of the blocks highlighted before the frontier reached them
+        self._highlighted_ahead = set()
+        # document whose block count changes are watched while it is
+        # highlighted lazily (the block numbers are shifted)
+        self._watched_document = None
+        self._lazy_timer = QtCore.QTimer(self)
+        self._lazy_timer.setInterval(0)
+        self._lazy_timer.timeout.connect(self._highlight_next_chunk)
+        # highlighter of the view we share the document with, None if we
+        # highlight the document ourselves
+        self._document_highlighter = None
+        # highlighters of the other views of our document
+        self._views = []
 
     def on_state_changed(self, state):
         if self._on_close:
             return
         if state:
-            self.setDocument(self.editor.document())
+            self.editor.verticalScrollBar().valueChanged.connect(
+                self._on_viewport_changed)
+            if self._document_highlighter is None:
+                self.setDocument(self.editor.document())
+                if self.needs_lazy_highlighting(
+                        self.document().blockCount()):
+                    self.lazy_rehighlight()
+            else:
+                self._on_viewport_changed()
         else:
-            self.setDocument(None)
+            self.editor.verticalScrollBar().valueChanged.disconnect(
+                self._on_viewport_changed)
+            if self._document_highlighter is None:
+                self._stop_lazy_highlighting()
+                self.setDocument(None)
+
+    def share_document(self, highlighter):
+        """
+        Makes this highlighter a view of the document highlighted by
+        ``highlighter``. The editor of this highlighter must already use the
+        document of ``highlighter``'s editor.
+
+        The document is highlighted once, by the document highlighter. A view
+        only contributes its visible blocks (which are highlighted first when
+        the document is highlighted lazily). The settings that affect the
+        document (color scheme, lexer,...) are those of the document
+        highlighter, changing them from a view changes them for all views.
+
+        When the editor of the document highlighter is closed, the first view
+        takes over the highlighting of the document.
+
+        :param highlighter: highlighter of the editor to share the document
+            with.
+        """
+        highlighter = highlighter.document_highlighter
+        if highlighter is self or self._document_highlighter is highlighter:
+            return
+        self._stop_lazy_highlighting()
+        self.setDocument(None)
+        self._document_highlighter = highlighter
+        highlighter._views.append(self)
+        highlighter._on_viewport_changed()
+
+    def _take_over(self, highlighter):
+        """
+        Takes over the highlighting of the document of ``highlighter`` (the
+        document highlighter), whose editor is being closed. The other views
+        of the document become views of this highlighter.
+
+        Subclasses that keep document level data must extend this method to
+        take them over.
+        """
+        lazy = highlighter.lazy_highlighting_in_progress
+        highlighter._stop_lazy_highlighting()
+        highlighter.setDocument(None)
+        self._views = [view for view in highlighter._views
+                       if view is not self]
+        highlighter._views = []
+        for view in self._views:
+            view._document_highlighter = self
+        self._document_highlighter = None
+        self._color_scheme = highlighter._color_scheme
+        editor = self.editor
+        if editor is None:
+            return
+        # the document must outlive the closed editor
+        document = editor.document()
+        document.setParent(editor)
+        if self.enabled:
+            self.setDocument(document)
+            if lazy or self.needs_lazy_highlighting(document.blockCount()):
+                self.lazy_rehighlight()
 
     def _highlight_whitespaces(self, text):
         index = self.WHITESPACES.indexIn(text, 0)
@@ -329,6 +466,16 @@ class SyntaxHighlighter(QtGui.QSyntaxHighlighter, Mode):
         if not self.enabled:
             return
         current_block = self.currentBlock()
+        if self._frontier is not None:
+            nbr = current_block.blockNumber()
+            if self._is_deferred(nbr):
+                # leaving the block state untouched stops the propagation to
+                # the next blocks, the block will be highlighted later.
+                if not self._highlight_deferred_block(text, current_block):
+                    # its formats are cleared until then
+                    self._highlighted_ahead.discard(nbr)
+                return
+            self._last_highlighted = nbr
         previous_block = self._find_prev_non_blank_block(current_block)
         if self.editor:
             self.highlight_block(text, current_block)
@@ -339,6 +486,22 @@ class SyntaxHighlighter(QtGui.QSyntaxHighlighter, Mode):
                 self.fold_detector.process_block(
                     current_block, previous_block, text)
 
+    def _highlight_deferred_block(self, text, block):
+        """
+        Re-applies the formats of a block that has not been reached by the
+        lazy highlighting yet, without changing its state (e.g. the block has
+        been edited or another mode asked to rehighlight it).
+
+        Subclasses that keep the formats of the blocks may override this
+        method. Default is to do nothing, the formats of the block are
+        cleared until the block is highlighted.
+
+        :param text: text of the block
+        :param block: the block
+        :returns: True if the formats of the block have been re-applied.
+        """
+        return False
+
     def highlight_block(self, text, block):
         """
         Abstract method. Override this to apply syntax highlighting.
@@ -351,27 +514,253 @@ class SyntaxHighlighter(QtGui.QSyntaxHighlighter, Mode):
     def rehighlight(self):
         """
         Rehighlight the entire document, may be slow.
+
+        Big documents (see :attr:`lazy_threshold`) are rehighlighted lazily.
+
+        The views of a shared document rehighlight it through the document
+        highlighter.
         """
+        if self._document_highlighter is not None:
+            self._document_highlighter.rehighlight()
+            return
+        if self.document() is None:
+            return
+        if self.needs_lazy_highlighting(self.document().blockCount()):
+            self.lazy_rehighlight()
+            return
         start = time.time()
         QtWidgets.QApplication.setOverrideCursor(
             QtGui.QCursor(QtCore.Qt.WaitCursor))
-        try:
-            super(SyntaxHighlighter, self).rehighlight()
-        except RuntimeError:
-            # cloned widget, no need to rehighlight the same document twice ;)
-            pass
+        super(SyntaxHighlighter, self).rehighlight()
         QtWidgets.QApplication.restoreOverrideCursor()
         end = time.time()
         _logger().debug('rehighlight duration: %fs' % (end - start))
 
+    @property
+    def cache_id(self):
+        """
+        Identifies the highlighter, its version and its settings in the
+        persistent highlighting cache (see
+        :class:`pyqode.core.cache.HighlightCache`).
+
+        Highlighters that support the cache must override this property,
+        default is None (the cache is not supported).
+        """
+        return None
+
+    def dump_highlighting(self):
+        """
+        Returns the highlighting data of the document, for the persistent
+        highlighting cache (see :class:`pyqode.core.cache.HighlightCache`).
+
+        Highlighters that support the cache must override this method and
+        :meth:`restore_highlighting`. Default implementation does not
+        support the cache and returns None.
+
+        :returns: a tuple made up of the highlighter cache id (which
+            identifies the highlighter, its version and its settings) and the
+            list of blocks data, or None if the data are not available (e.g.
+            the document has not been fully highlighted yet).
+        """
+        return None
+
+    def restore_highlighting(self, cache_id, blocks):
+        """
+        Restores the highlighting data of the document, from the persistent
+        highlighting cache. The document must have the content the data were
+        created from.
+
+        Default implementation does not support the cache and returns False.
+
+        :param cache_id: id of the highlighter that created the data
+        :param blocks: list of blocks data
+        :returns: True if the data have been restored, False if they were
+            not created by a compatible highlighter.
+        """
+        return False
+
+    def needs_lazy_highlighting(self, nb_blocks):
+        """
+        Checks if a document made up of ``nb_blocks`` blocks must be
+        highlighted lazily.
+
+        :param nb_blocks: number of blocks of the document.
+        """
+        return 0 <= self.lazy_threshold < nb_blocks
+
+    def lazy_rehighlight(self):
+        """
+        Rehighlights the document lazily: the visible blocks are highlighted
+        first, then the rest of the document is highlighted in small chunks
+        from the event loop. Progress is reported by the
+        :attr:`highlighting_progress` signal.
+
+        Blocks that have not been reached yet are not highlighted when the
+        document changes (their formats are cleared, unless the highlighter
+        can re-apply them, see ``_highlight_deferred_block``), they are
+        highlighted when the background highlighting reaches them (or when
+        they become visible, in any view of the document).
+        """
+        if self._document_highlighter is not None:
+            self._document_highlighter.lazy_rehighlight()
+            return
+        document = self.document()
+        if document is None:
+            return
+        self._frontier = QtGui.QTextCursor(document)
+        self._frontier.setKeepPositionOnInsert(True)
+        self._highlighted_ahead.clear()
+        self._watch_block_count(document)
+        self._update_viewport()
+        self._lazy_timer.start()
+
+    @property
+    def lazy_highlighting_in_progress(self):
+        """
+        True while the document is highlighted lazily.
+        """
+        return self.document_highlighter._frontier is not None
+
+    def lazy_highlighting_limit(self):
+        """
+        Returns the number of the first block that the lazy highlighting
+        must not reach yet. Subclasses that prepare their data in the
+        background may override this method so that blocks are not
+        highlighted before their data is ready, they must then call
+        ``_resume_lazy_highlighting`` when more data is available.
+
+        Default is to return the document's block count (no limit).
+        """
+        return self.document().blockCount()
+
+    def _resume_lazy_highlighting(self):
+        if self._frontier is not None:
+            self._lazy_timer.start()
+
+    def _stop_lazy_highlighting(self):
+        self._lazy_timer.stop()
+        self._frontier = None
+        self._highlighted_ahead.clear()
+        self._watch_block_count(None)
+
+    def _watch_block_count(self, document):
+        """
+        Forgets the blocks highlighted ahead of the frontier whenever the
+        block count of ``document`` changes: the numbers of the blocks that
+        follow the inserted or removed lines are shifted.
+        """
+        if self._watched_document is not None:
+            try:
+                self._watched_document.blockCountChanged.disconnect(
+                    self._on_block_count_changed)
+            except (TypeError, RuntimeError):
+                # document already deleted
+                pass
+        self._watched_document = document
+        if document is not None:
+            document.blockCountChanged.connect(self._on_block_count_changed)
+
+    def _on_block_count_changed(self, *args):
+        self._highlighted_ahead.clear()
+
+    def _is_deferred(self, nbr):
+        if nbr < self._frontier.blockNumber():
+            return False
+        if self._batch[0] <= nbr < self._batch[1]:
+            return False
+        for first, last in self._viewports:
+            if first <= nbr <= last:
+                return False
+        return True
+
+    def _update_viewport(self):
+        self._viewports = []
+        for view in [self] + self._views:
+            editor = view.editor
+            # hidden views (e.g. in another tab) do not need their blocks to
+            # be highlighted first
+            if editor is None or (view is not self and (
+                    not view.enabled or not editor.isVisible())):
+                continue
+            first = editor.firstVisibleBlock().blockNumber()
+            nb_lines = editor.viewport().height() // max(
+                1, editor.fontMetrics().height())
+            self._viewports.append((first, first + nb_lines + 1))
+
+    def _on_viewport_changed(self, *args):
+        highlighter = self.document_highlighter
+        if highlighter._frontier is not None:
+            highlighter._update_viewport()
+            highlighter._highlight_viewport()
+
+    def _highlight_viewport(self):
+        """
+        Highlights the visible blocks that have not been reached by the
+        background highlighting.
+        """
+        frontier = self._frontier.blockNumber()
+        for first, last in self._viewports:
+            block = self.document().findBlockByNumber(max(first, frontier))
+            while block.isValid() and block.blockNumber() <= last:
+                nbr = block.blockNumber()
+                if nbr not in self._highlighted_ahead:
+                    self._highlighted_ahead.add(nbr)
+                    self.rehighlightBlock(block)
+                block = block.next()
+
+    def _highlight_next_chunk(self):
+        document = self.document()
+        if self._frontier is None or document is None:
+            self._stop_lazy_highlighting()
+            return
+        self._update_viewport()
+        self._highlight_viewport()
+        deadline = time.time() + self.lazy_chunk_duration / 1000.0
+        limit = self.lazy_highlighting_limit()
+        block = self._frontier.block()
+        while block.isValid() and time.time() < deadline:
+            # rehighlighting the first block of a batch propagates to the
+            # next blocks of the batch as long as their state changes.
+            nbr = block.blockNumber()
+            if nbr >= limit:
+                # wait for _resume_lazy_highlighting
+                self._lazy_timer.stop()
+                break
+            self._batch = (nbr, min(nbr + self.LAZY_BATCH_SIZE, limit))
+            self._last_highlighted = nbr
+            self.rehighlightBlock(block)
+            block = document.findBlockByNumber(self._last_highlighted + 1)
+        self._batch = (-1, -1)
+        if block.isValid():
+            self._frontier.setPosition(block.position())
+            progress = 100 * block.blockNumber() // document.blockCount()
+        else:
+            self._stop_lazy_highlighting()
+            progress = 100
+        for view in [self] + self._views:
+            view.highlighting_progress.emit(progress)
+
     def on_install(self, editor):
         super(SyntaxHighlighter, self).on_install(editor)
         self.refresh_editor(self.color_scheme)
         self.document().setParent(editor)
         self.setParent(editor)
 
+    def on_uninstall(self):
+        if self._document_highlighter is not None:
+            self._document_highlighter._views.remove(self)
+            self._document_highlighter._on_viewport_changed()
+            self._document_highlighter = None
+        elif self._views:
+            # the document is still displayed by other editors
+            self._views[0]._take_over(self)
+        super(SyntaxHighlighter, self).on_uninstall()
+
     def clone_settings(self, original):
         self._color_scheme = original.color_scheme
+        if (self.editor is not None and original.editor is not None and
+                self.editor.document() is original.editor.document()):
+            self.share_document(original)
 
 
 class TextBlockUserData(QtGui.QTextBlockUserData):
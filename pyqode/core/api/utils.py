@@ -4,6 +4,7 @@ This module contains utility functions/classes.
 """
 import functools
 import logging
+import time
 import weakref
 
 from pyqode.qt import QtCore, QtGui, QtWidgets
@@ -45,6 +46,48 @@ class memoized(object):
         return functools.partial(self.__call__, obj)
 
 
+class LazyList(list):
+    """
+    A list whose items are loaded the first time it is used. Used for lists
+    that are expensive to compute (e.g. the list of pygments styles needs to
+    look up the pygments plugins) and that are not always needed.
+    """
+    def __init__(self, loader):
+        """
+        :param loader: function that returns the list items.
+        """
+        super(LazyList, self).__init__()
+        self._loader = loader
+
+    def _load(self):
+        loader, self._loader = self._loader, None
+        if loader is not None:
+            list.extend(self, loader())
+
+
+def _lazy_list_method(name):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        if self._loader is not None:
+            self._load()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+for _name in ['__add__', '__contains__', '__delitem__', '__eq__', '__ge__',
+              '__getitem__', '__gt__', '__iadd__', '__imul__', '__iter__',
+              '__le__', '__len__', '__lt__', '__mul__', '__ne__', '__repr__',
+              '__reversed__', '__rmul__', '__setitem__', 'append', 'copy',
+              'count', 'extend', 'index', 'insert', 'pop', 'remove',
+              'reverse', 'sort', '__getslice__', '__setslice__',
+              '__delslice__']:
+    if hasattr(list, _name):
+        setattr(LazyList, _name, _lazy_list_method(_name))
+
+
 def drift_color(base_color, factor=110):
     """
     Return color that is lighter or darker than the base color.
@@ -124,6 +167,470 @@ class DelayJobRunner(object):
         self._job(*self._args, **self._kwargs)
 
 
+class _Analysis(object):
+    """
+    State of the analysis of a mode, see :class:`AnalysisScheduler`.
+    """
+    def __init__(self, scheduler):
+        self.editor = None
+        self.job = None
+        self.delay = 0
+        #: the debounce delay elapsed, waiting for a free slot
+        self.ready = False
+        #: analysis requested while the previous one is running
+        self.pending = False
+        self.running = False
+        self.start_time = 0
+        #: average duration of the analysis (in ms), None until measured
+        self.latency = None
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(
+            functools.partial(scheduler._on_timeout, weakref.ref(self)))
+
+
+class AnalysisScheduler(QtCore.QObject):
+    """
+    Schedules the background analyses of the modes (checkers, outline,
+    occurrences,...) of all the editors.
+
+    Like :class:`DelayJobRunner`, an analysis only runs once the editor has
+    been idle for a while (the analysis is debounced) but:
+
+        - the debounce delay adapts to the analysis: it starts at the delay
+          requested by the mode and grows with the measured duration of the
+          analysis (:attr:`latency_factor`) and with the size of the document
+          (:attr:`line_cost`), up to :attr:`max_delay`.
+        - an analysis never runs twice at the same time for a given mode:
+          requests made while the analysis is running are run (once) when
+          the mode reports that its analysis :meth:`finished`.
+        - at most :attr:`max_running` analyses run at the same time, the
+          analyses of the visible editors run first, the analyses of the
+          hidden editors are delayed (:attr:`hidden_factor`).
+
+    A job is a callable that starts the analysis and returns True if the
+    analysis is running in the background, in which case the mode must call
+    :meth:`finished` when it receives the results. Any other return value
+    means the analysis is over (e.g. the backend is not running).
+
+    Use the shared scheduler returned by :meth:`instance`::
+
+        scheduler = AnalysisScheduler.instance()
+        scheduler.request(mode, mode.editor, mode.start_analysis, 500)
+
+        def on_results_available(results):
+            scheduler.finished(mode)
+
+    """
+    #: Maximum number of analyses running at the same time.
+    max_running = 4
+    #: The debounce delay is at least latency_factor times the average
+    #: duration of the analysis.
+    latency_factor = 2
+    #: Delay (in ms) added per line of the document.
+    line_cost = 0.01
+    #: Maximum debounce delay (in ms).
+    max_delay = 10000
+    #: The debounce delay is multiplied by this factor for hidden editors.
+    hidden_factor = 4
+    #: An analysis that does not report it finished after this delay (in ms)
+    #: is considered as finished (e.g. the backend died).
+    timeout = 60000
+
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        """
+        Returns the shared analysis scheduler.
+        """
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        super(AnalysisScheduler, self).__init__()
+        # mode -> _Analysis
+        self._analyses = weakref.WeakKeyDictionary()
+
+    def _get_analysis(self, key):
+        try:
+            return self._analyses[key]
+        except KeyError:
+            analysis = _Analysis(self)
+            self._analyses[key] = analysis
+            return analysis
+
+    def delay(self, key):
+        """
+        Returns the current debounce delay (in ms) of the analysis of a mode.
+        """
+        return self._get_delay(self._get_analysis(key))
+
+    def _get_delay(self, analysis):
+        delay = analysis.delay
+        if analysis.latency is not None:
+            delay = max(delay, self.latency_factor * analysis.latency)
+        editor = analysis.editor() if analysis.editor else None
+        if editor is not None:
+            try:
+                delay += self.line_cost * editor.blockCount()
+                if not editor.isVisible():
+                    delay *= self.hidden_factor
+            except RuntimeError:
+                # wrapped C/C++ object has been deleted
+                pass
+        return int(min(delay, self.max_delay))
+
+    def latency(self, key):
+        """
+        Returns the average duration (in ms) of the analysis of a mode, None
+        if it has never been measured.
+        """
+        return self._get_analysis(key).latency
+
+    def request(self, key, editor, job, delay, immediate=False):
+        """
+        Requests an analysis. The job is run once the debounce delay elapsed
+        if no other analysis has been requested for the same key, and once
+        the running analysis of the key (if any) finished.
+
+        :param key: the object that requests the analysis (the mode), there
+            is at most one analysis running per key.
+        :param editor: the editor to analyse.
+        :param job: callable that starts the analysis.
+        :param delay: the minimum debounce delay (in ms).
+        :param immediate: True to skip the debounce delay.
+        """
+        analysis = self._get_analysis(key)
+        analysis.editor = weakref.ref(editor)
+        analysis.job = job
+        analysis.delay = delay
+        if analysis.running:
+            analysis.pending = True
+            analysis.ready = analysis.ready or immediate
+            return
+        if immediate:
+            analysis.timer.stop()
+            analysis.ready = True
+            self._dispatch()
+        else:
+            analysis.ready = False
+            analysis.timer.start(self._get_delay(analysis))
+
+    def cancel(self, key):
+        """
+        Cancels the requested analysis of a mode (a running analysis is not
+        interrupted but its results should be ignored).
+        """
+        try:
+            analysis = self._analyses[key]
+        except KeyError:
+            return
+        analysis.timer.stop()
+        analysis.job = None
+        analysis.ready = analysis.pending = analysis.running = False
+        self._dispatch()
+
+    def finished(self, key):
+        """
+        Reports that the analysis of a mode finished. The duration of the
+        analysis is used to compute the next debounce delays.
+        """
+        try:
+            analysis = self._analyses[key]
+        except KeyError:
+            return
+        if not analysis.running:
+            return
+        self._finish(analysis, time.time())
+        self._dispatch()
+
+    def is_running(self, key):
+        """
+        Returns True if the analysis of a mode is running.
+        """
+        try:
+            return self._analyses[key].running
+        except KeyError:
+            return False
+
+    def _finish(self, analysis, end_time):
+        analysis.running = False
+        analysis.timer.stop()
+        if end_time is not None:
+            latency = (end_time - analysis.start_time) * 1000
+            if analysis.latency is None:
+                analysis.latency = latency
+            else:
+                analysis.latency = 0.7 * analysis.latency + 0.3 * latency
+        if analysis.pending:
+            # run the analysis requested while it was running (ready means
+            # it was requested without debounce)
+            analysis.pending = False
+            if analysis.ready:
+                analysis.timer.start(0)
+            else:
+                analysis.timer.start(self._get_delay(analysis))
+            analysis.ready = False
+
+    def _on_timeout(self, analysis_ref):
+        analysis = analysis_ref()
+        if analysis is None:
+            return
+        if analysis.running:
+            # the analysis never reported it finished
+            self._finish(analysis, None)
+        else:
+            analysis.ready = True
+        self._dispatch()
+
+    @staticmethod
+    def _is_hidden(analysis):
+        editor = analysis.editor() if analysis.editor else None
+        try:
+            return editor is None or not editor.isVisible()
+        except RuntimeError:
+            return True
+
+    def _dispatch(self):
+        """
+        Runs the ready analyses, visible editors first, while there are less
+        than :attr:`max_running` analyses running.
+        """
+        analyses = list(self._analyses.values())
+        nb_running = len([a for a in analyses if a.running])
+        ready = [a for a in analyses if a.ready and not a.running]
+        ready.sort(key=self._is_hidden)
+        for analysis in ready:
+            if nb_running >= self.max_running:
+                break
+            job = analysis.job
+            analysis.ready = False
+            analysis.job = None
+            if job is None:
+                continue
+            analysis.running = True
+            analysis.start_time = time.time()
+            try:
+                running = job()
+            except Exception:
+                _logger().exception('failed to run analysis %r', job)
+                running = False
+            if not analysis.running:
+                # finished synchronously
+                continue
+            if running is True:
+                nb_running += 1
+                analysis.timer.start(self.timeout)
+            else:
+                self._finish(analysis, None)
+
+
+class IntervalTree(object):
+    """
+    Static interval tree: finds the intervals that overlap a position range in
+    ``O(log(n) + k)``.
+
+    The intervals are sorted by start and stored in a flat array, the tree is
+    implicit: the root of a slice of the array is its middle item and each
+    node stores the maximum end of its subtree.
+
+    Bounds are inclusive. The tree cannot be modified, create a new one when
+    the intervals change.
+    """
+
+    def __init__(self, intervals=()):
+        """
+        :param intervals: iterable of (start, end, value) tuples.
+        """
+        intervals = sorted(intervals, key=lambda interval: interval[0])
+        self._starts = [interval[0] for interval in intervals]
+        self._ends = [interval[1] for interval in intervals]
+        self._values = [interval[2] for interval in intervals]
+        self._max_ends = list(self._ends)
+        if intervals:
+            self._build(0, len(intervals))
+
+    def _build(self, lo, hi):
+        mid = (lo + hi) // 2
+        max_end = self._ends[mid]
+        if lo < mid:
+            max_end = max(max_end, self._build(lo, mid))
+        if mid + 1 < hi:
+            max_end = max(max_end, self._build(mid + 1, hi))
+        self._max_ends[mid] = max_end
+        return max_end
+
+    def __len__(self):
+        return len(self._values)
+
+    def overlap(self, start, end):
+        """
+        Returns the values of the intervals that overlap ``[start, end]``,
+        sorted by interval start.
+        """
+        starts = self._starts
+        ends = self._ends
+        max_ends = self._max_ends
+        indices = []
+        stack = [(0, len(starts))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if max_ends[mid] < start:
+                # every interval of this subtree ends before start
+                continue
+            stack.append((lo, mid))
+            if starts[mid] <= end:
+                if ends[mid] >= start:
+                    indices.append(mid)
+                # the intervals of the right subtree do not start before mid
+                stack.append((mid + 1, hi))
+        indices.sort()
+        return [self._values[i] for i in indices]
+
+    def at(self, position):
+        """
+        Returns the values of the intervals that contain ``position``, sorted
+        by interval start.
+        """
+        return self.overlap(position, position)
+
+
+class PositionIndex(object):
+    """
+    Lazily built :class:`IntervalTree` of items that span a range of
+    positions in the document of an editor (decorations, markers,...).
+
+    The tree is built from the intervals returned by ``get_intervals`` the
+    first time it is queried and is thrown away each time the content of the
+    document changes (positions may have moved) or when the owner calls
+    :meth:`invalidate` (the items changed).
+
+    Owners that add or remove a few items at a time should call :meth:`add`
+    and :meth:`remove` instead of :meth:`invalidate`: the changes are kept
+    aside and merged with the results of the tree, the tree is only rebuilt
+    once there are too many of them.
+
+    ::
+
+        index = PositionIndex(editor, lambda: [
+            (marker.start, marker.end, marker) for marker in markers])
+        markers_under_mouse = index.at(cursor.position())
+
+    """
+    #: Minimum number of changes kept aside before the tree is rebuilt (the
+    #: limit grows with the size of the tree)
+    max_changes = 64
+
+    def __init__(self, editor, get_intervals):
+        """
+        :param editor: CodeEdit instance
+        :param get_intervals: callable that returns an iterable of
+            (start, end, value) tuples.
+        """
+        self._editor = weakref.ref(editor)
+        self._get_intervals = get_intervals
+        self._document = None
+        self._tree = None
+        # intervals added since the tree was built
+        self._added = []
+        # ids of the values of the tree that have been removed
+        self._removed = set()
+
+    def invalidate(self):
+        """
+        Invalidates the index, it will be rebuilt the next time it is queried.
+        """
+        self._tree = None
+        self._added = []
+        self._removed = set()
+
+    def _on_contents_change(self, *args):
+        self.invalidate()
+
+    def add(self, start, end, value):
+        """
+        Adds an item to the index.
+
+        :param start: start position
+        :param end: end position
+        :param value: the item
+        """
+        if self._tree is None:
+            # the item will be returned by get_intervals
+            return
+        self._added.append((start, end, value))
+        self._check_changes()
+
+    def remove(self, value):
+        """
+        Removes an item from the index.
+
+        :param value: the item
+        """
+        if self._tree is None:
+            return
+        for i, interval in enumerate(self._added):
+            if interval[2] is value:
+                del self._added[i]
+                break
+        # the item may also be in the tree (removed then added again)
+        self._removed.add(id(value))
+        self._check_changes()
+
+    def _check_changes(self):
+        nb_changes = len(self._added) + len(self._removed)
+        if nb_changes > max(self.max_changes, len(self._tree) // 16):
+            self.invalidate()
+
+    def _get_tree(self):
+        editor = self._editor()
+        if editor is None:
+            return IntervalTree()
+        document = editor.document()
+        if document is not self._document:
+            if self._document is not None:
+                try:
+                    self._document.contentsChange.disconnect(
+                        self._on_contents_change)
+                except (RuntimeError, TypeError):
+                    pass
+            document.contentsChange.connect(self._on_contents_change)
+            self._document = document
+            self.invalidate()
+        if self._tree is None:
+            self._tree = IntervalTree(self._get_intervals())
+            self._added = []
+            self._removed = set()
+        return self._tree
+
+    def overlap(self, start, end):
+        """
+        Returns the items that overlap the ``[start, end]`` position range.
+
+        Items are sorted by start position, except the items added since the
+        tree was built, which come last.
+        """
+        values = self._get_tree().overlap(start, end)
+        if self._removed:
+            removed = self._removed
+            values = [value for value in values if id(value) not in removed]
+        for interval in self._added:
+            if interval[0] <= end and interval[1] >= start:
+                values.append(interval[2])
+        return values
+
+    def at(self, position):
+        """
+        Returns the items that contain ``position``.
+        """
+        return self.overlap(position, position)
+
+
 class TextHelper(object):
     """
     Text helper helps you manipulate the content of CodeEdit and extends the
@@ -50,6 +50,17 @@ E.g::
         'results': ['some code', 0]
     }
 
+If the worker is a generator, each yielded value is sent as a response with an
+additional 'partial' field set to True, except the last one which is sent as
+a regular response. The client callback is called for each response.
+
+If the worker fails (it cannot be imported or it raises an exception), the
+response has an additional 'error' field set to True and its results are an
+empty list, except for a generator that raises after it yielded a value: the
+last yielded value is then sent as the final response. The client is notified
+of the error through the ``on_error`` callback of
+:meth:`pyqode.core.managers.BackendManager.send_request`.
+
 Server script
 -------------
 
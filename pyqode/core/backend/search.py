@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the text search engine used by the search workers.
+
+Search patterns are always turned into a compiled regular expression (plain
+text searches are escaped and whole words are handled by the regex engine)
+and the compiled patterns are kept in a small cache so that successive
+searches do not need to recompile them.
+
+The module also contains the functions used to search all the files of a
+directory tree (find in files).
+
+.. warning::
+    Like :mod:`pyqode.core.backend.workers`, this module runs on the server
+    side and must support python2 syntax and keep its dependencies as low as
+    possible.
+
+"""
+import codecs
+import fnmatch
+import locale
+import multiprocessing
+import os
+import re
+from collections import OrderedDict
+
+
+#: Characters that delimit a whole word.
+WORD_SEPARATORS = [
+    '~', '!', '@', '#', '$', '%', '^', '&', '*', '(', ')', '+', '{',
+    '}', '|', ':', '"', "'", "<", ">", "?", ",", ".", "/", ";", '[',
+    ']', '\\', '\n', '\t', '=', '-', ' '
+]
+
+#: Maximum number of compiled patterns kept in the cache.
+CACHE_SIZE = 64
+
+_cache = OrderedDict()
+
+# a whole word is not preceded nor followed by a character that is not a
+# word separator (the start and the end of the string are separators).
+_NOT_SEPARATOR = '[^%s]' % ''.join(re.escape(c) for c in WORD_SEPARATORS)
+
+
+def compile_pattern(sub, regex=False, case_sensitive=False,
+                    whole_word=False):
+    """
+    Returns the compiled regular expression for the given search options.
+
+    Patterns are cached, compiling the same pattern twice is a cheap dict
+    lookup.
+
+    :param sub: string to search
+    :param regex: True if ``sub`` is a regular expression
+    :param case_sensitive: True to match case, False to ignore case
+    :param whole_word: True to match whole words only (ignored for regular
+        expressions)
+    :raises: re.error if ``sub`` is an invalid regular expression.
+    """
+    key = (sub, regex, case_sensitive, whole_word)
+    try:
+        pattern = _cache.pop(key)
+    except KeyError:
+        flags = re.MULTILINE
+        if not case_sensitive:
+            flags |= re.IGNORECASE
+        if regex:
+            ptrn = sub
+        else:
+            ptrn = re.escape(sub)
+            if whole_word:
+                # the lookbehind is put after the literal so that the regex
+                # engine can still use its fast literal search.
+                ptrn = '%s(?<!%s%s)(?!%s)' % (ptrn, _NOT_SEPARATOR, ptrn,
+                                              _NOT_SEPARATOR)
+        pattern = re.compile(ptrn, flags)
+        while len(_cache) >= CACHE_SIZE:
+            _cache.popitem(last=False)
+    _cache[key] = pattern
+    return pattern
+
+
+def clear_cache():
+    """
+    Clears the compiled patterns cache.
+    """
+    _cache.clear()
+
+
+def _get_pattern_and_text(string, sub, regex, case_sensitive, whole_word):
+    if not regex and not case_sensitive:
+        # re.IGNORECASE disables the fast literal search of the regex engine,
+        # searching a lowercase copy of the text is a lot faster. This is only
+        # possible if lowering the text does not change its length (offsets
+        # would be shifted).
+        lowered = string.lower()
+        if len(lowered) == len(string):
+            return compile_pattern(sub.lower(), case_sensitive=True,
+                                   whole_word=whole_word), lowered
+    return compile_pattern(sub, regex=regex, case_sensitive=case_sensitive,
+                           whole_word=whole_word), string
+
+
+def finditer(string, sub, regex=False, case_sensitive=False,
+             whole_word=False):
+    """
+    Generator that yields the (start, end) span of all occurrences of ``sub``
+    in ``string``.
+
+    :param string: string to parse
+    :param sub: string to search
+    :param regex: True to search using regex
+    :param case_sensitive: True to match case, False to ignore case
+    :param whole_word: True to returns only whole words
+    """
+    if not sub:
+        return
+    pattern, string = _get_pattern_and_text(
+        string, sub, regex, case_sensitive, whole_word)
+    for match in pattern.finditer(string):
+        yield match.span()
+
+
+def search(string, sub, regex=False, case_sensitive=False, whole_word=False,
+           max_results=-1):
+    """
+    Finds the occurrences of ``sub`` in ``string``, returning at most
+    ``max_results`` occurrences along with the total number of occurrences.
+
+    :param string: string to parse
+    :param sub: string to search
+    :param regex: True to search using regex
+    :param case_sensitive: True to match case, False to ignore case
+    :param whole_word: True to returns only whole words
+    :param max_results: maximum number of occurrences to return, -1 to return
+        all of them.
+    :returns: a tuple made up of the list of occurrences spans and the total
+        number of occurrences.
+    """
+    occurrences = []
+    if not sub:
+        return occurrences, 0
+    pattern, string = _get_pattern_and_text(
+        string, sub, regex, case_sensitive, whole_word)
+    iterator = pattern.finditer(string)
+    for match in iterator:
+        if len(occurrences) == max_results:
+            # only count the remaining occurrences
+            return occurrences, max_results + 1 + sum(1 for _ in iterator)
+        occurrences.append(match.span())
+    return occurrences, len(occurrences)
+
+
+#: Patterns of the file and directory names that are ignored by default when
+#: searching a directory tree.
+DEFAULT_IGNORE_PATTERNS = [
+    '.git', '.hg', '.svn', '.tox', '.eggs', '__pycache__', '*.egg-info',
+    '*.pyc', '*.pyo', '*.so', '*.dll', '*.exe', '*.o', '*.a', '*.zip',
+    '*.gz', '*.png', '*.jpg', '*.gif', '*.ico', '*.pdf'
+]
+
+#: Files bigger than this size (in bytes) are skipped.
+MAX_FILE_SIZE = 10000000
+
+_BOMS = [
+    (codecs.BOM_UTF8, 'utf_8_sig'),
+    (codecs.BOM_UTF32_LE, 'utf_32'),
+    (codecs.BOM_UTF32_BE, 'utf_32'),
+    (codecs.BOM_UTF16_LE, 'utf_16'),
+    (codecs.BOM_UTF16_BE, 'utf_16'),
+]
+
+
+def _is_ignored(name, ignore_patterns):
+    for pattern in ignore_patterns:
+        if fnmatch.fnmatch(name, pattern):
+            return True
+    return False
+
+
+def iter_files(root, ignore_patterns=None):
+    """
+    Walks a directory tree and yields the path of every file whose name (and
+    parent directories names) do not match any of the ignore patterns.
+
+    :param root: root directory
+    :param ignore_patterns: list of fnmatch patterns, default is
+        :data:`DEFAULT_IGNORE_PATTERNS`
+    """
+    if ignore_patterns is None:
+        ignore_patterns = DEFAULT_IGNORE_PATTERNS
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames
+                             if not _is_ignored(d, ignore_patterns))
+        for name in sorted(filenames):
+            if not _is_ignored(name, ignore_patterns):
+                yield os.path.join(dirpath, name)
+
+
+def read_file(path, encodings=None):
+    """
+    Reads a text file, detecting its encoding.
+
+    The encoding is taken from the BOM if there is one, otherwise the
+    encodings are tried in order. Binary files (files that contain a null
+    byte) and files bigger than :data:`MAX_FILE_SIZE` are skipped.
+
+    :param path: path of the file to read
+    :param encodings: list of encodings to try, default is utf-8 then the
+        locale preferred encoding.
+    :returns: the file content (with normalized line endings) and its
+        encoding or (None, None) if the file could not be decoded.
+    """
+    if os.path.getsize(path) > MAX_FILE_SIZE:
+        return None, None
+    with open(path, 'rb') as f:
+        data = f.read()
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            encodings = [encoding]
+            break
+    else:
+        if b'\0' in data[:8192]:
+            return None, None
+        if not encodings:
+            encodings = ['utf_8', locale.getpreferredencoding()]
+    for encoding in encodings:
+        try:
+            text = data.decode(encoding)
+        except (UnicodeDecodeError, LookupError):
+            continue
+        else:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+            return text, encoding
+    return None, None
+
+
+def search_file(path, sub, regex=False, case_sensitive=False,
+                whole_word=False, encodings=None, max_results=-1):
+    """
+    Searches the occurrences of ``sub`` in a file.
+
+    :param path: path of the file to search
+    :param sub: string to search
+    :param regex: True to search using regex
+    :param case_sensitive: True to match case, False to ignore case
+    :param whole_word: True to returns only whole words
+    :param encodings: list of encodings to try (see :func:`read_file`)
+    :param max_results: maximum number of occurrences, -1 for no limit.
+    :returns: list of (path, line, column, preview) tuples. Line and column
+        are 0 based.
+    """
+    hits = []
+    try:
+        text, _ = read_file(path, encodings=encodings)
+    except (IOError, OSError):
+        return hits
+    if not text:
+        return hits
+    line = 0
+    line_start = 0
+    for start, end in finditer(text, sub, regex=regex,
+                               case_sensitive=case_sensitive,
+                               whole_word=whole_word):
+        if len(hits) == max_results:
+            break
+        if start > line_start:
+            line += text.count('\n', line_start, start)
+            line_start = text.rfind('\n', 0, start) + 1
+        line_end = text.find('\n', start)
+        if line_end == -1:
+            line_end = len(text)
+        preview = text[line_start:line_end]
+        hits.append((path, line, start - line_start, preview))
+    return hits
+
+
+def _search_file_task(args):
+    # used by the process pool, must be a picklable module level function
+    return search_file(*args)
+
+
+def find_in_files(root, sub, regex=False, case_sensitive=False,
+                  whole_word=False, ignore_patterns=None, encodings=None,
+                  processes=None, max_results=-1):
+    """
+    Generator that searches all the files of a directory tree, in parallel,
+    and yields the hits of each file as soon as they are available.
+
+    Options have the same semantics as :func:`finditer`.
+
+    :param root: root directory
+    :param sub: string to search
+    :param regex: True to search using regex
+    :param case_sensitive: True to match case, False to ignore case
+    :param whole_word: True to returns only whole words
+    :param ignore_patterns: list of fnmatch patterns of the file and
+        directory names to ignore, default is :data:`DEFAULT_IGNORE_PATTERNS`
+    :param encodings: list of encodings to try (see :func:`read_file`)
+    :param processes: number of processes used to scan files. None to use
+        the number of CPUs, 0 or 1 to scan files in the current process.
+    :param max_results: maximum number of hits, -1 for no limit.
+    :returns: a generator of list of (path, line, column, preview) tuples,
+        one list per file that contains at least one hit.
+    """
+    if not sub:
+        return
+    # check the pattern before starting child processes
+    compile_pattern(sub, regex=regex, case_sensitive=case_sensitive,
+                    whole_word=whole_word)
+    tasks = ((path, sub, regex, case_sensitive, whole_word, encodings,
+              max_results)
+             for path in iter_files(root, ignore_patterns=ignore_patterns))
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    pool = None
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap_unordered(_search_file_task, tasks, chunksize=8)
+    else:
+        results = (_search_file_task(task) for task in tasks)
+    nb_hits = 0
+    try:
+        for hits in results:
+            if not hits:
+                continue
+            if max_results != -1 and nb_hits + len(hits) >= max_results:
+                yield hits[:max_results - nb_hits]
+                return
+            nb_hits += len(hits)
+            yield hits
+    finally:
+        if pool is not None:
+            pool.terminate()
@@ -113,6 +113,41 @@ class JsonServer(socketserver.TCPServer):
             self.srv.timeout = HEARTBEAT_DELAY
             self.srv.reset_heartbeat()
 
+        def _stream(self, request_id, generator):
+            """
+            Streams the results of a generator worker: every yielded value
+            is sent as a partial response, except the last one which is
+            returned (to be sent as the final response).
+
+            If the generator raises after it yielded a value, the last
+            yielded value is still returned, so that the final response has
+            the same shape as the partial responses.
+
+            :returns: a tuple made up of the last yielded value and a flag
+                that is True if the generator raised an exception.
+            """
+            nothing = object()
+            last = nothing
+            error = False
+            while True:
+                try:
+                    value = next(generator)
+                except StopIteration:
+                    break
+                except Exception:
+                    if last is nothing:
+                        raise
+                    _logger().exception('generator worker failed')
+                    error = True
+                    break
+                if last is not nothing:
+                    self.send({'request_id': request_id, 'results': last,
+                               'partial': True})
+                last = value
+            if last is nothing:
+                last = None
+            return last, error
+
         def _handle(self, data):
             """
             Handles a work request.
@@ -123,10 +158,12 @@ class JsonServer(socketserver.TCPServer):
                 assert data['request_id']
                 assert data['data'] is not None
                 response = {'request_id': data['request_id'], 'results': []}
+                error = False
                 try:
                     worker = import_class(data['worker'])
                 except ImportError:
                     _logger().exception('Failed to import worker class')
+                    response['error'] = True
                 else:
                     if inspect.isclass(worker):
                         worker = worker()
@@ -134,15 +171,21 @@ class JsonServer(socketserver.TCPServer):
                     _logger().log(1, 'data: %r', data['data'])
                     try:
                         ret_val = worker(data['data'])
+                        if inspect.isgenerator(ret_val):
+                            ret_val, error = self._stream(
+                                data['request_id'], ret_val)
                     except Exception:
                         _logger().exception(
                             'something went bad with worker %r(data=%r)',
                             worker, data['data'])
                         ret_val = None
+                        error = True
                     if ret_val is None:
                         ret_val = []
                     response = {'request_id': data['request_id'],
                                 'results': ret_val}
+                    if error:
+                        response['error'] = True
                 finally:
                     _logger().log(1, 'sending response: %r', response)
                     try:
@@ -17,10 +17,12 @@ A worker is always tightly coupled with its caller, so are the data.
 
 """
 import logging
-import re
 import sys
+import time
 import traceback
 
+from pyqode.core.backend import search
+
 
 def echo_worker(data):
     """
@@ -64,6 +66,12 @@ class CodeCompletionWorker(object):
             def complete(self, code, line, column, path, encoding, prefix):
                 pass
 
+        If a provider does not return all the possible candidates for the
+        given prefix (e.g. because the list has been truncated), it can
+        return a ``(completions, incomplete)`` tuple instead of the list.
+        Incomplete results won't be narrowed on the client side, a new
+        request is issued each time the prefix changes.
+
         """
 
         def complete(self, code, line, column, path, encoding, prefix):
@@ -102,10 +110,13 @@ class CodeCompletionWorker(object):
         prefix = data['prefix']
         req_id = data['request_id']
         completions = []
+        incomplete = False
         for prov in CodeCompletionWorker.providers:
             try:
                 results = prov.complete(
                     code, line, column, path, encoding, prefix)
+                if isinstance(results, tuple):
+                    results, incomplete = results
                 completions.append(results)
                 if len(completions):
                     break
@@ -114,7 +125,7 @@ class CodeCompletionWorker(object):
                                  % prov)
                 exc1, exc2, exc3 = sys.exc_info()
                 traceback.print_exception(exc1, exc2, exc3, file=sys.stderr)
-        return [(line, column, req_id)] + completions
+        return [(line, column, req_id, incomplete)] + completions
 
 
 class DocumentWordsProvider(object):
@@ -124,11 +135,7 @@ class DocumentWordsProvider(object):
     words = {}
 
     # word separators
-    separators = [
-        '~', '!', '@', '#', '$', '%', '^', '&', '*', '(', ')', '+', '{',
-        '}', '|', ':', '"', "'", "<", ">", "?", ",", ".", "/", ";", '[',
-        ']', '\\', '\n', '\t', '=', '-', ' '
-    ]
+    separators = search.WORD_SEPARATORS
 
     @staticmethod
     def split(txt, seps):
@@ -210,20 +217,9 @@ def findalliter(string, sub, regex=False, case_sensitive=False,
     :param whole_word: True to returns only whole words
     :return:
     """
-    if not sub:
-        return
-    if regex:
-        flags = re.MULTILINE
-        if not case_sensitive:
-            flags |= re.IGNORECASE
-        for val in re.finditer(sub, string, flags):
-            yield val.span()
-    else:
-        if not case_sensitive:
-            string = string.lower()
-            sub = sub.lower()
-        for val in finditer_noregex(string, sub, whole_word):
-            yield val, val + len(sub)
+    return search.finditer(string, sub, regex=regex,
+                           case_sensitive=case_sensitive,
+                           whole_word=whole_word)
 
 
 def findall(data):
@@ -244,3 +240,79 @@ def findall(data):
     return list(findalliter(
         data['string'], data['sub'], regex=data['regex'],
         whole_word=data['whole_word'], case_sensitive=data['case_sensitive']))
+
+
+def findall_limited(data):
+    """
+    Worker that finds the first occurrences of a given string (or regex) in a
+    given text and counts all of them.
+
+    :param data: Request data dict, same as :func:`findall` with an
+        additional 'max_results' key (maximum number of occurrences to
+        return).
+    :return: a tuple made up of the list of occurrence positions and the
+        total number of occurrences in text.
+    """
+    return search.search(
+        data['string'], data['sub'], regex=data['regex'],
+        whole_word=data['whole_word'], case_sensitive=data['case_sensitive'],
+        max_results=data['max_results'])
+
+
+def findinfiles(data):
+    """
+    Worker that finds all occurrences of a given string (or regex) in the
+    files of a directory tree. The files are searched in parallel, using a
+    pool of processes.
+
+    This worker is a generator: results are streamed back to the caller as
+    they are found, the ``on_receive`` callback is called once per chunk of
+    results. The last chunk has its 'done' key set to True, its 'error' key
+    is set to True if the search failed.
+
+    .. note:: The backend process handles requests one at a time, you might
+        want to use a dedicated backend to search big directory trees.
+
+    :param data: Request data dict::
+        {
+            'root': path of the root directory
+            'sub': string to search
+            'regex': True to consider string as a regular expression
+            'whole_word': True to match whole words only.
+            'case_sensitive': True to match case, False to ignore case
+            'ignore_patterns': optional list of fnmatch patterns to ignore
+            'encodings': optional list of encodings to try
+            'processes': optional number of processes (None: cpu count)
+            'max_results': optional maximum number of hits (-1: no limit)
+        }
+    :return: generator of chunk dicts::
+        {
+            'hits': list of (path, line, column, preview) tuples
+            'done': True for the last chunk
+            'error': True if the search failed (last chunk)
+        }
+    """
+    hits = []
+    last_time = time.time()
+    error = False
+    try:
+        for file_hits in search.find_in_files(
+                data['root'], data['sub'], regex=data['regex'],
+                case_sensitive=data['case_sensitive'],
+                whole_word=data['whole_word'],
+                ignore_patterns=data.get('ignore_patterns'),
+                encodings=data.get('encodings'),
+                processes=data.get('processes'),
+                max_results=data.get('max_results', -1)):
+            hits += file_hits
+            # don't flood the client with tiny messages
+            if time.time() - last_time > 0.1:
+                yield {'hits': hits, 'done': False, 'error': False}
+                hits = []
+                last_time = time.time()
+    except Exception:
+        sys.stderr.write('Failed to search files in %r\n' % data['root'])
+        exc1, exc2, exc3 = sys.exc_info()
+        traceback.print_exception(exc1, exc2, exc3, file=sys.stderr)
+        error = True
+    yield {'hits': hits, 'done': True, 'error': error}
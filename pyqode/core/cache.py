@@ -11,15 +11,27 @@ file so that we can reuse it automatically next time the user want to
 open the same file.
 
 We also use this to cache some editor states (such as the last cursor position
-for a specific file path)
+or the collapsed fold regions for a specific file path)
+
+The syntax highlighting and folding data of big files are cached on disk
+(see :class:`HighlightCache`) so that re-opening a file does not need to lex
+it again.
 
 We do not store editor styles and settings here. Those kind of settings are
 better handled at the application level.
 
 """
+import array
+import hashlib
 import json
 import locale
 import logging
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
 from pyqode.qt import QtCore
 
 try:
@@ -155,6 +167,291 @@ class Cache(object):
         map[path] = position
         self._settings.setValue('cachedCursorPosition', json.dumps(map))
 
+    def get_fold_state(self, file_path):
+        """
+        Gets the cached fold state of file_path.
+
+        :param file_path: path of the file in the cache
+        :return: The list of the collapsed fold regions, each region being a
+            (trigger line, fingerprint) tuple. An empty list if no fold state
+            were cached for the file.
+        """
+        try:
+            map = json.loads(self._settings.value('cachedFoldState'))
+        except TypeError:
+            map = {}
+        return [tuple(region) for region in map.get(file_path, [])]
+
+    def set_fold_state(self, path, regions):
+        """
+        Cache the fold state of the specified file path.
+
+        :param path: path of the file to cache
+        :param regions: list of the collapsed fold regions, as (trigger line,
+            fingerprint) tuples. An empty list removes the file from the
+            cache.
+        """
+        try:
+            map = json.loads(self._settings.value('cachedFoldState'))
+        except TypeError:
+            map = {}
+        if regions:
+            map[path] = [list(region) for region in regions]
+        elif map.pop(path, None) is None:
+            return
+        self._settings.setValue('cachedFoldState', json.dumps(map))
+
+
+class HighlightCache(object):
+    """
+    Persistent, on-disk cache of the syntax highlighting and folding data of
+    documents.
+
+    Entries are keyed by the hash of the document content and by the hash of
+    the id of the highlighter (lexer and highlighter version) that created
+    them, see :attr:`pyqode.core.api.SyntaxHighlighter.cache_id`: the entries
+    of different highlighters do not overwrite each other and the entries of
+    an old highlighter version are evicted like the other unused entries.
+
+    An entry is made up of the list of the document blocks data, each block
+    data being a tuple made up of:
+
+        - the block user state (fold level and fold trigger bits)
+        - the highlighter state at the end of the block (a tuple of strings
+          or None)
+        - the block format runs: a tuple of (start, length, format name)
+
+    Entries are stored in a compact binary file (one file per entry). The
+    least recently used entries are removed when the cache gets bigger than
+    :attr:`max_size` and entries older than :attr:`max_age` are removed.
+    """
+    #: Version of the file format.
+    FORMAT_VERSION = 1
+    #: Documents with fewer lines than this are not worth caching.
+    MIN_LINES = 1000
+
+    _MAGIC = b'PQHC'
+    _HEADER = struct.Struct('>4sHI')
+
+    def __init__(self, directory=None, max_size=100 * 1024 * 1024,
+                 max_age=30 * 24 * 3600):
+        """
+        :param directory: cache directory, default is a subdirectory of the
+            user cache directory.
+        :param max_size: maximum size of the cache, in bytes.
+        :param max_age: maximum age of the cache entries, in seconds.
+        """
+        if directory is None:
+            directory = self._default_directory()
+        #: Cache directory
+        self.directory = directory
+        #: Maximum size of the cache, in bytes
+        self.max_size = max_size
+        #: Maximum age of the cache entries, in seconds
+        self.max_age = max_age
+
+    @staticmethod
+    def _default_directory():
+        try:
+            root = QtCore.QStandardPaths.writableLocation(
+                QtCore.QStandardPaths.CacheLocation)
+        except AttributeError:
+            # Qt4
+            root = ''
+        if not root:
+            root = tempfile.gettempdir()
+        return os.path.join(root, 'pyqode.core', 'highlighting')
+
+    @staticmethod
+    def _content_key(text):
+        return hashlib.sha1(text.encode(
+            'utf-8', 'surrogatepass')).hexdigest()
+
+    @classmethod
+    def key(cls, text, cache_id):
+        """
+        Returns the cache key of a document content highlighted by a given
+        highlighter.
+
+        :param text: document content
+        :param cache_id: id of the highlighter
+        """
+        return '%s-%s' % (cls._content_key(text), hashlib.sha1(
+            cache_id.encode('utf-8')).hexdigest()[:16])
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.bin')
+
+    def has_entry(self, text):
+        """
+        Checks if there is an entry for a document content, whatever the
+        highlighter that created it.
+
+        :param text: document content
+        """
+        prefix = self._content_key(text) + '-'
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return False
+        return any(name.startswith(prefix) for name in names)
+
+    def load(self, text, cache_id):
+        """
+        Loads the entry of a document content highlighted by a given
+        highlighter.
+
+        :param text: document content
+        :param cache_id: id of the highlighter
+        :returns: a tuple made up of the highlighter cache id and the list of
+            the blocks data, or None if there is no (valid) entry.
+        """
+        path = self._path(self.key(text, cache_id))
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # update the access time, entries are evicted by access time
+            os.utime(path, None)
+        except (IOError, OSError):
+            return None
+        try:
+            return self._decode(data)
+        except (ValueError, TypeError, KeyError, IndexError, struct.error,
+                zlib.error):
+            _logger().warning('invalid highlighting cache entry: %s', path)
+            self._remove(path)
+            return None
+
+    def save(self, text, cache_id, blocks):
+        """
+        Saves the entry of a document content and evicts the oldest entries
+        if needed.
+
+        :param text: document content
+        :param cache_id: id of the highlighter that created the blocks data
+        :param blocks: list of blocks data
+        """
+        data = self._encode(cache_id, blocks)
+        try:
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+            path = self._path(self.key(text, cache_id))
+            tmp_path = path + '~'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            if os.path.exists(path):
+                os.remove(path)
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            _logger().warning('failed to save highlighting cache entry',
+                              exc_info=True)
+        else:
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the entries older than :attr:`max_age` and the least recently
+        used entries while the cache is bigger than :attr:`max_size`.
+        """
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        entries = []
+        now = time.time()
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.max_age:
+                self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            self._remove(path)
+            size -= entry_size
+
+    def clear(self):
+        """
+        Removes all the cache entries.
+        """
+        self.max_size, max_size = -1, self.max_size
+        try:
+            self.evict()
+        finally:
+            self.max_size = max_size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _encode(self, cache_id, blocks):
+        names = {}
+        stacks = {None: -1}
+        values = array.array('i')
+        for state, stack, runs in blocks:
+            try:
+                stack_index = stacks[stack]
+            except KeyError:
+                stack_index = stacks[stack] = len(stacks) - 1
+            values.extend((state, stack_index, len(runs)))
+            for start, length, name in runs:
+                try:
+                    name_index = names[name]
+                except KeyError:
+                    name_index = names[name] = len(names)
+                values.extend((start, length, name_index))
+        del stacks[None]
+        header = json.dumps({
+            'id': cache_id,
+            'byteorder': sys.byteorder,
+            'names': sorted(names, key=names.get),
+            'stacks': sorted(stacks, key=stacks.get)
+        }).encode('utf-8')
+        return (self._HEADER.pack(self._MAGIC, self.FORMAT_VERSION,
+                                  len(header)) +
+                header + zlib.compress(values.tostring()
+                                       if sys.version_info[0] == 2
+                                       else values.tobytes()))
+
+    def _decode(self, data):
+        magic, version, header_size = self._HEADER.unpack_from(data)
+        if magic != self._MAGIC or version != self.FORMAT_VERSION:
+            raise ValueError('unsupported format')
+        offset = self._HEADER.size
+        header = json.loads(data[offset:offset + header_size].decode('utf-8'))
+        values = array.array('i')
+        raw = zlib.decompress(data[offset + header_size:])
+        if sys.version_info[0] == 2:
+            values.fromstring(raw)
+        else:
+            values.frombytes(raw)
+        if header['byteorder'] != sys.byteorder:
+            values.byteswap()
+        names = header['names']
+        stacks = [tuple(stack) for stack in header['stacks']]
+        blocks = []
+        i = 0
+        nb_values = len(values)
+        while i < nb_values:
+            state, stack_index, nb_runs = values[i:i + 3]
+            i += 3
+            end = i + 3 * nb_runs
+            runs = tuple(zip(values[i:end:3], values[i + 1:end:3],
+                             [names[j] for j in values[i + 2:end:3]]))
+            i = end
+            blocks.append((state, stacks[stack_index]
+                           if stack_index != -1 else None, runs))
+        return header['id'], blocks
+
 
 def _logger():
     return logging.getLogger(__name__)
@@ -158,7 +158,8 @@ class BackendManager(Manager):
         self._heartbeat_timer.stop()
         comm('backend process terminated')
 
-    def send_request(self, worker_class_or_function, args, on_receive=None):
+    def send_request(self, worker_class_or_function, args, on_receive=None,
+                     on_error=None):
         """
         Requests some work to be done by the backend. You can get notified of
         the work results by passing a callback (on_receive).
@@ -167,7 +168,12 @@ class BackendManager(Manager):
         :param args: worker args, any Json serializable objects
         :param on_receive: an optional callback executed when we receive the
             worker's results. The callback will be called with one arguments:
-            the results of the worker (object)
+            the results of the worker (object). If the worker is a generator,
+            the callback is called once per yielded value.
+        :param on_error: an optional callback executed, without arguments,
+            when the worker failed (see :mod:`pyqode.core.backend`). It is
+            called right after ``on_receive`` has been called with the final
+            results.
 
         :raise: backend.NotRunning if the backend process is not running.
         """
@@ -187,7 +193,7 @@ class BackendManager(Manager):
             # has connected
             socket = JsonTcpClient(
                 self.editor, self._port, worker_class_or_function, args,
-                on_receive=on_receive)
+                on_receive=on_receive, on_error=on_error)
             socket.finished.connect(self._rm_socket)
             self._sockets.append(socket)
             # restart heartbeat timer
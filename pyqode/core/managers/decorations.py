@@ -1,8 +1,12 @@
 """
 Contains the text decorations manager
 """
+import bisect
+import contextlib
 import logging
 from pyqode.core.api.manager import Manager
+from pyqode.core.api.utils import PositionIndex
+from pyqode.qt import QtCore, QtGui
 
 
 def _logger():
@@ -13,10 +17,211 @@ class TextDecorationsManager(Manager):
     """
     Manages the collection of TextDecoration that have been set on the editor
     widget.
+
+    Decorations are kept sorted by draw order (decorations that have the
+    same draw order are kept in insertion order) and are compared by
+    identity.
+
+    Each change pushes the decorations to the editor (as extra selections),
+    use :meth:`batch` to push them only once when adding or removing many
+    decorations.
+
+    Decorations are also indexed by position range, use :meth:`containing`
+    and :meth:`overlapping` to find the decorations under the mouse cursor
+    or on a given line without looping over all the decorations.
+
+    When there are more than :attr:`culling_threshold` decorations, only the
+    decorations that intersect the visible blocks (plus :attr:`margin`
+    blocks above and below them) are pushed to the editor, the pushed
+    decorations are refreshed when the editor is scrolled out of that range.
     """
+    #: Number of decorations above which only the decorations around the
+    #: visible blocks are pushed to the editor.
+    culling_threshold = 500
+    #: Number of blocks, above and below the visible blocks, whose
+    #: decorations are pushed to the editor when culling decorations.
+    margin = 100
+
     def __init__(self, editor):
         super(TextDecorationsManager, self).__init__(editor)
+        # decorations sorted by draw order
         self._decorations = []
+        # sort key of each decoration of self._decorations
+        self._sort_keys = []
+        # sort key of the decorations, by id: (draw order at the time the
+        # decoration was appended, append counter)
+        self._keys = {}
+        self._counter = 0
+        # decorations appended during the current batch
+        self._added = []
+        # ids of the decorations removed during the current batch (they are
+        # still in self._decorations)
+        self._removed = set()
+        self._batch_depth = 0
+        self._batch_changed = False
+        self._positions = PositionIndex(editor, self._get_intervals)
+        # cursors that delimit the text whose decorations have been pushed to
+        # the editor, None if all the decorations have been pushed
+        self._pushed_range = None
+        # decorations that have been pushed to the editor when culling
+        # decorations, and their sort keys
+        self._pushed = []
+        self._pushed_keys = []
+        try:
+            editor.updateRequest.connect(self._on_update_request)
+        except AttributeError:
+            # QTextEdit
+            pass
+        # updateRequest is not emitted when a hidden editor is scrolled
+        editor.verticalScrollBar().valueChanged.connect(
+            self._on_update_request)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Context manager that groups decoration changes: the editor extra
+        selections are updated once, when the outermost batch ends, instead
+        of once per :meth:`append`/:meth:`remove`.
+
+        Example::
+
+            with editor.decorations.batch():
+                for deco in decorations:
+                    editor.decorations.append(deco)
+
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._batch_changed:
+                self._batch_changed = False
+                self._update()
+
+    def _update(self, decoration=None, key=None, added=False):
+        if self._batch_depth:
+            self._batch_changed = True
+        elif decoration is None or self._pushed_range is None:
+            self._apply_batch()
+            self._push()
+        else:
+            self._push_change(decoration, key, added)
+
+    def _push(self):
+        """
+        Pushes the decorations to the editor, culling the decorations that
+        are far from the visible blocks if there are a lot of decorations.
+        """
+        editor = self.editor
+        if (len(self._decorations) <= self.culling_threshold or
+                not hasattr(editor, 'firstVisibleBlock')):
+            self._pushed_range = None
+            self._pushed = []
+            self._pushed_keys = []
+            editor.setExtraSelections(self._decorations)
+            return
+        start, end = self._visible_range(self.margin)
+        document = editor.document()
+        start_cursor = QtGui.QTextCursor(document)
+        start_cursor.setPosition(start)
+        end_cursor = QtGui.QTextCursor(document)
+        end_cursor.setPosition(end)
+        self._pushed_range = start_cursor, end_cursor
+        self._pushed = self.overlapping(start, end)
+        keys = self._keys
+        self._pushed_keys = [keys[id(deco)] for deco in self._pushed]
+        editor.setExtraSelections(self._pushed)
+
+    def _push_change(self, decoration, key, added):
+        """
+        Updates the pushed decorations after a single decoration has been
+        added or removed, when culling decorations.
+        """
+        start_cursor, end_cursor = self._pushed_range
+        if (len(self._decorations) <= self.culling_threshold or
+                start_cursor.document() is not self.editor.document()):
+            self._push()
+            return
+        if added:
+            cursor = decoration.cursor
+            if (cursor.selectionStart() > end_cursor.position() or
+                    cursor.selectionEnd() < start_cursor.position()):
+                # not in the pushed range
+                return
+            index = bisect.bisect_right(self._pushed_keys, key)
+            self._pushed.insert(index, decoration)
+            self._pushed_keys.insert(index, key)
+        else:
+            index = bisect.bisect_left(self._pushed_keys, key)
+            if (index == len(self._pushed) or
+                    self._pushed[index] is not decoration):
+                # not pushed
+                return
+            del self._pushed[index]
+            del self._pushed_keys[index]
+        self.editor.setExtraSelections(self._pushed)
+
+    def _visible_range(self, margin=0):
+        """
+        Returns the start and end positions of the visible blocks, extended
+        by ``margin`` blocks.
+        """
+        editor = self.editor
+        document = editor.document()
+        first = editor.firstVisibleBlock()
+        last = editor.cursorForPosition(
+            QtCore.QPoint(0, editor.viewport().height())).block()
+        if margin:
+            first = document.findBlockByNumber(
+                max(0, first.blockNumber() - margin))
+            last = document.findBlockByNumber(
+                min(document.blockCount() - 1, last.blockNumber() + margin))
+        return first.position(), last.position() + last.length() - 1
+
+    def _on_update_request(self, *args):
+        # the editor has been scrolled, resized or its text changed: push
+        # the decorations again if the visible blocks are not in the pushed
+        # range anymore
+        if self._pushed_range is None or self._batch_depth:
+            return
+        start_cursor, end_cursor = self._pushed_range
+        if start_cursor.document() is not self.editor.document():
+            self._push()
+            return
+        start, end = self._visible_range()
+        if start < start_cursor.position() or end > end_cursor.position():
+            self._push()
+
+    def _apply_batch(self):
+        """
+        Applies the decorations added and removed during a batch to the
+        sorted list of decorations.
+        """
+        if not self._added and not self._removed:
+            return
+        decorations = self._decorations
+        if self._removed:
+            removed = self._removed
+            decorations = [deco for deco in decorations
+                           if id(deco) not in removed]
+        if self._added:
+            # a decoration appended several times (and removed in between)
+            # takes the position of its last append
+            keys = self._keys
+            seen = set()
+            added = []
+            for deco in self._added:
+                key = id(deco)
+                if key in keys and key not in seen:
+                    seen.add(key)
+                    added.append(deco)
+            decorations = sorted(decorations + added,
+                                 key=lambda deco: keys[id(deco)])
+        self._decorations = decorations
+        self._sort_keys = [self._keys[id(deco)] for deco in decorations]
+        self._added = []
+        self._removed = set()
 
     def append(self, decoration):
         """
@@ -25,13 +230,24 @@ class TextDecorationsManager(Manager):
         :param decoration: Text decoration to add
         :type decoration: pyqode.core.api.TextDecoration
         """
-        if decoration not in self._decorations:
-            self._decorations.append(decoration)
-            self._decorations = sorted(
-                self._decorations, key=lambda sel: sel.draw_order)
-            self.editor.setExtraSelections(self._decorations)
-            return True
-        return False
+        if id(decoration) in self._keys:
+            return False
+        # new decorations go after the existing decorations that have the
+        # same draw order
+        self._counter += 1
+        key = (decoration.draw_order, self._counter)
+        self._keys[id(decoration)] = key
+        if self._batch_depth:
+            self._added.append(decoration)
+        else:
+            index = bisect.bisect_right(self._sort_keys, key)
+            self._decorations.insert(index, decoration)
+            self._sort_keys.insert(index, key)
+        cursor = decoration.cursor
+        self._positions.add(cursor.selectionStart(), cursor.selectionEnd(),
+                            decoration)
+        self._update(decoration, key, True)
+        return True
 
     def remove(self, decoration):
         """
@@ -40,12 +256,18 @@ class TextDecorationsManager(Manager):
         :param decoration: Text decoration to remove
         :type decoration: pyqode.core.api.TextDecoration
         """
-        try:
-            self._decorations.remove(decoration)
-            self.editor.setExtraSelections(self._decorations)
-            return True
-        except ValueError:
+        key = self._keys.pop(id(decoration), None)
+        if key is None:
             return False
+        if self._batch_depth:
+            self._removed.add(id(decoration))
+        else:
+            index = bisect.bisect_left(self._sort_keys, key)
+            del self._decorations[index]
+            del self._sort_keys[index]
+        self._positions.remove(decoration)
+        self._update(decoration, key, False)
+        return True
 
     def clear(self):
         """
@@ -53,13 +275,53 @@ class TextDecorationsManager(Manager):
 
         """
         self._decorations[:] = []
+        self._sort_keys[:] = []
+        self._keys.clear()
+        self._added[:] = []
+        self._removed.clear()
+        self._positions.invalidate()
         try:
-            self.editor.setExtraSelections(self._decorations)
+            self._update()
         except RuntimeError:
             pass
 
+    def _get_intervals(self):
+        for deco in self:
+            yield (deco.cursor.selectionStart(), deco.cursor.selectionEnd(),
+                   deco)
+
+    def _sorted(self, decorations):
+        keys = self._keys
+        return sorted(decorations, key=lambda deco: keys[id(deco)])
+
+    def containing(self, cursor):
+        """
+        Returns the decorations that contain a text cursor (see
+        :meth:`pyqode.core.api.TextDecoration.contains_cursor`), in draw
+        order.
+
+        :param cursor: The text cursor to test
+        :type cursor: QtGui.QTextCursor
+        """
+        hits = self._sorted(self._positions.at(cursor.position()))
+        return [deco for deco in hits if deco.contains_cursor(cursor)]
+
+    def overlapping(self, start, end):
+        """
+        Returns the decorations whose selection overlaps a range of
+        positions (bounds included), in draw order.
+
+        :param start: start position
+        :param end: end position
+        """
+        return self._sorted(self._positions.overlap(start, end))
+
+    def __contains__(self, decoration):
+        return id(decoration) in self._keys
+
     def __iter__(self):
+        self._apply_batch()
         return iter(self._decorations)
 
     def __len__(self):
-        return len(self._decorations)
+        return len(self._keys)
@@ -11,10 +11,12 @@ import locale
 import logging
 import mimetypes
 import os
+import zlib
+from pyqode.core.api.folding import FoldScope
 from pyqode.core.api.manager import Manager
-from pyqode.core.api.utils import TextHelper
+from pyqode.core.api.utils import TextBlockHelper, TextHelper
 from pyqode.qt import QtCore, QtWidgets
-from pyqode.core.cache import Cache
+from pyqode.core.cache import Cache, HighlightCache
 
 
 # needed on windows
@@ -174,6 +176,11 @@ class FileManager(Manager):
         #: True to restore cursor position (if the document has already been
         # opened once).
         self.restore_cursor = True
+        #: True to restore the collapsed fold regions (if the document has
+        #: already been opened once). Requires a
+        #: :class:`pyqode.core.panels.FoldingPanel`.
+        self.restore_folding = True
+        self._pending_fold_state = None
         #: Preferred EOL convention. This setting will be used for saving the
         #: document unles autodetect_eol is True.
         self._preferred_eol = self.EOL.System
@@ -181,6 +188,13 @@ class FileManager(Manager):
         #: If true, automatically detects file EOL and use it instead of the
         #: preferred EOL when saving files.
         self._autodetect_eol = True
+        #: True to cache the syntax highlighting and folding data of big
+        #: files (:attr:`pyqode.core.cache.HighlightCache.MIN_LINES` lines or
+        #: more) in the user cache directory, so that they are not lexed
+        #: again the next time they are opened (see
+        #: :class:`pyqode.core.cache.HighlightCache`). The data are written
+        #: when the file is closed. Default is False.
+        self.cache_highlighting = False
 
     @staticmethod
     def get_mimetype(path):
@@ -222,6 +236,7 @@ class FileManager(Manager):
             were set on the editor.
         """
         ret_val = False
+        cached_highlighting = False
         if encoding is None:
             encoding = locale.getpreferredencoding()
         self.opening = True
@@ -276,17 +291,57 @@ class FileManager(Manager):
             if self.replace_tabs_by_spaces:
                 content = content.replace("\t", " " * self.editor.tab_length)
             # set plain text
+            cached_highlighting = self._has_cached_highlighting(content)
             self.editor.setPlainText(
                 content, self.get_mimetype(path), self.encoding)
+            if cached_highlighting:
+                cached_highlighting = self._restore_cached_highlighting(
+                    content)
             self.editor.setDocumentTitle(self.editor.file.name)
             ret_val = True
             _logger().debug('file open: %s', path)
         self.opening = False
         if self.restore_cursor:
             self._restore_cached_pos()
+        if self.restore_folding and ret_val:
+            self._restore_fold_state(cached_highlighting)
         self._check_for_readonly()
         return ret_val
 
+    def _has_cached_highlighting(self, content):
+        highlighter = self.editor.syntax_highlighter
+        if (not self.cache_highlighting or highlighter is None or
+                not highlighter.enabled or
+                content.count('\n') < HighlightCache.MIN_LINES or
+                not HighlightCache().has_entry(content)):
+            return False
+        # don't lex the document when its text is set, its blocks will be
+        # highlighted from the cached data (the lexer, and thus the entry to
+        # use, is only known once the text is set).
+        highlighter.lazy_rehighlight()
+        return True
+
+    def _restore_cached_highlighting(self, content):
+        highlighter = self.editor.syntax_highlighter.document_highlighter
+        cache_id = highlighter.cache_id
+        if cache_id is None:
+            return False
+        cached_highlighting = HighlightCache().load(content, cache_id)
+        return (cached_highlighting is not None and
+                highlighter.restore_highlighting(*cached_highlighting))
+
+    def _save_cached_highlighting(self):
+        highlighter = self.editor.syntax_highlighter
+        document = self.editor.document()
+        if (not self.cache_highlighting or not self.path or
+                highlighter is None or not highlighter.enabled or
+                document.isModified() or
+                document.blockCount() <= HighlightCache.MIN_LINES):
+            return
+        data = highlighter.document_highlighter.dump_highlighting()
+        if data is not None:
+            HighlightCache().save(self.editor.toPlainText(), *data)
+
     def _check_for_readonly(self):
         self.read_only = not os.access(self.path, os.W_OK)
         self.editor.setReadOnly(self.read_only)
@@ -301,6 +356,125 @@ class FileManager(Manager):
         self.editor.setTextCursor(tc)
         QtCore.QTimer.singleShot(1, self.editor.centerCursor)
 
+    def _get_folding_panel(self):
+        from pyqode.core.panels import FoldingPanel
+        try:
+            return self.editor.panels.get(FoldingPanel)
+        except KeyError:
+            return None
+
+    @staticmethod
+    def _fold_fingerprint(block):
+        """
+        Returns the fingerprint of a fold region: the checksum of the text of
+        its lines, from the trigger line to the end of the region (leading
+        and trailing whitespaces are ignored).
+        """
+        _, end = FoldScope(block).get_range()
+        crc = 0
+        while block.isValid() and block.blockNumber() <= end:
+            crc = zlib.crc32(block.text().strip().encode(
+                'utf-8', 'surrogatepass') + b'\n', crc)
+            block = block.next()
+        return crc & 0xFFFFFFFF
+
+    def _get_fold_state(self):
+        """
+        Returns the list of the collapsed fold regions, as (trigger line,
+        fingerprint) tuples.
+        """
+        regions = []
+        block = self.editor.document().firstBlock()
+        while block.isValid():
+            if (TextBlockHelper.is_collapsed(block) and
+                    TextBlockHelper.is_fold_trigger(block)):
+                regions.append((block.blockNumber(),
+                                self._fold_fingerprint(block)))
+            block = block.next()
+        return regions
+
+    def _restore_fold_state(self, ready):
+        """
+        Collapses the fold regions that were collapsed when the file was
+        closed.
+
+        :param ready: True if the fold levels of the blocks are known,
+            otherwise the regions are collapsed once the document has been
+            highlighted.
+        """
+        self._cancel_fold_state_restoration()
+        if self._get_folding_panel() is None:
+            return
+        regions = Cache().get_fold_state(self.path)
+        if not regions:
+            return
+        highlighter = self.editor.syntax_highlighter
+        if (not ready and highlighter is not None and highlighter.enabled and
+                highlighter.lazy_highlighting_in_progress):
+            # the fold levels are not known yet
+            self._pending_fold_state = regions
+            highlighter.highlighting_progress.connect(
+                self._on_highlighting_progress)
+        else:
+            self._apply_fold_state(regions)
+
+    def _cancel_fold_state_restoration(self):
+        if self._pending_fold_state is not None:
+            self._pending_fold_state = None
+            try:
+                self.editor.syntax_highlighter.highlighting_progress.\
+                    disconnect(self._on_highlighting_progress)
+            except (AttributeError, TypeError, RuntimeError):
+                pass
+
+    def _on_highlighting_progress(self, progress):
+        if progress == 100:
+            regions = self._pending_fold_state
+            self._cancel_fold_state_restoration()
+            self._apply_fold_state(regions)
+
+    def _apply_fold_state(self, regions):
+        """
+        Collapses the cached fold regions, at once.
+
+        If the file has been modified outside of the editor, a region whose
+        content does not match its fingerprint anymore is moved to the
+        nearest fold region that has the same fingerprint (the region is
+        skipped if there is none).
+        """
+        panel = self._get_folding_panel()
+        if panel is None:
+            return
+        document = self.editor.document()
+        blocks = []
+        used = set()
+        moved = []
+        for line, fingerprint in regions:
+            block = document.findBlockByNumber(line)
+            if (TextBlockHelper.is_fold_trigger(block) and
+                    self._fold_fingerprint(block) == fingerprint):
+                blocks.append(block)
+                used.add(line)
+            else:
+                moved.append((line, fingerprint))
+        if moved:
+            triggers = {}
+            block = document.firstBlock()
+            while block.isValid():
+                if (TextBlockHelper.is_fold_trigger(block) and
+                        block.blockNumber() not in used):
+                    triggers.setdefault(self._fold_fingerprint(block),
+                                        []).append(block)
+                block = block.next()
+            for line, fingerprint in moved:
+                candidates = triggers.get(fingerprint)
+                if candidates:
+                    block = min(candidates,
+                                key=lambda b: abs(b.blockNumber() - line))
+                    candidates.remove(block)
+                    blocks.append(block)
+        panel.collapse(blocks)
+
     def reload(self, encoding):
         """
         Reload the file with another encoding.
@@ -439,8 +613,12 @@ class FileManager(Manager):
 
         :param clear: True to clear the editor content. Default is True.
         """
+        self._save_cached_highlighting()
         Cache().set_cursor_position(
             self.path, self.editor.textCursor().position())
+        self._cancel_fold_state_restoration()
+        if self.restore_folding and self.path:
+            Cache().set_fold_state(self.path, self._get_fold_state())
         self.editor._original_text = ''
         if clear:
             self.editor.clear()
@@ -453,3 +631,5 @@ class FileManager(Manager):
         self.safe_save = original.replace_tabs_by_spaces
         self.clean_trailing_whitespaces = original.clean_trailing_whitespaces
         self.restore_cursor = original.restore_cursor
+        self.restore_folding = original.restore_folding
+        self.cache_highlighting = original.cache_highlighting
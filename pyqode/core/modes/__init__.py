@@ -10,6 +10,7 @@ from .caret_line_highlight import CaretLineHighlighterMode
 from .case_converter import CaseConverterMode
 from .checker import CheckerMode
 from .checker import CheckerMessage
+from .checker import CheckerMessageIndex
 from .checker import CheckerMessages
 from .cursor_history import CursorHistoryMode
 from .code_completion import CodeCompletionMode
@@ -36,6 +37,7 @@ __all__ = [
     'CaseConverterMode',
     'CheckerMode',
     'CheckerMessage',
+    'CheckerMessageIndex',
     'CheckerMessages',
     'CodeCompletionMode',
     'CursorHistoryMode',
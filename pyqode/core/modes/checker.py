@@ -2,12 +2,14 @@
 """
 This module contains the checker mode, a base class for code checker modes.
 """
+import bisect
 import logging
+from collections import OrderedDict
 from pyqode.core.api import TextBlockUserData
 from pyqode.core.api.decoration import TextDecoration
 from pyqode.core.api.mode import Mode
 from pyqode.core.backend import NotRunning
-from pyqode.core.api.utils import DelayJobRunner
+from pyqode.core.api.utils import AnalysisScheduler
 from pyqode.qt import QtCore, QtGui
 
 
@@ -98,6 +100,168 @@ class CheckerMessage(object):
         return (self.block == other.block and
                 self.description == other.description)
 
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.description)
+
+    def key(self):
+        """
+        Returns a hashable identity of the message (its block number and its
+        description), messages that have the same key are the same message.
+
+        .. note:: The key changes when the block of the message moves.
+        """
+        if self.block is not None and self.block.isValid():
+            return self.block.blockNumber(), self.description
+        return None, self.line, self.description
+
+
+class CheckerMessageIndex(object):
+    """
+    Index of the checker messages of a document, by line.
+
+    For each line that has messages, the index keeps the most severe message
+    of the line, so that panels can query the messages of a range of lines
+    (e.g. the lines that need to be painted) without walking all the
+    messages of all the checker modes.
+
+    Messages are stored with their block: the index is rebuilt, the next
+    time it is queried, when blocks have been inserted or removed (the line
+    of the messages may have changed) and when messages have been added or
+    removed.
+
+    There is one index per document, it is created by the checker mode the
+    first time it adds a message to the document. Use :meth:`get` to
+    retrieve the index of a document.
+    """
+    @staticmethod
+    def get(document):
+        """
+        Returns the message index of a document, None if no message has ever
+        been added to the document.
+
+        :param document: QTextDocument
+        """
+        return getattr(document, '_pyqode_checker_message_index', None)
+
+    @property
+    def document(self):
+        """
+        Returns the indexed document.
+        """
+        return self._document
+
+    @property
+    def revision(self):
+        """
+        Returns the revision of the index, the revision changes each time the
+        messages or their lines change. Use it to invalidate what has been
+        computed from the index.
+        """
+        if self._dirty:
+            self._rebuild()
+        return self._revision
+
+    def __init__(self, document):
+        self._document = document
+        self._revision = 0
+        self._messages = OrderedDict()
+        # sorted lines that have messages and the most severe message of
+        # each line
+        self._lines = []
+        self._worst = []
+        # messages of each line
+        self._line_messages = {}
+        self._counts = {}
+        self._dirty = False
+        self._nb_blocks = document.blockCount()
+        document._pyqode_checker_message_index = self
+        document.contentsChange.connect(self._on_contents_change)
+
+    def add(self, message):
+        """
+        Adds a message (its block must have been set).
+        """
+        self._messages[id(message)] = message
+        self._dirty = True
+
+    def remove(self, message):
+        """
+        Removes a message.
+        """
+        if self._messages.pop(id(message), None) is not None:
+            self._dirty = True
+
+    def _on_contents_change(self, position, chars_removed, chars_added):
+        document = self._document
+        if document.blockCount() != self._nb_blocks:
+            self._nb_blocks = document.blockCount()
+            self._dirty = True
+        elif (self._messages and document.findBlock(position) !=
+                document.findBlock(position + chars_added)):
+            # blocks have been replaced
+            self._dirty = True
+
+    def _rebuild(self):
+        self._dirty = False
+        self._revision += 1
+        self._nb_blocks = self._document.blockCount()
+        line_messages = {}
+        counts = {}
+        for message in self._messages.values():
+            block = message.block
+            if block is None or not block.isValid():
+                continue
+            line_messages.setdefault(block.blockNumber(), []).append(message)
+            counts[message.status] = counts.get(message.status, 0) + 1
+        self._lines = sorted(line_messages)
+        self._worst = [max(line_messages[line], key=lambda msg: msg.status)
+                       for line in self._lines]
+        self._line_messages = line_messages
+        self._counts = counts
+
+    def query(self, start_line=0, end_line=None):
+        """
+        Returns the lines that have messages in a range of lines (bounds
+        included), as a list of (line, most severe message) tuples sorted by
+        line.
+
+        :param start_line: first line of the range
+        :param end_line: last line of the range, None to go up to the end of
+            the document.
+        """
+        if self._dirty:
+            self._rebuild()
+        start = bisect.bisect_left(self._lines, start_line)
+        if end_line is None:
+            end = len(self._lines)
+        else:
+            end = bisect.bisect_right(self._lines, end_line, start)
+        return list(zip(self._lines[start:end], self._worst[start:end]))
+
+    def messages(self, line):
+        """
+        Returns the messages of a line.
+        """
+        if self._dirty:
+            self._rebuild()
+        return list(self._line_messages.get(line, []))
+
+    def count(self, status=None):
+        """
+        Returns the number of messages of the document.
+
+        :param status: count only the messages that have this status (one of
+            :class:`CheckerMessages`), None to count all the messages.
+        """
+        if self._dirty:
+            self._rebuild()
+        if status is None:
+            return sum(self._counts.values())
+        return self._counts.get(status, 0)
+
 
 def _logger(klass):
     return logging.getLogger('%s [%s]' % (__name__, klass.__name__))
@@ -125,13 +289,34 @@ class CheckerMode(Mode, QtCore.QObject):
                 'encoding': self.editor.file.encoding
             }
 
-    and the return value is a tuple made up of the following elements:
+    and the return value is a list of tuples made up of the following
+    elements:
 
         (description, status, line, [col], [icon], [color], [path])
 
     The background process is ran when the text changed and the ide is an idle
     state for a few seconds.
 
+    **Incremental checking**: the request data also contains the
+    ``'version'`` of the document (a number that changes each time the
+    document changes) and the ``'changed_regions'`` since the last analysis:
+    a list of ``[start_line, end_line]`` ranges (0 based, inclusive) or None
+    if the whole document must be checked. A worker that supports
+    incremental checking may only check those regions and return a dict
+    instead of a list:
+
+    .. code-block:: python
+
+        {
+            'regions': [[start_line, end_line], ...],
+            'messages': [(description, status, line, ...), ...]
+        }
+
+    The messages replace the messages of the returned regions, messages
+    outside of those regions are kept (they follow their lines). Results
+    are discarded if the document changed while the worker was running, the
+    regions are then checked again by the next analysis.
+
     You can also request an analysis manually using
     :meth:`pyqode.core.modes.CheckerMode.request_analysis`
 
@@ -150,9 +335,10 @@ class CheckerMode(Mode, QtCore.QObject):
                  show_tooltip=True):
         """
         :param worker: The process function or class to call remotely.
-        :param delay: The delay used before running the analysis process when
-                      trigger is set to
-                      :class:pyqode.core.modes.CheckerTriggers`
+        :param delay: The minimum delay used before running the analysis
+                      process (the delay adapts to the duration of the
+                      analysis and to the size of the document, see
+                      :class:`pyqode.core.api.AnalysisScheduler`)
         :param show_tooltip: Specify if a tooltip must be displayed when the
                              mouse is over a checker message decoration.
         """
@@ -161,13 +347,22 @@ class CheckerMode(Mode, QtCore.QObject):
         # max number of messages to keep good performances
         self.limit = 200
         self.ignore_rules = []
-        self._job_runner = DelayJobRunner(delay=delay)
+        self._delay = delay
         self._messages = []
         self._worker = worker
         self._mutex = QtCore.QMutex()
         self._show_tooltip = show_tooltip
-        self._pending_msg = []
         self._finished = True
+        # document version and line ranges changed since the last analysis
+        # (None: the whole document must be checked)
+        self._version = 0
+        self._request_version = 0
+        self._changed_regions = None
+        self._nb_blocks = 0
+        self._document = None
+        # message index of the document, the index is only stored on the
+        # python wrapper of the document: we must keep it alive
+        self._index = None
 
     def set_ignore_rules(self, rules):
         """
@@ -182,75 +377,102 @@ class CheckerMode(Mode, QtCore.QObject):
         """
         Adds a message or a list of message.
 
+        The messages replace the current messages: messages that are not in
+        the list are removed, messages that are already displayed are kept
+        untouched and the new messages are added, in one go.
+
         :param messages: A list of messages or a single message
         """
-        # remove old messages
+        if self.editor is None:
+            return
+        if isinstance(messages, CheckerMessage):
+            messages = [messages]
         if len(messages) > self.limit:
             messages = messages[:self.limit]
         _logger(self.__class__).log(5, 'adding %s messages' % len(messages))
-        self._finished = False
-        self._new_messages = messages
-        self._to_check = list(self._messages)
-        self._pending_msg = messages
-        # start removing messages, new message won't be added until we
-        # checked all message that need to be removed
-        QtCore.QTimer.singleShot(1, self._remove_batch)
-
-    def _remove_batch(self):
-        if self.editor is None:
-            return
-        for i in range(100):
-            if not len(self._to_check):
-                # all messages checker, start adding messages now
-                QtCore.QTimer.singleShot(1, self._add_batch)
-                self.editor.repaint()
-                return False
-            msg = self._to_check.pop(0)
-            if msg.block is None:
-                msg.block = self.editor.document().findBlockByNumber(msg.line)
-            if msg not in self._new_messages:
-                self.remove_message(msg)
+        document = self.editor.document()
+        new_messages = []
+        new_keys = set()
+        for message in messages:
+            if message.line < 0:
+                continue
+            if message.block is None:
+                message.block = document.findBlockByNumber(message.line)
+            key = message.key()
+            if key not in new_keys:
+                new_keys.add(key)
+                new_messages.append((key, message))
+        # keep the messages that are still reported, remove the other ones
+        # (and the duplicates)
+        kept_keys = set()
+        removed = []
+        for message in self._messages:
+            key = message.key()
+            if key in new_keys and key not in kept_keys:
+                kept_keys.add(key)
+            else:
+                removed.append(message)
+        added = [message for key, message in new_messages
+                 if key not in kept_keys]
+        with self.editor.decorations.batch():
+            self._remove_messages(removed)
+            for message in added:
+                self._add_message(message)
+        self._finished = True
+        _logger(self.__class__).log(5, 'finished')
         self.editor.repaint()
-        QtCore.QTimer.singleShot(1, self._remove_batch)
 
-    def _add_batch(self):
-        if self.editor is None:
+    def _add_message(self, message):
+        if message.block.isValid():
+            usd = message.block.userData()
+            if usd is None:
+                usd = TextBlockUserData()
+                message.block.setUserData(usd)
+            usd.messages.append(message)
+            self._get_index().add(message)
+            message.decoration = TextDecoration(message.block)
+        else:
+            message.decoration = TextDecoration(
+                self.editor.textCursor(), start_line=message.line)
+        self._messages.append(message)
+        if self._show_tooltip:
+            message.decoration.tooltip = message.description
+        message.decoration.draw_order = 3
+        message.decoration.set_full_width()
+        message.decoration.set_as_error(color=QtGui.QColor(message.color))
+        self.editor.decorations.append(message.decoration)
+
+    def _remove_messages(self, messages):
+        """
+        Removes a list of messages from the block user data, the editor
+        decorations and the list of messages.
+        """
+        if not messages:
             return
-        for i in range(10):
-            if not len(self._pending_msg):
-                # all pending message added
-                self._finished = True
-                _logger(self.__class__).log(5, 'finished')
-                self.editor.repaint()
-                return False
-            message = self._pending_msg.pop(0)
-            if message.line >= 0:
-                try:
-                    usd = message.block.userData()
-                except AttributeError:
-                    message.block = self.editor.document().findBlockByNumber(message.line)
-                    usd = message.block.userData()
-                if usd is None:
-                    usd = TextBlockUserData()
-                    message.block.setUserData(usd)
-                # check if the same message already exists
-                if message in usd.messages:
-                    continue
-                self._messages.append(message)
-                usd.messages.append(message)
-                tooltip = None
-                if self._show_tooltip:
-                    tooltip = message.description
-                message.decoration = TextDecoration(
-                    self.editor.textCursor(), start_line=message.line,
-                    tooltip=tooltip, draw_order=3)
-                message.decoration.set_full_width()
-                message.decoration.set_as_error(color=QtGui.QColor(
-                    message.color))
-                self.editor.decorations.append(message.decoration)
-        QtCore.QTimer.singleShot(1, self._add_batch)
-        self.editor.repaint()
-        return True
+        removed = set(id(msg) for msg in messages)
+        index = CheckerMessageIndex.get(self.editor.document())
+        with self.editor.decorations.batch():
+            for message in messages:
+                if index is not None:
+                    index.remove(message)
+                usd = message.block.userData()
+                if usd and hasattr(usd, 'messages'):
+                    usd.messages[:] = [msg for msg in usd.messages
+                                       if id(msg) not in removed]
+                if message.decoration:
+                    self.editor.decorations.remove(message.decoration)
+        self._messages[:] = [msg for msg in self._messages
+                             if id(msg) not in removed]
+
+    def _get_index(self):
+        document = self.editor.document()
+        index = self._index
+        if index is None or index.document is not document:
+            index = CheckerMessageIndex.get(document)
+            if index is None:
+                index = CheckerMessageIndex(document)
+            self._index = index
+        return index
 
     def remove_message(self, message):
         """
@@ -258,49 +480,68 @@ class CheckerMode(Mode, QtCore.QObject):
 
         :param message: Message to remove
         """
-        import time
         _logger(self.__class__).log(5, 'removing message %s' % message)
-        t = time.time()
-        usd = message.block.userData()
-        if usd:
-            try:
-                usd.messages.remove(message)
-            except (AttributeError, ValueError):
-                pass
-        if message.decoration:
-            self.editor.decorations.remove(message.decoration)
-        self._messages.remove(message)
+        self._remove_messages([message])
 
     def clear_messages(self):
         """
         Clears all messages.
         """
-        while len(self._messages):
-            msg = self._messages.pop(0)
-            usd = msg.block.userData()
-            if usd and hasattr(usd, 'messages'):
-                usd.messages[:] = []
-            if msg.decoration:
-                self.editor.decorations.remove(msg.decoration)
+        self._remove_messages(list(self._messages))
+        # the next analysis checks the whole document
+        self._changed_regions = None
 
     def on_state_changed(self, state):
         if state:
+            self._document = self.editor.document()
+            self._nb_blocks = self._document.blockCount()
+            self._changed_regions = None
+            self._document.contentsChange.connect(self._on_contents_change)
             self.editor.textChanged.connect(self.request_analysis)
             self.editor.new_text_set.connect(self.clear_messages)
             self.request_analysis()
         else:
+            try:
+                self._document.contentsChange.disconnect(
+                    self._on_contents_change)
+            except (RuntimeError, TypeError):
+                pass
+            self._document = None
             self.editor.textChanged.disconnect(self.request_analysis)
             self.editor.new_text_set.disconnect(self.clear_messages)
-            self._job_runner.cancel_requests()
+            AnalysisScheduler.instance().cancel(self)
             self.clear_messages()
 
-    def _on_work_finished(self, results):
-        """
-        Display results.
-
-        :param status: Response status
-        :param results: Response data, messages.
-        """
+    def _on_contents_change(self, position, chars_removed, chars_added):
+        self._version += 1
+        document = self._document
+        nb_blocks = document.blockCount()
+        delta = nb_blocks - self._nb_blocks
+        self._nb_blocks = nb_blocks
+        if self._changed_regions is None:
+            return
+        first = document.findBlock(position).blockNumber()
+        last = document.findBlock(position + chars_added).blockNumber()
+        if last < first:
+            # the change reaches the end of the document
+            last = nb_blocks - 1
+        # last line of the change before the change happened
+        old_last = last - delta
+        regions = []
+        for start, end in self._changed_regions:
+            if end < first - 1:
+                regions.append([start, end])
+            elif start > old_last + 1:
+                regions.append([start + delta, end + delta])
+            else:
+                # overlaps (or touches) the change: merge
+                first = min(first, start)
+                last = max(last, end + delta)
+        regions.append([first, last])
+        regions.sort()
+        self._changed_regions = regions
+
+    def _make_messages(self, results):
         messages = []
         for msg in results:
             msg = CheckerMessage(*msg)
@@ -309,27 +550,66 @@ class CheckerMode(Mode, QtCore.QObject):
             block = self.editor.document().findBlockByNumber(msg.line)
             msg.block = block
             messages.append(msg)
-        self.add_messages(messages)
+        return messages
+
+    def _on_work_finished(self, results):
+        """
+        Display results.
+
+        :param status: Response status
+        :param results: Response data, messages (a list of messages or a
+            dict with the checked regions and their messages, see
+            :class:`CheckerMode`).
+        """
+        AnalysisScheduler.instance().finished(self)
+        up_to_date = self._request_version == self._version
+        if isinstance(results, dict):
+            if not up_to_date:
+                # the lines of the messages might be wrong
+                _logger(self.__class__).log(
+                    5, 'discarding results of an outdated document')
+                self._finished = True
+                return
+            regions = sorted(results['regions'])
+            starts = [start for start, end in regions]
+
+            def in_regions(line):
+                i = bisect.bisect_right(starts, line) - 1
+                return i >= 0 and line <= regions[i][1]
+
+            retained = [msg for msg in self._messages
+                        if msg.block.isValid() and
+                        not in_regions(msg.block.blockNumber())]
+            messages = [msg for msg in self._make_messages(
+                results['messages']) if in_regions(msg.line)]
+            self.add_messages(retained + messages)
+        else:
+            self.add_messages(self._make_messages(results))
+        if up_to_date:
+            self._changed_regions = []
 
     def request_analysis(self):
         """
         Requests an analysis.
+
+        The analysis is run by the shared
+        :class:`pyqode.core.api.AnalysisScheduler` once the editor is idle
+        and the previous analysis (if any) finished.
         """
-        if self._finished:
-            _logger(self.__class__).log(5, 'running analysis')
-            self._job_runner.request_job(self._request)
-        elif self.editor:
-            # retry later
-            _logger(self.__class__).log(
-                5, 'delaying analysis (previous analysis not finished)')
-            QtCore.QTimer.singleShot(500, self.request_analysis)
+        if self.editor is not None:
+            _logger(self.__class__).log(5, 'requesting analysis')
+            AnalysisScheduler.instance().request(
+                self, self.editor, self._request, self._delay)
 
     def _request(self):
-        """ Requests a checking of the editor content. """
+        """
+        Requests a checking of the editor content, returns True if the
+        request has been sent.
+        """
         try:
             self.editor.toPlainText()
-        except (TypeError, RuntimeError):
-            return
+        except (TypeError, AttributeError, RuntimeError):
+            return False
         try:
             max_line_length = self.editor.modes.get(
                 'RightMarginMode').position
@@ -341,11 +621,17 @@ class CheckerMode(Mode, QtCore.QObject):
             'encoding': self.editor.file.encoding,
             'ignore_rules': self.ignore_rules,
             'max_line_length': max_line_length,
+            'version': self._version,
+            'changed_regions': self._changed_regions,
         }
         try:
             self.editor.backend.send_request(
                 self._worker, request_data, on_receive=self._on_work_finished)
+            self._request_version = self._version
             self._finished = False
+            return True
         except NotRunning:
             # retry later
-            QtCore.QTimer.singleShot(100, self._request)
+            AnalysisScheduler.instance().request(
+                self, self.editor, self._request, 100)
+            return False
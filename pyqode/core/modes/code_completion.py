@@ -25,6 +25,207 @@ def debug(msg, *args):
     return _logger().log(5, msg, *args)
 
 
+class CompletionListModel(QtCore.QAbstractListModel):
+    """
+    Lightweight list model used to display the completions in the completer
+    popup.
+
+    The completions are stored in plain python lists that are reset in place
+    when new results come in (no QStandardItem is allocated). Icons are
+    created lazily, when the view asks for them, and are cached by icon name
+    for the lifetime of the model.
+    """
+    def __init__(self, parent=None):
+        super(CompletionListModel, self).__init__(parent)
+        self._names = []
+        self._icons = []
+        self._ranks = []
+        self._icon_cache = {}
+
+    @staticmethod
+    def _icon_key(icon):
+        if isinstance(icon, list):
+            return tuple(icon)
+        return icon
+
+    def icon(self, key):
+        """
+        Returns the QIcon for the given icon key, the icon is created once and
+        then retrieved from the cache.
+
+        :param key: icon file name or (theme name, fallback file name) tuple
+        """
+        try:
+            return self._icon_cache[key]
+        except KeyError:
+            if isinstance(key, tuple):
+                icon = QtGui.QIcon.fromTheme(key[0], QtGui.QIcon(key[1]))
+            else:
+                icon = QtGui.QIcon(key)
+            self._icon_cache[key] = icon
+            return icon
+
+    def set_completions(self, completions):
+        """
+        Resets the model content with a new list of completions.
+
+        :param completions: list of completion dicts (see
+            :meth:`pyqode.core.backend.workers.CodeCompletionWorker.Provider.complete`)
+        """
+        self.beginResetModel()
+        self._names[:] = [c['name'] for c in completions]
+        self._icons[:] = [self._icon_key(c['icon']) if 'icon' in c else None
+                          for c in completions]
+        self._ranks[:] = [0] * len(self._names)
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._names)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        row = index.row()
+        if not index.isValid() or row >= len(self._names):
+            return None
+        if role in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+            return self._names[row]
+        if role == QtCore.Qt.DecorationRole:
+            key = self._icons[row]
+            if key is not None:
+                return self.icon(key)
+        elif role == QtCore.Qt.UserRole:
+            return self._ranks[row]
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        # only the rank (used for sorting by SubsequenceSortFilterProxyModel)
+        # can be set, we don't emit dataChanged since the rank is updated
+        # from within the proxy filtering method.
+        if role == QtCore.Qt.UserRole and index.isValid():
+            self._ranks[index.row()] = value
+            return True
+        return False
+
+
+class CompletionSession(object):
+    """
+    Keeps the candidates returned by the last completion request and narrows
+    them locally as the completion prefix grows.
+
+    A new request is only needed when the completion context changes (the
+    word start moved, a trigger symbol was typed or the providers marked
+    their results as incomplete).
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Invalidates the session.
+        """
+        #: line of the completion context
+        self.line = -1
+        #: column of the completion context (start of the completed word)
+        self.column = -1
+        #: prefix used for the backend request
+        self.prefix = ''
+        #: id of the backend request
+        self.request_id = -1
+        #: True if the backend did not return all possible candidates
+        self.incomplete = False
+        #: the full list of candidates, None while the request is pending
+        self.completions = None
+        self._narrowed = None
+        self._narrowed_prefix = ''
+
+    @property
+    def narrowed(self):
+        """
+        The candidates returned by the last call to :meth:`narrow`.
+        """
+        return self._narrowed
+
+    @property
+    def pending(self):
+        """
+        True if results have been requested but not received yet.
+        """
+        return self.request_id != -1 and self.completions is None
+
+    def start(self, line, column, prefix, request_id):
+        """
+        Starts a new session for a backend request.
+        """
+        self.reset()
+        self.line = line
+        self.column = column
+        self.prefix = prefix
+        self.request_id = request_id
+
+    def set_results(self, completions, incomplete=False):
+        """
+        Sets the candidates received from the backend.
+
+        :param completions: list of completion dicts
+        :param incomplete: True if the backend did not return all the
+            candidates for the requested prefix.
+        """
+        self.completions = completions
+        self.incomplete = incomplete
+        self._narrowed = completions
+        self._narrowed_prefix = self.prefix
+
+    def accepts(self, line, column, prefix, case_sensitive=False):
+        """
+        Checks if the given context can be served by the session's candidates
+        (without issuing a new request).
+        """
+        if line != self.line or column != self.column or self.incomplete:
+            return False
+        if not case_sensitive:
+            prefix = prefix.lower()
+            return prefix.startswith(self.prefix.lower())
+        return prefix.startswith(self.prefix)
+
+    def narrow(self, prefix, case_sensitive=False):
+        """
+        Returns the candidates that may match ``prefix``.
+
+        A candidate is kept if the prefix is a subsequence of its name, this
+        is the least restrictive of the completer filter modes, the final
+        filtering/sorting is still done by the completer.
+
+        :param prefix: current completion prefix
+        :param case_sensitive: True to match case
+        """
+        if self.completions is None:
+            return []
+        if not case_sensitive:
+            key = prefix.lower()
+            start = self._narrowed_prefix.lower()
+        else:
+            key = prefix
+            start = self._narrowed_prefix
+        if key.startswith(start):
+            # narrow the previous result instead of the full candidate set
+            candidates = self._narrowed
+        else:
+            candidates = self.completions
+        narrowed = []
+        for completion in candidates:
+            name = completion['name']
+            if not case_sensitive:
+                name = name.lower()
+            it = iter(name)
+            if all(c in it for c in key):
+                narrowed.append(completion)
+        if len(narrowed) == len(candidates):
+            narrowed = candidates
+        self._narrowed = narrowed
+        self._narrowed_prefix = prefix
+        return narrowed
+
 
 class SubsequenceSortFilterProxyModel(QtCore.QSortFilterProxyModel):
     """
@@ -105,12 +306,14 @@ class SubsequenceCompleter(QtWidgets.QCompleter):
 
     def setModel(self, model):
         self.source_model = model
-        self.filterProxyModel = SubsequenceSortFilterProxyModel(
-            self.caseSensitivity(), parent=self)
-        self.filterProxyModel.setSortRole(QtCore.Qt.UserRole)
+        # the proxy model is reused, only its case sensitivity and source
+        # model need to be updated
+        self.filterProxyModel.case = self.caseSensitivity()
         self.filterProxyModel.set_prefix(self.local_completion_prefix)
-        self.filterProxyModel.setSourceModel(self.source_model)
-        super(SubsequenceCompleter, self).setModel(self.filterProxyModel)
+        if self.filterProxyModel.sourceModel() is not model:
+            self.filterProxyModel.setSourceModel(model)
+        if self.model() is not self.filterProxyModel:
+            super(SubsequenceCompleter, self).setModel(self.filterProxyModel)
         self.filterProxyModel.invalidate()
         self.filterProxyModel.sort(0)
         self._force_next_update = True
@@ -287,11 +490,11 @@ class CodeCompletionMode(Mode, QtCore.QObject):
         self._case_sensitive = False
         self._completer = None
         self._filter_mode = self.FILTER_FUZZY
-        self._last_cursor_line = -1
-        self._last_cursor_column = -1
+        self._session = CompletionSession()
         self._tooltips = {}
         self._show_tooltips = False
-        self._request_id = self._last_request_id = 0
+        self._request_id = 0
+        self._model = CompletionListModel()
 
     def clone_settings(self, original):
         self.trigger_key = original.trigger_key
@@ -323,10 +526,10 @@ class CodeCompletionMode(Mode, QtCore.QObject):
         self._completer.highlighted.connect(
             self._on_selected_completion_changed)
         self._completer.highlighted.connect(self._display_completion_tooltip)
+        self._completer.setModel(self._model)
 
     def on_install(self, editor):
         self._create_completer()
-        self._completer.setModel(QtGui.QStandardItemModel())
         self._helper = TextHelper(editor)
         Mode.on_install(self, editor)
 
@@ -443,22 +646,25 @@ class CodeCompletionMode(Mode, QtCore.QObject):
 
     def _on_results_available(self, results):
         debug("completion results (completions=%r), prefix=%s",
-                        results, self.completion_prefix)
+              results, self.completion_prefix)
         context = results[0]
         results = results[1:]
-        line, column, request_id = context
+        line, column, request_id = context[:3]
+        incomplete = context[3] if len(context) > 3 else False
         debug('request context: %r', context)
-        debug('latest context: %r', (self._last_cursor_line,
-                                               self._last_cursor_column,
-                                               self._request_id))
-        self._last_request_id = request_id
-        if (line == self._last_cursor_line and
-                column == self._last_cursor_column):
+        debug('latest context: %r', (self._session.line,
+                                     self._session.column,
+                                     self._session.request_id))
+        if (line == self._session.line and
+                column == self._session.column and
+                request_id == self._session.request_id):
+            all_results = []
+            for res in results:
+                all_results += res
+            self._session.set_results(all_results, incomplete)
             if self.editor:
-                all_results = []
-                for res in results:
-                    all_results += res
-                self._show_completions(all_results)
+                self._show_completions(self._session.narrow(
+                    self.completion_prefix, self._case_sensitive))
         else:
             debug('outdated request, dropping')
 
@@ -470,51 +676,56 @@ class CodeCompletionMode(Mode, QtCore.QObject):
 
     def _reset_sync_data(self):
         debug('reset sync data and hide popup')
-        self._last_cursor_line = -1
-        self._last_cursor_column = -1
+        self._session.reset()
         self._hide_popup()
 
     def request_completion(self):
+        """
+        Requests code completions for the word under cursor.
+
+        If the current completion session still applies (same word start and
+        growing prefix), the last candidates are narrowed locally and no
+        request is sent to the backend.
+
+        :returns: True if the completions are shown, pending or requested.
+        """
+        prefix = self.completion_prefix
         line = self._helper.current_line_nbr()
-        column = self._helper.current_column_nbr() - \
-            len(self.completion_prefix)
-        same_context = (line == self._last_cursor_line and
-                        column == self._last_cursor_column)
-        if same_context:
-            if self._request_id - 1 == self._last_request_id:
-                # context has not changed and the correct results can be
-                # directly shown
-                debug('request completion ignored, context has not '
-                                'changed')
+        column = self._helper.current_column_nbr() - len(prefix)
+        if self._session.accepts(line, column, prefix, self._case_sensitive):
+            if self._session.pending:
+                # same context but results not yet available
+                return True
+            debug('narrowing completions of the current session')
+            previous = self._session.narrowed
+            narrowed = self._session.narrow(prefix, self._case_sensitive)
+            if narrowed is previous:
                 self._show_popup()
             else:
-                # same context but result not yet available
-                pass
+                self._show_completions(narrowed)
             return True
+        debug('requesting completion')
+        data = {
+            'code': self.editor.toPlainText(),
+            'line': line,
+            'column': column,
+            'path': self.editor.file.path,
+            'encoding': self.editor.file.encoding,
+            'prefix': prefix,
+            'request_id': self._request_id
+        }
+        try:
+            self.editor.backend.send_request(
+                backend.CodeCompletionWorker, args=data,
+                on_receive=self._on_results_available)
+        except NotRunning:
+            _logger().exception('failed to send the completion request')
+            return False
         else:
-            debug('requesting completion')
-            data = {
-                'code': self.editor.toPlainText(),
-                'line': line,
-                'column': column,
-                'path': self.editor.file.path,
-                'encoding': self.editor.file.encoding,
-                'prefix': self.completion_prefix,
-                'request_id': self._request_id
-            }
-            try:
-                self.editor.backend.send_request(
-                    backend.CodeCompletionWorker, args=data,
-                    on_receive=self._on_results_available)
-            except NotRunning:
-                _logger().exception('failed to send the completion request')
-                return False
-            else:
-                debug('request sent: %r', data)
-                self._last_cursor_column = column
-                self._last_cursor_line = line
-                self._request_id += 1
-                return True
+            debug('request sent: %r', data)
+            self._session.start(line, column, prefix, self._request_id)
+            self._request_id += 1
+            return True
 
     def _is_shortcut(self, event):
         """
@@ -539,8 +750,6 @@ class CodeCompletionMode(Mode, QtCore.QObject):
         if (self._completer.popup() is not None and
                 self._completer.popup().isVisible()):
             self._completer.popup().hide()
-            self._last_cursor_column = -1
-            self._last_cursor_line = -1
             QtWidgets.QToolTip.hideText()
 
     def _get_popup_rect(self):
@@ -601,35 +810,21 @@ class CodeCompletionMode(Mode, QtCore.QObject):
 
     def _update_model(self, completions):
         """
-        Creates a QStandardModel that holds the suggestion from the completion
-        models for the QCompleter
+        Resets the completion model (in place) with the suggestions from the
+        completion providers.
 
-        :param completionPrefix:
+        :param completions: list of completion dicts
         """
-        # build the completion model
-        cc_model = QtGui.QStandardItemModel()
         self._tooltips.clear()
         for completion in completions:
-            name = completion['name']
-            item = QtGui.QStandardItem()
-            item.setData(name, QtCore.Qt.DisplayRole)
             if 'tooltip' in completion and completion['tooltip']:
-                self._tooltips[name] = completion['tooltip']
-            if 'icon' in completion:
-                icon = completion['icon']
-                if isinstance(icon, list):
-                    icon = QtGui.QIcon.fromTheme(icon[0], QtGui.QIcon(icon[1]))
-                else:
-                    icon = QtGui.QIcon(icon)
-                item.setData(QtGui.QIcon(icon),
-                             QtCore.Qt.DecorationRole)
-            cc_model.appendRow(item)
+                self._tooltips[completion['name']] = completion['tooltip']
+        self._model.set_completions(completions)
         try:
-            self._completer.setModel(cc_model)
+            self._completer.setModel(self._model)
         except RuntimeError:
             self._create_completer()
-            self._completer.setModel(cc_model)
-        return cc_model
+        return self._model
 
     def _display_completion_tooltip(self, completion):
         if not self._show_tooltips:
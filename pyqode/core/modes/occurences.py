@@ -2,7 +2,8 @@
 This module contains the occurrences highlighter mode.
 """
 from pyqode.qt import QtGui
-from pyqode.core.api import Mode, DelayJobRunner, TextHelper, TextDecoration
+from pyqode.core.api import Mode, TextHelper, TextDecoration
+from pyqode.core.api import AnalysisScheduler
 from pyqode.core.backend import NotRunning
 from pyqode.core.backend.workers import findall
 
@@ -10,7 +11,9 @@ from pyqode.core.backend.workers import findall
 class OccurrencesHighlighterMode(Mode):
     """ Highlights occurrences of the word under the text text cursor.
 
-    The ``delay`` before searching for occurrences is configurable.
+    The ``delay`` before searching for occurrences is configurable (this
+    is the minimum delay, the search is run by the shared
+    :class:`pyqode.core.api.AnalysisScheduler`).
     """
     @property
     def delay(self):
@@ -18,11 +21,11 @@ class OccurrencesHighlighterMode(Mode):
         Delay before searching for occurrences. The timer is rearmed as soon
         as the cursor position changed.
         """
-        return self.timer.delay
+        return self._delay
 
     @delay.setter
     def delay(self, value):
-        self.timer.delay = value
+        self._delay = value
         if self.editor:
             for clone in self.editor.clones:
                 try:
@@ -102,8 +105,7 @@ class OccurrencesHighlighterMode(Mode):
     def __init__(self):
         super(OccurrencesHighlighterMode, self).__init__()
         self._decorations = []
-        #: Timer used to run the search request with a specific delay
-        self.timer = DelayJobRunner(delay=1000)
+        self._delay = 1000
         self._sub = None
         self._background = QtGui.QColor('#CCFFCC')
         self._foreground = None
@@ -116,11 +118,12 @@ class OccurrencesHighlighterMode(Mode):
         else:
             self.editor.cursorPositionChanged.disconnect(
                 self._request_highlight)
-            self.timer.cancel_requests()
+            AnalysisScheduler.instance().cancel(self)
 
     def _clear_decos(self):
-        for d in self._decorations:
-            self.editor.decorations.remove(d)
+        with self.editor.decorations.batch():
+            for d in self._decorations:
+                self.editor.decorations.remove(d)
         self._decorations[:] = []
 
     def _request_highlight(self):
@@ -130,11 +133,15 @@ class OccurrencesHighlighterMode(Mode):
             if sub != self._sub:
                 self._clear_decos()
                 if len(sub) > 1:
-                    self.timer.request_job(self._send_request)
+                    AnalysisScheduler.instance().request(
+                        self, self.editor, self._send_request, self.delay)
 
     def _send_request(self):
+        """
+        Sends the search request, returns True if the request has been sent.
+        """
         if self.editor is None:
-            return
+            return False
         cursor = self.editor.textCursor()
         self._sub = TextHelper(self.editor).word_under_cursor(
             select_whole_word=True).selectedText()
@@ -149,32 +156,31 @@ class OccurrencesHighlighterMode(Mode):
             try:
                 self.editor.backend.send_request(findall, request_data,
                                                  self._on_results_available)
+                return True
             except NotRunning:
-                self._request_highlight()
+                AnalysisScheduler.instance().request(
+                    self, self.editor, self._send_request, 100)
+        return False
 
     def _on_results_available(self, results):
-        if len(results) > 500:
-            # limit number of results (on very big file where a lots of
-            # occurrences can be found, this would totally freeze the editor
-            # during a few seconds, with a limit of 500 we can make sure
-            # the editor will always remain responsive).
-            results = results[:500]
+        AnalysisScheduler.instance().finished(self)
         current = self.editor.textCursor().position()
         if len(results) > 1:
-            for start, end in results:
-                if start <= current <= end:
-                    continue
-                deco = TextDecoration(self.editor.textCursor(),
-                                      start_pos=start, end_pos=end)
-                if self.underlined:
-                    deco.set_as_underlined(self._background)
-                else:
-                    deco.set_background(QtGui.QBrush(self._background))
-                    if self._foreground is not None:
-                        deco.set_foreground(self._foreground)
-                deco.draw_order = 3
-                self.editor.decorations.append(deco)
-                self._decorations.append(deco)
+            with self.editor.decorations.batch():
+                for start, end in results:
+                    if start <= current <= end:
+                        continue
+                    deco = TextDecoration(self.editor.textCursor(),
+                                          start_pos=start, end_pos=end)
+                    if self.underlined:
+                        deco.set_as_underlined(self._background)
+                    else:
+                        deco.set_background(QtGui.QBrush(self._background))
+                        if self._foreground is not None:
+                            deco.set_foreground(self._foreground)
+                    deco.draw_order = 3
+                    self.editor.decorations.append(deco)
+                    self._decorations.append(deco)
 
     def clone_settings(self, original):
         self.delay = original.delay
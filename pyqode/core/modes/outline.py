@@ -1,6 +1,6 @@
 import logging
 from pyqode.core.api import Mode
-from pyqode.core.api import DelayJobRunner
+from pyqode.core.api import AnalysisScheduler
 from pyqode.core.backend import NotRunning
 from pyqode.core.share import Definition
 from pyqode.qt import QtCore
@@ -19,6 +19,11 @@ class OutlineMode(Mode, QtCore.QObject):
     of pyqode.core.share.Definition (see
     pyqode.python.backend.workers.defined_names() for an example of how to
     implement the worker function).
+
+    The analysis is run by the shared
+    :class:`pyqode.core.api.AnalysisScheduler`: ``delay`` is the minimum
+    delay before running the analysis, it grows with the duration of the
+    analysis and with the size of the document.
     """
 
     #: Signal emitted when the document structure changed.
@@ -35,7 +40,7 @@ class OutlineMode(Mode, QtCore.QObject):
         Mode.__init__(self)
         QtCore.QObject.__init__(self)
         self._worker = worker
-        self._jobRunner = DelayJobRunner(delay=delay)
+        self._delay = delay
         #: The list of definitions found in the file, each item is a
         #: pyqode.core.share.Definition.
         self._results = []
@@ -47,18 +52,32 @@ class OutlineMode(Mode, QtCore.QObject):
         else:
             self.editor.textChanged.disconnect(self._request_analysis)
             self.editor.new_text_set.disconnect(self._run_analysis)
-            self._jobRunner.cancel_requests()
+            AnalysisScheduler.instance().cancel(self)
 
-    def _request_analysis(self):
-        self._jobRunner.request_job(self._run_analysis)
+    def _request_analysis(self, delay=None):
+        if self.editor is not None:
+            AnalysisScheduler.instance().request(
+                self, self.editor, self._analyse,
+                self._delay if delay is None else delay)
 
     def _run_analysis(self):
+        # a new text has been set, analyse it without waiting
+        if self.editor is not None:
+            AnalysisScheduler.instance().request(
+                self, self.editor, self._analyse, self._delay,
+                immediate=True)
+
+    def _analyse(self):
+        """
+        Sends the analysis request, returns True if the request has been
+        sent.
+        """
         try:
             self.editor.file
             self.editor.toPlainText()
         except (RuntimeError, AttributeError):
             # called by the timer after the editor got deleted
-            return
+            return False
         if self.enabled:
             request_data = {
                 'code': self.editor.toPlainText(),
@@ -69,13 +88,16 @@ class OutlineMode(Mode, QtCore.QObject):
                 self.editor.backend.send_request(
                     self._worker, request_data,
                     on_receive=self._on_results_available)
+                return True
             except NotRunning:
-                QtCore.QTimer.singleShot(100, self._run_analysis)
+                self._request_analysis(delay=100)
         else:
             self._results = []
             self.document_changed.emit()
+        return False
 
     def _on_results_available(self, results):
+        AnalysisScheduler.instance().finished(self)
         if results:
             results = [Definition.from_dict(ddict) for ddict in results]
         self._results = results
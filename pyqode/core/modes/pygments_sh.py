@@ -5,25 +5,29 @@ on pygments.
 
 .. note: This code is taken and adapted from the IPython project.
 """
+import copy
+import fnmatch
 import logging
 import mimetypes
+import os
+import pygments
+import re
 import sys
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
-from pygments.formatters.html import HtmlFormatter
 from pygments.lexer import Error, RegexLexer, Text, _TokenType
-from pygments.lexers import get_lexer_for_filename, get_lexer_for_mimetype
-from pygments.lexers.agile import PythonLexer
-from pygments.lexers.compiled import CLexer, CppLexer
-from pygments.lexers.dotnet import CSharpLexer
-from pygments.lexers.special import TextLexer
-from pygments.styles import get_style_by_name, get_all_styles
-from pygments.token import Whitespace, Comment, Token
+from pygments.token import Whitespace, Comment, Token, string_to_tokentype
 from pygments.util import ClassNotFound
-from pyqode.qt import QtGui
-from pyqode.qt.QtCore import QRegExp
+from pyqode.qt import QtCore, QtGui
 
 from pyqode.core.api.syntax_highlighter import (
     SyntaxHighlighter, ColorScheme, TextBlockUserData)
+from pyqode.core.api.folding import FoldIndex
+from pyqode.core.api.utils import LazyList, TextBlockHelper
 
 
 def _logger():
@@ -31,11 +35,17 @@ def _logger():
     return logging.getLogger(__name__)
 
 
-#: A sorted list of available pygments styles, for convenience
-PYGMENTS_STYLES = sorted(list(get_all_styles()))
+def _get_all_styles():
+    from pygments.styles import get_all_styles
+    styles = sorted(list(get_all_styles()))
+    if hasattr(sys, 'frozen'):
+        styles += ['darcula', 'qt']
+    return styles
 
-if hasattr(sys, 'frozen'):
-    PYGMENTS_STYLES += ['darcula', 'qt']
+
+#: A sorted list of available pygments styles, for convenience. The list is
+#: loaded the first time it is used.
+PYGMENTS_STYLES = LazyList(_get_all_styles)
 
 
 def get_tokens_unprocessed(self, text, stack=('root',)):
@@ -120,11 +130,287 @@ COMMENT_STATE = [(r'[^*/]', Comment.Multiline),
                  (r'/\*', Comment.Multiline, '#push'),
                  (r'\*/', Comment.Multiline, '#pop'),
                  (r'[*/]', Comment.Multiline)]
-replace_pattern(CLexer.tokens, COMMENT_START)
-replace_pattern(CppLexer.tokens, COMMENT_START)
-CLexer.tokens['comment'] = COMMENT_STATE
-CppLexer.tokens['comment'] = COMMENT_STATE
-CSharpLexer.tokens['comment'] = COMMENT_STATE
+
+_patched_lexer_classes = set()
+
+
+def patch_lexer_class(lexer_class):
+    """
+    Applies our monkey patches to a lexer class (C, C++ and C# multiline
+    comments states). The lexers modules are not imported until a lexer is
+    needed, patches are thus applied on demand, once per class.
+
+    :param lexer_class: pygments lexer class
+    """
+    if lexer_class in _patched_lexer_classes:
+        return
+    _patched_lexer_classes.add(lexer_class)
+    name = lexer_class.__name__
+    if not lexer_class.__module__.startswith('pygments.lexers'):
+        return
+    if name in ['CLexer', 'CppLexer']:
+        replace_pattern(lexer_class.tokens, COMMENT_START)
+        lexer_class.tokens['comment'] = COMMENT_STATE
+        if '_tokens' in lexer_class.__dict__:
+            # already instantiated, process the patched token definitions
+            lexer_class._tokens = lexer_class.process_tokendef(
+                '', lexer_class.get_tokendefs())
+    elif name == 'CSharpLexer':
+        lexer_class.tokens['comment'] = COMMENT_STATE
+
+
+# lexer classes, memoized by file name key and by mime type
+_lexer_classes = {}
+# regex that matches the file names patterns of the pygments lexers that are
+# not a simple extension (e.g. Makefile, *.[ch] or CMakeLists.txt)
+_special_filenames = None
+
+
+def _filename_key(filename):
+    """
+    Returns the key of a file name in the lexer classes table: the file
+    extension, unless the file name matches a pattern that is not a simple
+    extension, in which case the key is the whole file name.
+    """
+    global _special_filenames
+    if _special_filenames is None:
+        from pygments.lexers import get_all_lexers
+        patterns = set()
+        for _, _, filenames, _ in get_all_lexers():
+            for pattern in filenames:
+                if (not pattern.startswith('*.') or
+                        re.search(r'[*?\[.]', pattern[2:])):
+                    patterns.add(fnmatch.translate(pattern))
+        _special_filenames = re.compile('|'.join(sorted(patterns)) or '$^')
+    basename = os.path.basename(filename)
+    if _special_filenames.match(basename):
+        return 'filename', basename
+    # '*.ext' patterns only depend on the last extension
+    _, sep, ext = basename.rpartition('.')
+    return 'extension', ext if sep else None
+
+
+def get_lexer_class_for_filename(filename):
+    """
+    Returns the pygments lexer class for a file name. Results are memoized
+    by extension (or by file name for the file names that need it), so the
+    pygments registry is only scanned once per extension.
+
+    :param filename: file name or path
+    :raises: pygments.util.ClassNotFound if there is no lexer for the file
+        name.
+    """
+    key = _filename_key(filename)
+    try:
+        lexer_class = _lexer_classes[key]
+    except KeyError:
+        from pygments.lexers import find_lexer_class_for_filename
+        lexer_class = find_lexer_class_for_filename(filename)
+        _lexer_classes[key] = lexer_class
+    if lexer_class is None:
+        raise ClassNotFound('no lexer for filename %r found' % filename)
+    return lexer_class
+
+
+def get_lexer_class_for_mimetype(mime):
+    """
+    Returns the pygments lexer class for a mime type (memoized).
+
+    :param mime: mime type
+    :raises: pygments.util.ClassNotFound if there is no lexer for the mime
+        type.
+    """
+    key = 'mimetype', mime
+    try:
+        lexer_class = _lexer_classes[key]
+    except KeyError:
+        from pygments.lexers import get_lexer_for_mimetype
+        try:
+            lexer_class = type(get_lexer_for_mimetype(mime))
+        except ClassNotFound:
+            lexer_class = None
+        _lexer_classes[key] = lexer_class
+    if lexer_class is None:
+        raise ClassNotFound('no lexer for mimetype %r found' % mime)
+    return lexer_class
+
+
+def _create_lexer(lexer_class, **options):
+    patch_lexer_class(lexer_class)
+    return lexer_class(**options)
+
+
+def _text_lexer():
+    from pygments.lexers.special import TextLexer
+    return TextLexer()
+
+
+_WHITESPACES = re.compile(r'\s+')
+
+
+def tokenize(lexer, text, stack=None):
+    """
+    Tokenizes a line of text.
+
+    Whitespaces are split out of the other tokens (as
+    ``pygments.token.Whitespace`` runs) so that they can be highlighted in
+    the same pass.
+
+    :param lexer: pygments lexer
+    :param text: text of the line
+    :param stack: lexer state stack at the start of the line (tuple), None
+        to start from the lexer's default state.
+    :returns: a tuple made up of the format runs of the line (a tuple of
+        (start, length, token)) and the lexer state stack at the end of the
+        line (None if the lexer does not save its state).
+    """
+    if stack is not None:
+        lexer._saved_state_stack = stack
+    elif hasattr(lexer, '_saved_state_stack'):
+        del lexer._saved_state_stack
+    runs = []
+
+    def add_run(start, length, token):
+        if runs and runs[-1][2] is token:
+            # merge consecutive runs of the same token
+            runs[-1] = (runs[-1][0], runs[-1][1] + length, token)
+        else:
+            runs.append((start, length, token))
+
+    index = 0
+    for token, value in lexer.get_tokens(text):
+        length = len(value)
+        if value.isspace():
+            add_run(index, length, Whitespace)
+        elif _WHITESPACES.search(value) is None:
+            add_run(index, length, token)
+        else:
+            pos = 0
+            for match in _WHITESPACES.finditer(value):
+                start, end = match.span()
+                if start > pos:
+                    add_run(index + pos, start - pos, token)
+                add_run(index + start, end - start, Whitespace)
+                pos = end
+            if pos < length:
+                add_run(index + pos, length - pos, token)
+        index += length
+    stack = getattr(lexer, '_saved_state_stack', None)
+    if stack is not None:
+        stack = tuple(stack)
+        del lexer._saved_state_stack
+    return tuple(runs), stack
+
+
+def _text_key(text):
+    """
+    Returns a key that identifies the text of a line: the tokens of a block
+    are only reused if the key of the block text did not change (this
+    avoids keeping a copy of the text of each block in memory).
+
+    :param text: text of the line
+    :returns: a (length, hash) tuple
+    """
+    return len(text), hash(text)
+
+
+class BackgroundTokenizer(QtCore.QObject):
+    """
+    Tokenizes lines of text on a background thread.
+
+    Results are sent back to the GUI thread, chunk by chunk, through the
+    :attr:`tokenized` signal. Starting a new job cancels the previous one.
+    """
+    #: Signal emitted when a chunk of lines has been tokenized. Parameters
+    #: are the job id, the number of the first line of the chunk and the list
+    #: of (text key, start stack, runs, end stack) tuples of the chunk lines
+    #: (None if the lexer failed). The text key is the (length, hash) tuple
+    #: of the line text.
+    tokenized = QtCore.Signal(int, int, object)
+
+    #: Number of lines per chunk.
+    CHUNK_SIZE = 256
+
+    def __init__(self, parent=None):
+        super(BackgroundTokenizer, self).__init__(parent)
+        self._jobs = queue.Queue()
+        self._job_id = 0
+        self._thread = None
+
+    @property
+    def job_id(self):
+        """
+        Id of the current job.
+        """
+        return self._job_id
+
+    def start(self, lexer, lines, first_line=0, stack=None):
+        """
+        Starts tokenizing lines of text in the background.
+
+        :param lexer: pygments lexer. The lexer is copied, it can still be
+            used from the GUI thread.
+        :param lines: list of lines to tokenize
+        :param first_line: number of the first line
+        :param stack: lexer state stack at the start of the first line
+        :returns: the job id
+        """
+        self._job_id += 1
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+        lexer = copy.copy(lexer)
+        if hasattr(lexer, '_saved_state_stack'):
+            del lexer._saved_state_stack
+        self._jobs.put((self._job_id, lexer, lines, first_line, stack))
+        return self._job_id
+
+    def cancel(self):
+        """
+        Cancels the current job.
+        """
+        self._job_id += 1
+
+    def stop(self):
+        """
+        Cancels the current job and stops the background thread.
+        """
+        self.cancel()
+        if self._thread is not None:
+            self._jobs.put(None)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            try:
+                self._tokenize(*job)
+            except RuntimeError:
+                # object deleted while tokenizing (editor closed)
+                return
+
+    def _tokenize(self, job_id, lexer, lines, first_line, stack):
+        chunk = []
+        for text in lines:
+            if job_id != self._job_id:
+                return
+            try:
+                runs, end_stack = tokenize(lexer, text, stack)
+            except Exception:
+                _logger().exception('failed to tokenize %r', text)
+                self.tokenized.emit(job_id, first_line, None)
+                return
+            chunk.append((_text_key(text), stack, runs, end_stack))
+            stack = end_stack
+            if len(chunk) == self.CHUNK_SIZE:
+                self.tokenized.emit(job_id, first_line, chunk)
+                first_line += len(chunk)
+                chunk = []
+        if chunk and job_id == self._job_id:
+            self.tokenized.emit(job_id, first_line, chunk)
 
 
 class PygmentsSH(SyntaxHighlighter):
@@ -137,13 +423,26 @@ class PygmentsSH(SyntaxHighlighter):
     namespace packages to see what other languages are available (at the time
     of writing, only python has specialised support).
 
-    .. warning:: There are some issues with multi-line comments, they are not
-                 properly highlighted until a full re-highlight is triggered.
-                 The text is automatically re-highlighted on save.
+    The lexer state at the end of each block is stored as the block state so
+    that an edit only re-highlights the next blocks as long as their start
+    state changes (e.g. when a multi-line comment is opened or closed).
     """
     #: Mode description
     DESCRIPTION = "Apply syntax highlighting to the editor using pygments"
 
+    #: Number of lexer state ids, the ids are reassigned once they have all
+    #: been used. An id is stored in the 16 bits of the block user state, the
+    #: highest bit is the generation of the ids (see :meth:`_get_state_id`).
+    MAX_STATE_ID = 0x7FFF
+
+    # block state of the blocks whose lexer state id has been discarded (not
+    # a valid id)
+    _INVALID_STATE_ID = 0xFFFF
+
+    #: Version of the highlighting data (see :meth:`dump_highlighting`), must
+    #: be incremented when the format runs produced by :func:`tokenize` change
+    CACHE_VERSION = 1
+
     @property
     def pygments_style(self):
         """
@@ -153,8 +452,10 @@ class PygmentsSH(SyntaxHighlighter):
 
     @pygments_style.setter
     def pygments_style(self, value):
-        self._pygments_style = value
-        self._update_style()
+        # the style is shared by all the views of the document
+        highlighter = self.document_highlighter
+        highlighter._pygments_style = value
+        highlighter._update_style()
         # triggers a rehighlight
         self.color_scheme = ColorScheme(value)
 
@@ -162,22 +463,61 @@ class PygmentsSH(SyntaxHighlighter):
         super(PygmentsSH, self).__init__(document, color_scheme=color_scheme)
         self._pygments_style = self.color_scheme.name
         self._style = None
-        self._formatter = HtmlFormatter(nowrap=True)
-        self._lexer = lexer if lexer else PythonLexer()
+        if lexer is None:
+            from pygments.lexers import PythonLexer
+            lexer = _create_lexer(PythonLexer)
+        else:
+            patch_lexer_class(type(lexer))
+        self._lexer = lexer
 
         self._brushes = {}
+        #: Formats of the pygments tokens, resolved once per style
         self._formats = {}
+        # whitespaces settings used to build the whitespace format
+        self._whitespaces = None
         self._init_style()
-        self._prev_block = None
+        #: True to tokenize big documents on a background thread while they
+        #: are highlighted lazily.
+        self.background_tokenization = True
+        self._tokenizer = BackgroundTokenizer(self)
+        self._tokenizer.tokenized.connect(self._on_tokenized)
+        self._job_id = None
+        self._job_lexer = None
+        self._job_nb_blocks = 0
+        self._job_limit = 0
+        # True if the blocks of the current lazy highlighting pass do not need
+        # to be tokenized in the background (already tokenized or lexer
+        # error)
+        self._tokenized = False
+        # lexer state stacks ids, the default state is 0
+        self._state_ids = {None: 0, ('root', ): 0}
+        # generation of the lexer state ids (0 or 0x8000)
+        self._state_generation = 0
 
     def _init_style(self):
         """ Init pygments style """
         self._update_style()
 
     def clone_settings(self, original):
-
         # The lexer can be shared between clones.
         self._lexer = original._lexer
+        super(PygmentsSH, self).clone_settings(original)
+
+    def _take_over(self, highlighter):
+        # the blocks data (tokens and lexer state ids) stay valid, we only
+        # need to apply their formats again.
+        tokenized = not highlighter.lazy_highlighting_in_progress
+        self._lexer = highlighter._lexer
+        self._state_ids = highlighter._state_ids
+        self._state_generation = highlighter._state_generation
+        self._pygments_style = highlighter._pygments_style
+        self._style = highlighter._style
+        self._brushes = highlighter._brushes
+        self._formats = highlighter._formats
+        self._whitespaces = highlighter._whitespaces
+        super(PygmentsSH, self)._take_over(highlighter)
+        if tokenized:
+            self._tokenized = True
 
     def on_install(self, editor):
         """
@@ -187,29 +527,38 @@ class PygmentsSH(SyntaxHighlighter):
         self._update_style()
         super(PygmentsSH, self).on_install(editor)
 
+    def on_uninstall(self):
+        self._tokenizer.stop()
+        super(PygmentsSH, self).on_uninstall()
+
     def set_mime_type(self, mime_type):
         """
         Update the highlighter lexer based on a mime type.
 
         :param mime_type: mime type of the new lexer to setup.
         """
+        if self._document_highlighter is not None:
+            # the lexer is shared by all the views of the document
+            ret_val = self._document_highlighter.set_mime_type(mime_type)
+            self._lexer = self._document_highlighter._lexer
+            return ret_val
 
         if not mime_type:
             # Fall back to TextLexer
-            self._lexer = TextLexer()
+            self._lexer = _text_lexer()
             return False
         try:
             self.set_lexer_from_mime_type(mime_type)
         except ClassNotFound:
             _logger().exception('failed to get lexer from mimetype')
-            self._lexer = TextLexer()
+            self._lexer = _text_lexer()
             return False
         except ImportError:
             # import error while loading some pygments plugins, the editor
             # should not crash
             _logger().warning('failed to get lexer from mimetype (%s)' %
                               mime_type)
-            self._lexer = TextLexer()
+            self._lexer = _text_lexer()
             return False
         else:
             return True
@@ -221,22 +570,29 @@ class PygmentsSH(SyntaxHighlighter):
 
         :param filename: Filename or extension
         """
+        if self._document_highlighter is not None:
+            self._document_highlighter.set_lexer_from_filename(filename)
+            self._lexer = self._document_highlighter._lexer
+            return
         self._lexer = None
         if filename.endswith("~"):
             filename = filename[0:len(filename) - 1]
         try:
-            self._lexer = get_lexer_for_filename(filename)
+            self._lexer = _create_lexer(
+                get_lexer_class_for_filename(filename))
         except (ClassNotFound, ImportError):
             print('class not found for url', filename)
             try:
                 m = mimetypes.guess_type(filename)
-                self._lexer = get_lexer_for_mimetype(m[0])
+                self._lexer = _create_lexer(
+                    get_lexer_class_for_mimetype(m[0]))
             except (ClassNotFound, IndexError, ImportError):
-                self._lexer = get_lexer_for_mimetype('text/plain')
+                self._lexer = _create_lexer(
+                    get_lexer_class_for_mimetype('text/plain'))
         if self._lexer is None:
             _logger().warning('failed to get lexer from filename: %s, using '
                               'plain text instead...', filename)
-            self._lexer = TextLexer()
+            self._lexer = _text_lexer()
 
     def set_lexer_from_mime_type(self, mime, **options):
         """
@@ -245,12 +601,19 @@ class PygmentsSH(SyntaxHighlighter):
         :param mime: mime type
         :param options: optional addtional options.
         """
+        if self._document_highlighter is not None:
+            self._document_highlighter.set_lexer_from_mime_type(
+                mime, **options)
+            self._lexer = self._document_highlighter._lexer
+            return
 
         try:
-            self._lexer = get_lexer_for_mimetype(mime, **options)
+            self._lexer = _create_lexer(
+                get_lexer_class_for_mimetype(mime), **options)
         except (ClassNotFound, ImportError):
             print('class not found for mime', mime)
-            self._lexer = get_lexer_for_mimetype('text/plain')
+            self._lexer = _create_lexer(
+                get_lexer_class_for_mimetype('text/plain'))
         else:
             _logger().debug('lexer for mimetype (%s): %r', mime, self._lexer)
 
@@ -258,58 +621,253 @@ class PygmentsSH(SyntaxHighlighter):
         """
         Highlights the block using a pygments lexer.
 
+        The block is tokenized unless it has already been tokenized (by the
+        background tokenizer or by a previous highlighting pass) with the
+        same lexer, text and lexer start state.
+
         :param text: text of the block to highlith
         :param block: block to highlight
         """
         if self.color_scheme.name != self._pygments_style:
             self._pygments_style = self.color_scheme.name
             self._update_style()
-        original_text = text
         if self.editor and self._lexer and self.enabled:
+            stack = None
             if block.blockNumber():
-                prev_data = self._prev_block.userData()
-                if prev_data:
-                    if hasattr(prev_data, "syntax_stack"):
-                        self._lexer._saved_state_stack = prev_data.syntax_stack
-                    elif hasattr(self._lexer, '_saved_state_stack'):
-                        del self._lexer._saved_state_stack
-
-            # Lex the text using Pygments
-            index = 0
+                stack = getattr(block.previous().userData(), 'syntax_stack',
+                                None)
             usd = block.userData()
             if usd is None:
                 usd = TextBlockUserData()
                 block.setUserData(usd)
-            tokens = list(self._lexer.get_tokens(text))
-            for token, text in tokens:
-                length = len(text)
+            tokens = getattr(usd, 'tokens', None)
+            key = _text_key(text)
+            if (tokens is not None and tokens[0] is self._lexer and
+                    tokens[1] == key and tokens[2] == stack):
+                runs, end_stack = tokens[3], tokens[4]
+            else:
+                runs, end_stack = tokenize(self._lexer, text, stack)
+                usd.tokens = (self._lexer, key, stack, runs, end_stack)
+            usd.syntax_stack = end_stack
+            # the next blocks are only re-highlighted if the state changed
+            TextBlockHelper.set_state(block, self._get_state_id(end_stack))
+            self._apply_runs(runs)
+
+    def _highlight_deferred_block(self, text, block):
+        # re-apply the runs of the block if they are still valid
+        if not self.editor or not self._lexer or not self.enabled:
+            return False
+        tokens = getattr(block.userData(), 'tokens', None)
+        if (tokens is None or tokens[0] is not self._lexer or
+                tokens[1] != _text_key(text)):
+            return False
+        self._apply_runs(tokens[3])
+        return True
+
+    def _apply_runs(self, runs):
+        """
+        Applies the format runs of the current block.
+        """
+        # whitespaces are part of the runs, they are highlighted in the
+        # same pass as the other tokens.
+        whitespaces = (self.editor.show_whitespaces,
+                       self.editor.whitespaces_foreground)
+        if whitespaces != self._whitespaces:
+            self._whitespaces = whitespaces
+            self._formats.clear()
+        formats = self._formats
+        for index, length, token in runs:
+            try:
+                fmt = formats[token]
+            except KeyError:
                 fmt = self._get_format(token)
-                if token in [Token.Literal.String, Token.Literal.String.Doc,
-                             Token.Comment]:
-                    fmt.setObjectType(fmt.UserObject)
-                self.setFormat(index, length, fmt)
-                index += length
-
-            if hasattr(self._lexer, '_saved_state_stack'):
-                setattr(usd, "syntax_stack", self._lexer._saved_state_stack)
-                # Clean up for the next go-round.
-                del self._lexer._saved_state_stack
-
-            # spaces
-            text = original_text
-            expression = QRegExp(r'\s+')
-            index = expression.indexIn(text, 0)
-            while index >= 0:
-                index = expression.pos(0)
-                length = len(expression.cap(0))
-                self.setFormat(index, length, self._get_format(Whitespace))
-                index = expression.indexIn(text, index + length)
-
-            self._prev_block = block
+            self.setFormat(index, length, fmt)
+
+    def _highlight_whitespaces(self, text):
+        # whitespaces are highlighted by highlight_block
+        pass
+
+    def _get_state_id(self, stack):
+        """
+        Returns the id of a lexer state stack. The id fits in the 16 bits
+        available for the highlighter state in the block user state.
+
+        Once :attr:`MAX_STATE_ID` ids have been used, the ids are reassigned
+        with the other generation bit (see :meth:`_reset_state_ids`).
+        """
+        try:
+            return self._state_ids[stack]
+        except KeyError:
+            if len(self._state_ids) > self.MAX_STATE_ID:
+                self._reset_state_ids()
+            state_id = self._state_generation | (len(self._state_ids) - 1)
+            self._state_ids[stack] = state_id
+            return state_id
+
+    def _reset_state_ids(self):
+        """
+        Discards the lexer state ids.
+
+        The blocks keep their state id until they are highlighted again: a
+        reassigned id would be mistaken for the (different) state of such a
+        block and QSyntaxHighlighter would stop propagating the new state to
+        the next blocks. The state of every block is invalidated and the new
+        ids use the other generation bit (the state of the block being
+        highlighted has already been read by QSyntaxHighlighter).
+        """
+        self._state_generation ^= 0x8000
+        generation = self._state_generation
+        self._state_ids = {None: generation, ('root', ): generation}
+        document = self.document()
+        if document is None:
+            return
+        block = document.firstBlock()
+        while block.isValid():
+            if block.userState() != -1:
+                TextBlockHelper.set_state(block, self._INVALID_STATE_ID)
+            block = block.next()
+
+    @property
+    def cache_id(self):
+        """
+        Identifies the lexer and the highlighter version that produce the
+        highlighting data.
+        """
+        lexer = self._lexer
+        if lexer is None:
+            return None
+        return '%s.%s(%s)-pygments%s-%d' % (
+            lexer.__class__.__module__, lexer.__class__.__name__,
+            ','.join('%s=%r' % item for item in sorted(lexer.options.items())),
+            pygments.__version__, self.CACHE_VERSION)
+
+    def dump_highlighting(self):
+        document = self.document()
+        if (document is None or self._lexer is None or
+                self.lazy_highlighting_in_progress):
+            return None
+        blocks = []
+        names = {}
+        block = document.firstBlock()
+        while block.isValid():
+            tokens = getattr(block.userData(), 'tokens', None)
+            if (tokens is None or tokens[0] is not self._lexer or
+                    tokens[1] != _text_key(block.text())):
+                # not highlighted
+                return None
+            runs = []
+            for start, length, token in tokens[3]:
+                try:
+                    name = names[token]
+                except KeyError:
+                    name = names[token] = str(token)
+                runs.append((start, length, name))
+            # only keep the fold bits of the user state (see TextBlockHelper)
+            blocks.append((block.userState() & 0x7FFF0000, tokens[4], runs))
+            block = block.next()
+        return self.cache_id, blocks
+
+    def restore_highlighting(self, cache_id, blocks):
+        document = self.document()
+        if (document is None or self._lexer is None or
+                cache_id != self.cache_id or
+                len(blocks) != document.blockCount()):
+            return False
+        stack = None
+        block = document.firstBlock()
+        for state, end_stack, runs in blocks:
+            usd = block.userData()
+            if usd is None:
+                usd = TextBlockUserData()
+                block.setUserData(usd)
+            # the runs token types are still names, they are converted by
+            # _get_format when the runs are applied.
+            usd.tokens = (self._lexer, _text_key(block.text()), stack, runs,
+                          end_stack)
+            if block.userState() == -1:
+                # restore the fold data of blocks that are not highlighted
+                block.setUserState(state)
+            stack = end_stack
+            block = block.next()
+        index = FoldIndex.get(document)
+        if index is not None:
+            index.rebuild()
+        # the blocks are already tokenized
+        self._tokenized = True
+        return True
+
+    def lazy_rehighlight(self):
+        self._tokenized = False
+        super(PygmentsSH, self).lazy_rehighlight()
+
+    def lazy_highlighting_limit(self):
+        if self._job_id is None:
+            return super(PygmentsSH, self).lazy_highlighting_limit()
+        return self._job_limit
+
+    def _highlight_next_chunk(self):
+        document = self.document()
+        if (self._frontier is not None and document is not None and
+                self.background_tokenization and not self._tokenized and
+                (self._job_id is None or
+                 self._job_nb_blocks != document.blockCount())):
+            self._start_background_tokenization()
+        super(PygmentsSH, self)._highlight_next_chunk()
+
+    def _stop_lazy_highlighting(self):
+        super(PygmentsSH, self)._stop_lazy_highlighting()
+        self._tokenizer.cancel()
+        self._job_id = None
+
+    def _start_background_tokenization(self):
+        """
+        Tokenizes the blocks that have not been highlighted yet on a
+        background thread.
+        """
+        document = self.document()
+        block = self._frontier.block()
+        first = block.blockNumber()
+        stack = None
+        if first:
+            stack = getattr(block.previous().userData(), 'syntax_stack', None)
+        lines = document.toPlainText().split('\n')[first:]
+        self._job_lexer = self._lexer
+        self._job_nb_blocks = document.blockCount()
+        self._job_limit = first
+        self._job_id = self._tokenizer.start(self._lexer, lines, first, stack)
+
+    def _on_tokenized(self, job_id, first_line, chunk):
+        if job_id != self._job_id:
+            return
+        document = self.document()
+        if document is None:
+            return
+        if chunk is None:
+            # lexer error, blocks will be tokenized in the GUI thread
+            self._tokenized = True
+            self._job_id = None
+        elif document.blockCount() != self._job_nb_blocks:
+            # lines have been added or removed, restart from the frontier
+            self._tokenizer.cancel()
+            self._job_id = None
+        else:
+            block = document.findBlockByNumber(first_line)
+            for tokens in chunk:
+                if not block.isValid():
+                    break
+                usd = block.userData()
+                if usd is None:
+                    usd = TextBlockUserData()
+                    block.setUserData(usd)
+                usd.tokens = (self._job_lexer, ) + tokens
+                block = block.next()
+            self._job_limit = first_line + len(chunk)
+        self._resume_lazy_highlighting()
 
     def _update_style(self):
         """ Sets the style to the specified Pygments style.
         """
+        from pygments.styles import get_style_by_name
         try:
             self._style = get_style_by_name(self._pygments_style)
         except ClassNotFound:
@@ -335,13 +893,25 @@ class PygmentsSH(SyntaxHighlighter):
     def _get_format(self, token):
         """ Returns a QTextCharFormat for token or None.
         """
-        if token == Whitespace:
-            return self.editor.whitespaces_foreground
-
         if token in self._formats:
             return self._formats[token]
 
-        result = self._get_format_from_style(token, self._style)
+        if not isinstance(token, _TokenType):
+            # token name, from the highlighting cache
+            result = self._get_format(string_to_tokentype(token))
+        elif token == Whitespace:
+            if self.editor.show_whitespaces:
+                result = self.formats['whitespace']
+            else:
+                result = QtGui.QTextCharFormat()
+                result.setForeground(self.editor.whitespaces_foreground)
+        else:
+            result = self._get_format_from_style(token, self._style)
+            if token in [Token.Literal.String, Token.Literal.String.Doc,
+                         Token.Comment]:
+                # mark strings, comments and docstrings regions for further
+                # queries
+                result.setObjectType(result.UserObject)
 
         self._formats[token] = result
         return result
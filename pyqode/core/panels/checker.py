@@ -90,13 +90,14 @@ class CheckerPanel(Panel):
         line = TextHelper(self.editor).line_nbr_from_position(event.pos().y())
         if line:
             markers = self.marker_for_line(line)
-            text = '\n'.join([marker.description for marker in markers if
-                              marker.description])
             if len(markers):
                 if self._previous_line != line:
                     top = TextHelper(self.editor).line_pos_from_number(
                         markers[0].line)
                     if top:
+                        text = '\n'.join([marker.description
+                                          for marker in markers
+                                          if marker.description])
                         self._job_runner.request_job(self._display_tooltip,
                                                      text, top)
             else:
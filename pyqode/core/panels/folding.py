@@ -162,8 +162,11 @@ class FoldingPanel(Panel):
         #: the list of deco used to highlight the current fold region (
         #: surrounding regions are darker)
         self._scope_decos = []
-        #: the list of folded blocs decorations
-        self._block_decos = []
+        #: the folded blocks decorations, by block number
+        self._block_decos = {}
+        #: True if lines have been added or removed since the folded blocks
+        #: decorations have been indexed
+        self._block_decos_moved = False
         self.setMouseTracking(True)
         self.scrollable = True
         self._mouse_over_line = None
@@ -229,34 +232,61 @@ class FoldingPanel(Panel):
                 self._draw_fold_region_background(block, painter)
             except ValueError:
                 pass
-        # Draw fold triggers
-        for top_position, line_number, block in self.editor.visible_blocks:
-            if TextBlockHelper.is_fold_trigger(block):
+        # Draw fold triggers, the decorations added or removed are applied
+        # at once
+        with self.editor.decorations.batch():
+            for top_position, line_number, block in \
+                    self.editor.visible_blocks:
+                if not TextBlockHelper.is_fold_trigger(block):
+                    continue
                 collapsed = TextBlockHelper.is_collapsed(block)
                 mouse_over = self._mouse_over_line == line_number
                 self._draw_fold_indicator(
                     top_position, mouse_over, collapsed, painter)
+                # the block decoration might have been added/removed by the
+                # parent editor/document in the case of cloned editor
+                deco = self._get_block_deco(block)
                 if collapsed:
-                    # check if the block already has a decoration, it might
-                    # have been folded by the parent editor/document in the
-                    # case of cloned editor
-                    for deco in self._block_decos:
-                        if deco.block == block:
-                            # no need to add a deco, just go to the next block
-                            break
-                    else:
+                    if deco is None:
                         self._add_fold_decoration(block, FoldScope(block))
+                elif deco is not None:
+                    del self._block_decos[line_number]
+                    self.editor.decorations.remove(deco)
+
+    def _get_block_deco(self, block):
+        """
+        Returns the decoration of a folded block, None if the block has no
+        decoration.
+        """
+        if self._block_decos_moved:
+            self._index_block_decos()
+        line = block.blockNumber()
+        deco = self._block_decos.get(line)
+        if deco is not None and deco.block != block:
+            # the decorated block has been replaced
+            del self._block_decos[line]
+            self.editor.decorations.remove(deco)
+            deco = None
+        return deco
+
+    def _index_block_decos(self):
+        """
+        Indexes the folded blocks decorations by block number again, the
+        decorations of removed blocks are removed.
+        """
+        decos = self._block_decos
+        self._block_decos = {}
+        self._block_decos_moved = False
+        with self.editor.decorations.batch():
+            for deco in decos.values():
+                line = deco.block.blockNumber()
+                if deco.block.isValid() and line not in self._block_decos:
+                    self._block_decos[line] = deco
                 else:
-                    for deco in self._block_decos:
-                        # check if the block decoration has been removed, it
-                        # might have been unfolded by the parent
-                        # editor/document in the case of cloned editor
-                        if deco.block == block:
-                            # remove it and
-                            self._block_decos.remove(deco)
-                            self.editor.decorations.remove(deco)
-                            del deco
-                            break
+                    self.editor.decorations.remove(deco)
+
+    def _on_block_count_changed(self):
+        self._block_decos_moved = True
 
     def _draw_fold_region_background(self, block, painter):
         """
@@ -389,7 +419,13 @@ class FoldingPanel(Panel):
         """
         Find parent scope, if the block is not a fold trigger.
 
+        Unlike :meth:`pyqode.core.api.FoldScope.find_parent_scope`, the
+        search never gives up.
+
         """
+        parent = FoldScope.find_parent_scope(block)
+        if parent is not None:
+            return parent
         original = block
         if not TextBlockHelper.is_fold_trigger(block):
             # search level of next non blank line
@@ -408,8 +444,9 @@ class FoldingPanel(Panel):
         Clear scope decorations (on the editor)
 
         """
-        for deco in self._scope_decos:
-            self.editor.decorations.remove(deco)
+        with self.editor.decorations.batch():
+            for deco in self._scope_decos:
+                self.editor.decorations.remove(deco)
         self._scope_decos[:] = []
 
     def _get_scope_highlight_color(self):
@@ -506,11 +543,12 @@ class FoldingPanel(Panel):
         if (self._current_scope is None or
                 self._current_scope.get_range() != scope.get_range()):
             self._current_scope = scope
-            self._clear_scope_decos()
-            # highlight surrounding parent scopes with a darker color
-            start, end = scope.get_range()
-            if not TextBlockHelper.is_collapsed(block):
-                self._add_scope_decorations(block, start, end)
+            with self.editor.decorations.batch():
+                self._clear_scope_decos()
+                # highlight surrounding parent scopes with a darker color
+                start, end = scope.get_range()
+                if not TextBlockHelper.is_collapsed(block):
+                    self._add_scope_decorations(block, start, end)
 
     def mouseMoveEvent(self, event):
         """
@@ -584,7 +622,7 @@ class FoldingPanel(Panel):
             self._get_scope_highlight_color(), 110))
         deco.set_background(self._get_scope_highlight_color())
         deco.set_foreground(QtGui.QColor('#808080'))
-        self._block_decos.append(deco)
+        self._block_decos[block.blockNumber()] = deco
         self.editor.decorations.append(deco)
 
     def toggle_fold_trigger(self, block):
@@ -604,9 +642,58 @@ class FoldingPanel(Panel):
         else:
             region.fold()
             self._clear_scope_decos()
-        self._refresh_editor_and_scrollbars()
+        self._refresh_editor_and_scrollbars(
+            *region.get_range(ignore_blank_lines=False))
         self.trigger_state_changed.emit(region._trigger, region.collapsed)
 
+    def collapse(self, blocks):
+        """
+        Collapses many fold triggers at once.
+
+        All the regions are folded first, then the editor is refreshed once
+        (instead of once per region with :meth:`toggle_fold_trigger`).
+
+        :param blocks: list of fold trigger blocks, blocks that are not fold
+            triggers or that are already collapsed are ignored.
+        """
+        self._set_collapsed(blocks, True)
+
+    def expand(self, blocks):
+        """
+        Expands many fold triggers at once.
+
+        All the regions are unfolded first, then the editor is refreshed once
+        (instead of once per region with :meth:`toggle_fold_trigger`).
+
+        :param blocks: list of fold trigger blocks, blocks that are not fold
+            triggers or that are already expanded are ignored.
+        """
+        self._set_collapsed(blocks, False)
+
+    def _set_collapsed(self, blocks, collapsed):
+        triggers = []
+        start = end = None
+        for block in blocks:
+            if (not TextBlockHelper.is_fold_trigger(block) or
+                    TextBlockHelper.is_collapsed(block) == collapsed):
+                continue
+            region = FoldScope(block)
+            if collapsed:
+                region.fold()
+            else:
+                region.unfold()
+            first, last = region.get_range(ignore_blank_lines=False)
+            start = first if start is None else min(start, first)
+            end = last if end is None else max(end, last)
+            triggers.append(block)
+        if not triggers:
+            return
+        if collapsed:
+            self._clear_scope_decos()
+        self._refresh_editor_and_scrollbars(start, end)
+        for block in triggers:
+            self.trigger_state_changed.emit(block, collapsed)
+
     def mousePressEvent(self, event):
         """ Folds/unfolds the pressed indicator if any. """
         if self._mouse_over_line is not None:
@@ -631,6 +718,8 @@ class FoldingPanel(Panel):
                     self._highlight_caret_scope)
                 self._block_nbr = -1
             self.editor.new_text_set.connect(self._clear_block_deco)
+            self.editor.blockCountChanged.connect(
+                self._on_block_count_changed)
         else:
             self.editor.key_pressed.disconnect(self._on_key_pressed)
             if self._highlight_caret:
@@ -638,6 +727,8 @@ class FoldingPanel(Panel):
                     self._highlight_caret_scope)
                 self._block_nbr = -1
             self.editor.new_text_set.disconnect(self._clear_block_deco)
+            self.editor.blockCountChanged.disconnect(
+                self._on_block_count_changed)
 
     def _on_key_pressed(self, event):
         """
@@ -673,18 +764,6 @@ class FoldingPanel(Panel):
                         tc.setPosition(end, tc.KeepAnchor)
                         self.editor.setTextCursor(tc)
 
-    @staticmethod
-    def _show_previous_blank_lines(block):
-        """
-        Show the block previous blank lines
-        """
-        # set previous blank lines visibles
-        pblock = block.previous()
-        while (pblock.text().strip() == '' and
-               pblock.blockNumber() >= 0):
-            pblock.setVisible(True)
-            pblock = pblock.previous()
-
     def refresh_decorations(self, force=False):
         """
         Refresh decorations colors. This function is called by the syntax
@@ -695,31 +774,45 @@ class FoldingPanel(Panel):
         cursor = self.editor.textCursor()
         if (self._prev_cursor is None or force or
                 self._prev_cursor.blockNumber() != cursor.blockNumber()):
-            for deco in self._block_decos:
-                self.editor.decorations.remove(deco)
-            for deco in self._block_decos:
-                deco.set_outline(drift_color(
-                    self._get_scope_highlight_color(), 110))
-                deco.set_background(self._get_scope_highlight_color())
-                self.editor.decorations.append(deco)
+            with self.editor.decorations.batch():
+                for deco in self._block_decos.values():
+                    self.editor.decorations.remove(deco)
+                for deco in self._block_decos.values():
+                    deco.set_outline(drift_color(
+                        self._get_scope_highlight_color(), 110))
+                    deco.set_background(self._get_scope_highlight_color())
+                    self.editor.decorations.append(deco)
         self._prev_cursor = cursor
 
-    def _refresh_editor_and_scrollbars(self):
+    def _refresh_editor_and_scrollbars(self, start=None, end=None):
         """
         Refrehes editor content and scollbars.
 
-        We generate a fake resize event to refresh scroll bar.
+        Only the layout of the blocks between ``start`` and ``end`` is
+        updated (the whole document if no range is given).
+
+        The scroll bars are not refreshed when blocks are hidden (see
+        http://www.qtcentre.org/threads/44803), we emit the document size
+        changed signal of the document layout to refresh them.
 
-        We have the same problem as described here:
-        http://www.qtcentre.org/threads/44803 and we apply the same solution
-        (don't worry, there is no visual effect, the editor does not grow up
-        at all, even with a value = 500)
+        :param start: first line that has been shown or hidden
+        :param end: last line that has been shown or hidden
         """
-        TextHelper(self.editor).mark_whole_doc_dirty()
+        document = self.editor.document()
+        if start is None:
+            first = document.firstBlock()
+        else:
+            first = document.findBlockByNumber(start)
+        if end is None or not document.findBlockByNumber(end).isValid():
+            last = document.lastBlock()
+        else:
+            last = document.findBlockByNumber(end)
+        document.markContentsDirty(
+            first.position(),
+            last.position() + last.length() - 1 - first.position())
+        layout = document.documentLayout()
+        layout.documentSizeChanged.emit(layout.documentSize())
         self.editor.repaint()
-        s = self.editor.size()
-        s.setWidth(s.width() + 1)
-        self.editor.resizeEvent(QtGui.QResizeEvent(self.editor.size(), s))
 
     def collapse_all(self):
         """
@@ -727,20 +820,7 @@ class FoldingPanel(Panel):
         invisible.
         """
         self._clear_block_deco()
-        block = self.editor.document().firstBlock()
-        last = self.editor.document().lastBlock()
-        while block.isValid():
-            lvl = TextBlockHelper.get_fold_lvl(block)
-            trigger = TextBlockHelper.is_fold_trigger(block)
-            if trigger:
-                if lvl == 0:
-                    self._show_previous_blank_lines(block)
-                TextBlockHelper.set_collapsed(block, True)
-            block.setVisible(lvl == 0)
-            if block == last and block.text().strip() == '':
-                block.setVisible(True)
-                self._show_previous_blank_lines(block)
-            block = block.next()
+        FoldScope.fold_all(self.editor.document())
         self._refresh_editor_and_scrollbars()
         tc = self.editor.textCursor()
         tc.movePosition(tc.Start)
@@ -751,19 +831,17 @@ class FoldingPanel(Panel):
         """
         Clear the folded block decorations.
         """
-        for deco in self._block_decos:
-            self.editor.decorations.remove(deco)
-        self._block_decos[:] = []
+        with self.editor.decorations.batch():
+            for deco in self._block_decos.values():
+                self.editor.decorations.remove(deco)
+        self._block_decos.clear()
+        self._block_decos_moved = False
 
     def expand_all(self):
         """
         Expands all fold triggers.
         """
-        block = self.editor.document().firstBlock()
-        while block.isValid():
-            TextBlockHelper.set_collapsed(block, False)
-            block.setVisible(True)
-            block = block.next()
+        FoldScope.unfold_all(self.editor.document())
         self._clear_block_deco()
         self._refresh_editor_and_scrollbars()
         self.expand_all_triggered.emit()
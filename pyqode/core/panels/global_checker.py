@@ -12,33 +12,67 @@ class GlobalCheckerPanel(Panel):
 
     The user can click on a marker to quickly go the the error line.
 
+    The background and the messages are rendered in a cached pixmap that is
+    only rendered again when the messages, the number of lines, the size of
+    the panel or the editor background change. Only the visible area is
+    drawn on each paint.
     """
 
     def __init__(self):
         super(GlobalCheckerPanel, self).__init__()
         self.scrollable = True
-
-    def _draw_messages(self, painter):
+        # brush of each message color
+        self._brushes = {}
+        self._pixmap = None
+        self._pixmap_key = None
+        self._visible_area_color = None
+
+    def _get_brush(self, color):
+        try:
+            return self._brushes[color]
+        except KeyError:
+            brush = QtGui.QBrush(QtGui.QColor(color))
+            self._brushes[color] = brush
+            return brush
+        except TypeError:
+            # unhashable color
+            return QtGui.QBrush(QtGui.QColor(color))
+
+    def _draw_messages(self, painter, rect=None):
         """
-        Draw messages from all subclass of CheckerMode currently
-        installed on the editor.
+        Draw the messages of the checker modes that work on the editor
+        document.
+
+        Only the most severe message of each line is drawn, the messages
+        are taken from the :class:`pyqode.core.modes.CheckerMessageIndex`
+        of the document.
 
         :type painter: QtGui.QPainter
+        :param rect: the area to paint, None to paint the whole panel.
         """
-        checker_modes = []
-        for m in self.editor.modes:
-            if isinstance(m, modes.CheckerMode):
-                checker_modes.append(m)
-        for checker_mode in checker_modes:
-            for msg in checker_mode.messages:
-                block = msg.block
-                color = QtGui.QColor(msg.color)
-                brush = QtGui.QBrush(color)
-                rect = QtCore.QRect()
-                rect.setX(self.sizeHint().width() / 4)
-                rect.setY(block.blockNumber() * self.get_marker_height())
-                rect.setSize(self.get_marker_size())
-                painter.fillRect(rect, brush)
+        index = modes.CheckerMessageIndex.get(self.editor.document())
+        if index is None:
+            return
+        marker_height = self.get_marker_height()
+        size = self.get_marker_size()
+        if rect is None:
+            rect = self.rect()
+        start = max(0, int((rect.top() - size.height()) // marker_height))
+        end = int(rect.bottom() // marker_height) + 1
+        x = self.sizeHint().width() // 4
+        # several lines share the same marker when there are more lines than
+        # pixels: only the most severe message of each marker is drawn
+        markers = []
+        for line, message in index.query(start, end):
+            y = int(line * marker_height)
+            if markers and markers[-1][0] == y:
+                if message.status > markers[-1][1].status:
+                    markers[-1] = y, message
+            else:
+                markers.append((y, message))
+        for y, message in markers:
+            painter.fillRect(QtCore.QRect(x, y, size.width(), size.height()),
+                             self._get_brush(message.color))
 
     def _draw_visible_area(self, painter):
         """
@@ -53,15 +87,46 @@ class GlobalCheckerPanel(Panel):
             end = self.editor.visible_blocks[-1][-1]
             rect = QtCore.QRect()
             rect.setX(0)
-            rect.setY(start.blockNumber() * self.get_marker_height())
+            rect.setY(int(start.blockNumber() * self.get_marker_height()))
             rect.setWidth(self.sizeHint().width())
-            rect.setBottom(end.blockNumber() * self.get_marker_height())
-            if self.editor.background.lightness() < 128:
-                c = self.editor.background.darker(150)
+            rect.setBottom(int(end.blockNumber() * self.get_marker_height()))
+            painter.fillRect(rect, self._visible_area_color)
+
+    def _get_pixmap(self):
+        """
+        Returns the pixmap of the background and the messages, renders it
+        again if the messages, the number of lines, the panel size or the
+        editor background changed.
+        """
+        index = modes.CheckerMessageIndex.get(self.editor.document())
+        background = self.editor.background
+        try:
+            ratio = self.devicePixelRatioF()
+        except AttributeError:
+            # PyQt4/PySide
+            ratio = 1
+        key = (id(index), index.revision if index is not None else None,
+               self.editor.blockCount(), self.editor.viewport().height(),
+               self.size(), background.rgba(), ratio)
+        if key != self._pixmap_key:
+            self._pixmap_key = key
+            if ratio == 1:
+                pixmap = QtGui.QPixmap(self.size())
+            else:
+                pixmap = QtGui.QPixmap(self.size() * ratio)
+                pixmap.setDevicePixelRatio(ratio)
+            pixmap.fill(background)
+            painter = QtGui.QPainter(pixmap)
+            self._draw_messages(painter)
+            painter.end()
+            self._pixmap = pixmap
+            if background.lightness() < 128:
+                color = background.darker(150)
             else:
-                c = self.editor.background.darker(110)
-            c.setAlpha(128)
-            painter.fillRect(rect, c)
+                color = background.darker(110)
+            color.setAlpha(128)
+            self._visible_area_color = color
+        return self._pixmap
 
     def paintEvent(self, event):
         """
@@ -69,11 +134,9 @@ class GlobalCheckerPanel(Panel):
         :param event: paint event infos
         """
         if self.isVisible():
-            # fill background
-            self._background_brush = QtGui.QBrush(self.editor.background)
+            pixmap = self._get_pixmap()
             painter = QtGui.QPainter(self)
-            painter.fillRect(event.rect(), self._background_brush)
-            self._draw_messages(painter)
+            painter.drawPixmap(QtCore.QPoint(0, 0), pixmap)
             self._draw_visible_area(painter)
 
     def sizeHint(self):
@@ -97,7 +160,7 @@ class GlobalCheckerPanel(Panel):
         h = self.get_marker_height()
         if h < 1:
             h = 1
-        return QtCore.QSize(self.sizeHint().width() / 2, h)
+        return QtCore.QSize(self.sizeHint().width() // 2, int(h))
 
     def mousePressEvent(self, event):
         # Moves the editor text cursor to the clicked line.
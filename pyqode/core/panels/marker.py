@@ -6,7 +6,7 @@ import logging
 
 from pyqode.core.api import TextDecoration
 from pyqode.core.api.panel import Panel
-from pyqode.core.api.utils import DelayJobRunner, TextHelper
+from pyqode.core.api.utils import DelayJobRunner, PositionIndex, TextHelper
 from pyqode.qt import QtCore, QtWidgets, QtGui
 
 
@@ -117,6 +117,18 @@ class MarkerPanel(Panel):
         self._job_runner = DelayJobRunner(delay=100)
         self.setMouseTracking(True)
         self._to_remove = []
+        # markers indexed by the position of their block
+        self._positions = None
+
+    def on_install(self, editor):
+        super(MarkerPanel, self).on_install(editor)
+        self._positions = PositionIndex(editor, self._get_intervals)
+
+    def _get_intervals(self):
+        for marker in self._markers:
+            if marker.block.isValid():
+                position = marker.block.position()
+                yield position, position, marker
 
     @property
     def markers(self):
@@ -133,6 +145,7 @@ class MarkerPanel(Panel):
         :type marker: pyqode.core.modes.Marker
         """
         self._markers.append(marker)
+        self._positions.invalidate()
         doc = self.editor.document()
         assert isinstance(doc, QtGui.QTextDocument)
         block = doc.findBlockByLineNumber(marker._position)
@@ -153,6 +166,7 @@ class MarkerPanel(Panel):
         :type marker: pyqode.core.Marker
         """
         self._markers.remove(marker)
+        self._positions.invalidate()
         self._to_remove.append(marker)
         if hasattr(marker, 'decoration'):
             self.editor.decorations.remove(marker.decoration)
@@ -173,11 +187,12 @@ class MarkerPanel(Panel):
         :return: Marker of None
         :rtype: pyqode.core.Marker
         """
-        markers = []
-        for marker in self._markers:
-            if line == marker.position:
-                markers.append(marker)
-        return markers
+        if line is None:
+            return []
+        block = self.editor.document().findBlockByNumber(line)
+        if not block.isValid():
+            return []
+        return self._positions.at(block.position())
 
     def sizeHint(self):
         """
@@ -193,8 +208,8 @@ class MarkerPanel(Panel):
         Panel.paintEvent(self, event)
         painter = QtGui.QPainter(self)
         for top, block_nbr, block in self.editor.visible_blocks:
-            for marker in self._markers:
-                if marker.block == block and marker.icon:
+            for marker in self._positions.at(block.position()):
+                if marker.icon:
                     rect = QtCore.QRect()
                     rect.setX(0)
                     rect.setY(top)
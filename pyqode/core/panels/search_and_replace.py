@@ -82,13 +82,6 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
     #: Signal emitted when a search operation finished
     search_finished = QtCore.Signal()
 
-    #: Define the maximum number of occurences that can be highlighted
-    #: in the document.
-    #:
-    #: .. note:: The search operation itself is fast but the creation of all
-    #:    the extra selection used to highlight search result can be slow.
-    MAX_HIGHLIGHTED_OCCURENCES = 500
-
     @property
     def background(self):
         """ Text decoration background """
@@ -213,11 +206,12 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
         self.text_helper = TextHelper(editor)
 
     def _refresh_decorations(self):
-        for deco in self._decorations:
-            self.editor.decorations.remove(deco)
-            deco.set_background(QtGui.QBrush(self.background))
-            deco.set_outline(self._outline)
-            self.editor.decorations.append(deco)
+        with self.editor.decorations.batch():
+            for deco in self._decorations:
+                self.editor.decorations.remove(deco)
+                deco.set_background(QtGui.QBrush(self.background))
+                deco.set_outline(self._outline)
+                self.editor.decorations.append(deco)
 
     def on_state_changed(self, state):
         super(SearchAndReplacePanel, self).on_state_changed(state)
@@ -518,15 +512,52 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
         """
         Replaces all occurrences in the editor's document.
 
+        The new text is computed in one pass and applied as a single edit
+        (which can be undone in one step).
+
         :param text: The replacement text. If None, the content of the lineEdit
                      replace will be used instead
         """
-        cursor = self.editor.textCursor()
-        cursor.beginEditBlock()
-        remains = self.replace(text=text)
-        while remains:
-            remains = self.replace(text=text)
-        cursor.endEditBlock()
+        if text is None or isinstance(text, bool):
+            text = self.lineEditReplace.text()
+        if self._working:
+            QtCore.QTimer.singleShot(100, lambda: self.replace_all(text))
+            return
+        occurrences = self.get_occurences()
+        if not occurrences:
+            return
+        start = occurrences[0][0]
+        end = occurrences[-1][1]
+        content = self.editor.toPlainText()
+        chunks = []
+        pos = start
+        for occ_start, occ_end in occurrences:
+            chunks.append(content[pos:occ_start])
+            chunks.append(text)
+            pos = occ_end
+        new_text = ''.join(chunks)
+        # prevent search request due to editor textChanged
+        try:
+            self.editor.textChanged.disconnect(self.request_search)
+        except (RuntimeError, TypeError):
+            # already disconnected
+            pass
+        try:
+            cursor = self.editor.textCursor()
+            cursor.beginEditBlock()
+            cursor.setPosition(start)
+            cursor.setPosition(end, cursor.KeepAnchor)
+            cursor.insertText(new_text)
+            cursor.endEditBlock()
+            self.editor.setTextCursor(cursor)
+            self._clear_occurrences()
+            self._clear_decorations()
+            self._set_current_occurrence(-1)
+            self.cpt_occurences = 0
+            self._update_label_matches()
+            self._update_buttons()
+        finally:
+            self.editor.textChanged.connect(self.request_search)
 
     def eventFilter(self, obj, event):
         if event.type() == QtCore.QEvent.KeyPress:
@@ -604,12 +635,12 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
         self._working = False
         self._clear_decorations()
         all_occurences = self.get_occurences()
-        occurrences = all_occurences[:self.MAX_HIGHLIGHTED_OCCURENCES]
-        for i, occurrence in enumerate(occurrences):
-            deco = self._create_decoration(occurrence[0],
-                                           occurrence[1])
-            self._decorations.append(deco)
-            self.editor.decorations.append(deco)
+        with self.editor.decorations.batch():
+            for occurrence in all_occurences:
+                deco = self._create_decoration(occurrence[0],
+                                               occurrence[1])
+                self._decorations.append(deco)
+                self.editor.decorations.append(deco)
         self.cpt_occurences = len(all_occurences)
         if not self.cpt_occurences:
             self._current_occurrence_index = -1
@@ -637,8 +668,9 @@ class SearchAndReplacePanel(Panel, Ui_SearchPanel):
 
     def _clear_decorations(self):
         """ Remove all decorations """
-        for deco in self._decorations:
-            self.editor.decorations.remove(deco)
+        with self.editor.decorations.batch():
+            for deco in self._decorations:
+                self.editor.decorations.remove(deco)
         self._decorations[:] = []
 
     def _set_current_occurrence(self, current_occurence_index):
@@ -505,10 +505,6 @@ class BaseTabWidget(QtWidgets.QTabWidget):
         widget = self.widget(index)
         if widget is None:
             return
-        try:
-            document = widget.document()
-        except AttributeError:
-            document = None  # not a QPlainTextEdit
         clones = self._close_widget(widget)
         self.tab_closed.emit(widget)
         self.removeTab(index)
@@ -520,11 +516,6 @@ class BaseTabWidget(QtWidgets.QTabWidget):
             SplittableTabWidget.tab_under_menu = None
         if not clones:
             widget.setParent(None)
-        else:
-            try:
-                clones[0].syntax_highlighter.setDocument(document)
-            except AttributeError:
-                pass  # not a QPlainTextEdit
 
     def _on_split_requested(self):
         """
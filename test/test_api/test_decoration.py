@@ -5,6 +5,7 @@ This module tests the extension frontend module
 """
 from pyqode.core.api import TextHelper, TextDecoration
 from pyqode.qt import QtGui
+from pyqode.qt.QtTest import QTest
 from ..helpers import editor_open
 
 
@@ -74,3 +75,151 @@ def test_formats(editor):
     deco.set_as_error(QtGui.QColor('#FF0000'))
     deco.set_as_error()
     deco.set_as_warning()
+
+
+@editor_open(__file__)
+def test_batch(editor):
+    decos = []
+    for line in range(5):
+        deco = TextDecoration(editor.textCursor(), start_line=line,
+                              end_line=line)
+        decos.append(deco)
+    # the editor modes (e.g. the caret line highlighter) have their own
+    # decorations
+    nb_decos = len(editor.decorations)
+    nb_selections = len(editor.extraSelections())
+    with editor.decorations.batch():
+        for deco in decos:
+            editor.decorations.append(deco)
+        with editor.decorations.batch():
+            editor.decorations.remove(decos[0])
+        # the extra selections are only updated at the end of the outermost
+        # batch
+        assert len(editor.extraSelections()) == nb_selections
+    assert len(editor.decorations) == nb_decos + 4
+    assert len(editor.extraSelections()) == nb_selections + 4
+    editor.decorations.clear()
+
+
+@editor_open(__file__)
+def test_draw_order(editor):
+    decos = [TextDecoration(editor.textCursor(), start_line=i, end_line=i,
+                            draw_order=order)
+             for i, order in enumerate([2, 0, 1, 0, 2])]
+    # the editor modes (e.g. the caret line highlighter) have their own
+    # decorations
+    nb_selections = len(editor.extraSelections())
+    ids = set(id(deco) for deco in decos)
+    editor.decorations.append(decos[0])
+    editor.decorations.append(decos[1])
+    with editor.decorations.batch():
+        for deco in decos[2:]:
+            editor.decorations.append(deco)
+    # sorted by draw order, in insertion order for a same draw order
+    expected = [decos[1], decos[3], decos[2], decos[0], decos[4]]
+    ordered = [deco for deco in editor.decorations if id(deco) in ids]
+    assert len(ordered) == len(expected)
+    assert all(a is b for a, b in zip(ordered, expected))
+    assert decos[2] in editor.decorations
+    editor.decorations.remove(decos[2])
+    assert decos[2] not in editor.decorations
+    assert len(editor.extraSelections()) == nb_selections + 4
+    editor.decorations.clear()
+
+
+@editor_open(__file__)
+def test_containing(editor):
+    decos = [TextDecoration(editor.textCursor(), start_pos=start,
+                            end_pos=start + length, draw_order=i % 3)
+             for i, (start, length) in enumerate(
+                 [(0, 10), (5, 20), (8, 2), (40, 0), (40, 5), (100, 50)])]
+    with editor.decorations.batch():
+        for deco in decos:
+            editor.decorations.append(deco)
+
+    def check():
+        cursor = editor.textCursor()
+        for position in range(200):
+            cursor.setPosition(position)
+            expected = [deco for deco in editor.decorations
+                        if deco.contains_cursor(cursor)]
+            assert editor.decorations.containing(cursor) == expected
+
+    check()
+    assert editor.decorations.overlapping(30, 41) == [decos[3], decos[4]]
+    # the index is refreshed when the text and when the decorations change
+    cursor = editor.textCursor()
+    cursor.setPosition(7)
+    cursor.insertText('inserted text')
+    check()
+    editor.decorations.remove(decos[1])
+    check()
+    # single changes are merged with the index without rebuilding it
+    editor.decorations.append(decos[1])
+    editor.decorations.remove(decos[2])
+    check()
+    # the index is rebuilt once there are too many changes
+    more = [TextDecoration(editor.textCursor(), start_pos=i, end_pos=i + 3)
+            for i in range(0, 200, 2)]
+    for deco in more:
+        editor.decorations.append(deco)
+    check()
+    for deco in more[::2]:
+        editor.decorations.remove(deco)
+    check()
+    editor.document().undo()
+    editor.decorations.clear()
+
+
+@editor_open(__file__)
+def test_culling(editor):
+    manager = editor.decorations
+    manager.culling_threshold = 10
+    manager.margin = 5
+    try:
+        document = editor.document()
+        decos = [TextDecoration(document.findBlockByNumber(i))
+                 for i in range(document.blockCount())]
+        for deco in decos:
+            deco.set_full_width()
+        nb_decos = len(manager)
+        with manager.batch():
+            for deco in decos:
+                manager.append(deco)
+        # only the decorations around the visible blocks are pushed (the
+        # editor modes have their own decorations)
+        assert len(manager) == nb_decos + len(decos)
+        pushed = editor.extraSelections()
+        assert len(pushed) < len(decos)
+        first = editor.firstVisibleBlock().blockNumber()
+        assert pushed[0].cursor.blockNumber() == first
+        # the pushed decorations are refreshed when the editor is scrolled
+        # (once the view of the file that has just been opened is settled,
+        # e.g. the cursor position is restored)
+        QTest.qWait(100)
+        editor.verticalScrollBar().setValue(
+            editor.verticalScrollBar().maximum())
+        QTest.qWait(100)
+        last = editor.firstVisibleBlock().blockNumber()
+        assert last > first
+        numbers = [sel.cursor.blockNumber()
+                   for sel in editor.extraSelections()]
+        assert last in numbers and first not in numbers
+        # single changes only update the pushed decorations if they are
+        # in the pushed range
+        nb_pushed = len(editor.extraSelections())
+        manager.remove(decos[last])
+        assert len(editor.extraSelections()) == nb_pushed - 1
+        manager.remove(decos[first])
+        assert len(editor.extraSelections()) == nb_pushed - 1
+        manager.append(decos[first])
+        assert len(editor.extraSelections()) == nb_pushed - 1
+        manager.append(decos[last])
+        assert len(editor.extraSelections()) == nb_pushed
+        numbers = [sel.cursor.blockNumber()
+                   for sel in editor.extraSelections()]
+        assert last in numbers and first not in numbers
+    finally:
+        del manager.culling_threshold
+        del manager.margin
+        manager.clear()
@@ -178,3 +178,63 @@ class DynamicFoldDetectorTestCase(object):
 ])
 def test_fold_detection_dynamic(editor, case):
     case.execute(editor)
+
+
+def test_fold_index(editor):
+    editor.file.open('test/test_api/folding_cases/foo.py')
+    document = editor.document()
+    index = folding.FoldIndex.get(document)
+    assert index is not None
+    # perform a few edits, the index must follow the document
+    cursor = editor.textCursor()
+    cursor.setPosition(document.findBlockByNumber(5).position())
+    cursor.insertText('def spam():\n    pass\n\n' * 10)
+    cursor.setPosition(document.findBlockByNumber(2).position())
+    cursor.movePosition(cursor.Down, cursor.KeepAnchor, 8)
+    cursor.removeSelectedText()
+    assert index.up_to_date
+    levels = []
+    triggers = []
+    block = document.firstBlock()
+    while block.isValid():
+        levels.append(TextBlockHelper.get_fold_lvl(block))
+        triggers.append(TextBlockHelper.is_fold_trigger(block))
+        block = block.next()
+    nb_blocks = len(levels)
+    for line in range(nb_blocks):
+        for lvl in range(3):
+            assert index.fold_level(line) == levels[line]
+            expected = [i for i in range(line + 1, nb_blocks)
+                        if levels[i] <= lvl]
+            assert index.find_next_level(line, lvl) == (
+                expected[0] if expected else -1)
+            expected = [i for i in range(line + 1, nb_blocks)
+                        if triggers[i] and levels[i] <= lvl]
+            assert index.find_next_trigger(line, lvl) == (
+                expected[0] if expected else -1)
+            expected = [i for i in range(line)
+                        if triggers[i] and levels[i] <= lvl]
+            assert index.find_previous_trigger(line, lvl) == (
+                expected[-1] if expected else -1)
+
+
+def test_fold_all(editor):
+    editor.file.open('test/test_api/folding_cases/foo.py')
+    document = editor.document()
+    folding.FoldScope.fold_all(document)
+    block = document.firstBlock()
+    while block.blockNumber() < document.blockCount() - 1:
+        if TextBlockHelper.get_fold_lvl(block) > 0:
+            if block.text().strip():
+                assert not block.isVisible()
+        else:
+            assert block.isVisible()
+        if TextBlockHelper.is_fold_trigger(block):
+            assert TextBlockHelper.is_collapsed(block)
+        block = block.next()
+    folding.FoldScope.unfold_all(document)
+    block = document.firstBlock()
+    while block.isValid():
+        assert block.isVisible()
+        assert not TextBlockHelper.is_collapsed(block)
+        block = block.next()
@@ -1,5 +1,5 @@
 from pyqode.core.api import utils
-from pyqode.qt import QtWidgets, QtGui
+from pyqode.qt import QtCore, QtWidgets, QtGui
 from pyqode.qt.QtTest import QTest
 import time
 from pyqode.core.api import CodeEdit
@@ -24,6 +24,23 @@ def test_memoized():
     assert Memoized().memoized(None) == 2
 
 
+def test_lazy_list():
+    calls = []
+
+    def load():
+        calls.append(1)
+        return ['b', 'a']
+
+    lst = utils.LazyList(load)
+    assert not calls
+    assert 'a' in lst
+    assert len(lst) == 2
+    assert sorted(lst) == ['a', 'b']
+    lst += ['c']
+    assert lst[-1] == 'c'
+    assert len(calls) == 1
+
+
 def test_drift_color():
     assert utils.drift_color(QtGui.QColor("#FFFFFF")).name() == \
            QtGui.QColor("#e8e8e8").name()
@@ -54,6 +71,50 @@ def test_delay_job_runner():
     QTest.qWait(1000)
 
 
+def test_analysis_scheduler():
+    scheduler = utils.AnalysisScheduler()
+    visible = CodeEdit()
+    visible.show()
+    hidden = CodeEdit()
+    runs = []
+
+    class Mode(object):
+        pass
+
+    def make_job(mode, name, duration):
+        def job():
+            runs.append(name)
+            QtCore.QTimer.singleShot(
+                duration, lambda: scheduler.finished(mode))
+            return True
+        return job
+
+    mode, hidden_mode = Mode(), Mode()
+    scheduler.request(hidden_mode, hidden, make_job(hidden_mode, 'h', 10), 50)
+    scheduler.request(mode, visible, make_job(mode, 'a', 200), 50)
+    # hidden editors are analysed later
+    assert scheduler.delay(hidden_mode) > scheduler.delay(mode)
+    QTest.qWait(120)
+    assert runs == ['a']
+    assert scheduler.is_running(mode)
+    # requests made while the analysis is running are run once, after it
+    scheduler.request(mode, visible, make_job(mode, 'b', 10), 50)
+    scheduler.request(mode, visible, make_job(mode, 'c', 10), 50)
+    QTest.qWait(1000)
+    assert runs == ['a', 'h', 'c']
+    # the delay grows with the duration of the analysis
+    assert scheduler.latency(mode) >= 100
+    assert scheduler.delay(mode) >= 2 * scheduler.latency(mode) - 1
+    scheduler.request(mode, visible, make_job(mode, 'd', 10), 50)
+    scheduler.cancel(mode)
+    QTest.qWait(500)
+    assert runs == ['a', 'h', 'c']
+    visible.close()
+    hidden.close()
+    del visible
+    del hidden
+
+
 def test_block_helper():
     editor = CodeEdit()
     editor.file.open(__file__)
@@ -0,0 +1,121 @@
+import codecs
+import os
+import pytest
+from pyqode.core.backend import search
+from pyqode.core.backend import workers
+
+
+TEXT = 'import importable;\nimport os\n_import = Import(IMPORT)\nimport2'
+
+
+@pytest.mark.parametrize('sub, case_sensitive', [
+    ('import', True), ('import', False), ('Import', True), ('mport', False),
+    ('os', True)
+])
+def test_whole_word_same_as_noregex(sub, case_sensitive):
+    expected = list(workers.finditer_noregex(
+        TEXT if case_sensitive else TEXT.lower(),
+        sub if case_sensitive else sub.lower(), True))
+    results = [start for start, end in search.finditer(
+        TEXT, sub, case_sensitive=case_sensitive, whole_word=True)]
+    assert results == expected
+
+
+def test_escape_plain_text():
+    assert list(search.finditer('a.b axb a.b', 'a.b')) == [(0, 3), (8, 11)]
+    assert list(search.finditer('a.b axb', 'a.b', regex=True)) == [
+        (0, 3), (4, 7)]
+
+
+def test_pattern_cache():
+    search.clear_cache()
+    ptrn = search.compile_pattern('import', whole_word=True)
+    assert search.compile_pattern('import', whole_word=True) is ptrn
+    assert search.compile_pattern('import') is not ptrn
+    for i in range(search.CACHE_SIZE):
+        search.compile_pattern('word%d' % i)
+    assert len(search._cache) == search.CACHE_SIZE
+    # least recently used patterns are evicted
+    assert ('import', False, False, True) not in search._cache
+
+
+def test_max_results():
+    occurrences, total = search.search(TEXT, 'import', max_results=2)
+    assert occurrences == [(0, 6), (7, 13)]
+    assert total == 7
+    occurrences, total = search.search(TEXT, 'import', max_results=-1)
+    assert len(occurrences) == total == 7
+    occurrences, total = search.search(TEXT, 'import', whole_word=True,
+                                       max_results=3)
+    assert len(occurrences) == 3
+    assert total == 4
+    assert search.search(TEXT, '') == ([], 0)
+
+
+def test_findall_limited():
+    occurrences, total = workers.findall_limited({
+        'string': TEXT, 'sub': 'import', 'regex': False, 'whole_word': False,
+        'case_sensitive': True, 'max_results': 1})
+    assert occurrences == [(0, 6)]
+    assert total == 5
+
+
+def _make_tree(root):
+    root.join('a.py').write('import os\nfoo = 1\n\nimport sys  # import\n')
+    root.join('b.txt').write_binary(u'caf\xe9 import\r\n'.encode('cp1252'))
+    root.join('c.pyc').write('import')
+    root.join('bin.dat').write_binary(b'import\0\0')
+    sub = root.mkdir('sub')
+    sub.join('d.py').write_binary(codecs.BOM_UTF16_LE +
+                                  u'Import this'.encode('utf-16-le'))
+    root.mkdir('.git').join('config').write('import')
+
+
+def test_iter_files(tmpdir):
+    _make_tree(tmpdir)
+    names = [os.path.relpath(p, str(tmpdir))
+             for p in search.iter_files(str(tmpdir))]
+    assert names == ['a.py', 'b.txt', 'bin.dat', os.path.join('sub', 'd.py')]
+    names = [os.path.basename(p) for p in search.iter_files(
+        str(tmpdir), ignore_patterns=['*.py', 'sub'])]
+    assert names == ['b.txt', 'bin.dat', 'c.pyc', 'config']
+
+
+def test_read_file(tmpdir):
+    _make_tree(tmpdir)
+    assert search.read_file(str(tmpdir.join('bin.dat'))) == (None, None)
+    assert search.read_file(str(tmpdir.join('sub', 'd.py'))) == (
+        u'Import this', 'utf_16')
+    text, encoding = search.read_file(str(tmpdir.join('b.txt')),
+                                      encodings=['utf_8', 'cp1252'])
+    assert text == u'caf\xe9 import\n'
+    assert encoding == 'cp1252'
+
+
+def test_search_file(tmpdir):
+    _make_tree(tmpdir)
+    path = str(tmpdir.join('a.py'))
+    assert search.search_file(path, 'import', whole_word=True) == [
+        (path, 0, 0, 'import os'),
+        (path, 3, 0, 'import sys  # import'),
+        (path, 3, 14, 'import sys  # import')]
+    assert len(search.search_file(path, 'import', max_results=2)) == 2
+
+
+@pytest.mark.parametrize('processes', [0, 2])
+def test_find_in_files(tmpdir, processes):
+    _make_tree(tmpdir)
+    hits = []
+    for file_hits in search.find_in_files(
+            str(tmpdir), 'import', encodings=['utf_8', 'cp1252'],
+            processes=processes):
+        hits += file_hits
+    assert sorted((os.path.basename(h[0]), h[1], h[2]) for h in hits) == [
+        ('a.py', 0, 0), ('a.py', 3, 0), ('a.py', 3, 14), ('b.txt', 0, 5),
+        ('d.py', 0, 0)]
+    hits = []
+    for file_hits in search.find_in_files(str(tmpdir), 'import',
+                                          processes=processes,
+                                          max_results=2):
+        hits += file_hits
+    assert len(hits) == 2
@@ -29,8 +29,9 @@ def test_code_completion_worker():
     completion_groups = worker(data)
     context = completion_groups[0]
     completion_groups = completion_groups[1:]
-    line, column, req_id = context
+    line, column, req_id, incomplete = context
     assert req_id == 47
+    assert incomplete is False
     assert line == 1
     assert column == 0
     import logging
@@ -114,3 +115,49 @@ with open('test/files/foo.py', 'r') as f:
 def test_find_all(data, nb_expected):
     results = workers.findall(data)
     assert len(results) == nb_expected
+
+
+def test_find_in_files(tmpdir):
+    tmpdir.join('foo.py').write('import os\nimport sys\n')
+    tmpdir.mkdir('sub').join('bar.py').write('# import\n')
+    chunks = list(workers.findinfiles({
+        'root': str(tmpdir), 'sub': 'import', 'regex': False,
+        'whole_word': True, 'case_sensitive': False, 'processes': 0}))
+    assert chunks[-1]['done'] is True
+    hits = []
+    for chunk in chunks:
+        hits += chunk['hits']
+    assert len(hits) == 3
+    # the last chunk is flagged when the search fails
+    chunks = list(workers.findinfiles({
+        'root': str(tmpdir), 'sub': '(', 'regex': True,
+        'whole_word': False, 'case_sensitive': False, 'processes': 0}))
+    assert chunks[-1]['done'] is True
+    assert chunks[-1]['error'] is True
+
+
+def test_stream_generator_error():
+    from pyqode.core.backend.server import JsonServer
+    handler = JsonServer._Handler.__new__(JsonServer._Handler)
+    sent = []
+    handler.send = sent.append
+
+    def worker():
+        yield {'hits': [1], 'done': False}
+        yield {'hits': [2], 'done': False}
+        raise ValueError()
+
+    # the final results have the same shape as the partial ones
+    results, error = handler._stream('id', worker())
+    assert results == {'hits': [2], 'done': False}
+    assert error
+    assert sent == [{'request_id': 'id', 'results': {'hits': [1],
+                                                     'done': False},
+                     'partial': True}]
+
+    def failing_worker():
+        raise ValueError()
+        yield
+
+    with pytest.raises(ValueError):
+        handler._stream('id', failing_worker())
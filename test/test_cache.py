@@ -3,9 +3,10 @@ Test pyqode.core.settings
 """
 import os
 import locale
+import time
 import pytest
 from pyqode.core.api import convert_to_codec_key
-from pyqode.core.cache import Cache
+from pyqode.core.cache import Cache, HighlightCache
 
 
 def test_preferred_encodings():
@@ -31,3 +32,68 @@ def test_cached_encodings():
     s.set_file_encoding(__file__, 'utf_16')
     s = Cache(suffix='-pytest')
     assert s.get_file_encoding(__file__) == 'utf_16'
+
+
+def test_highlight_cache(tmpdir):
+    cache = HighlightCache(directory=str(tmpdir))
+    text = 'x = """\nfoo\n"""\n'
+    assert cache.load(text, 'lexer-1') is None
+    assert not cache.has_entry(text)
+    blocks = [
+        (0, ('root', 'tdqs'), ((0, 1, 'Token.Name'), (4, 3, 'Token.String'))),
+        (1 << 16, ('root', 'tdqs'), ((0, 3, 'Token.String'), )),
+        (0, None, ((0, 3, 'Token.String'), )),
+        (0, None, ()),
+    ]
+    cache.save(text, 'lexer-1', blocks)
+    assert cache.has_entry(text)
+    assert cache.load(text, 'lexer-1') == ('lexer-1', blocks)
+    assert cache.load(text + 'x', 'lexer-1') is None
+    # the entries of different highlighters don't overwrite each other
+    assert cache.load(text, 'lexer-2') is None
+    cache.save(text, 'lexer-2', blocks[:1])
+    assert cache.load(text, 'lexer-1') == ('lexer-1', blocks)
+    assert cache.load(text, 'lexer-2') == ('lexer-2', blocks[:1])
+
+
+def test_highlight_cache_invalid_entry(tmpdir):
+    cache = HighlightCache(directory=str(tmpdir))
+    cache.save('foo', 'lexer-1', [(0, None, ((0, 3, 'Token.Name'), ))])
+    path = os.path.join(str(tmpdir), HighlightCache.key('foo', 'lexer-1') + '.bin')
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:-4])
+    assert cache.load('foo', 'lexer-1') is None
+    assert not os.path.exists(path)
+
+
+def test_highlight_cache_eviction(tmpdir):
+    cache = HighlightCache(directory=str(tmpdir))
+    blocks = [(0, None, ((0, 3, 'Token.Name'), ))]
+    cache.save('foo', 'lexer-1', blocks)
+    path = os.path.join(str(tmpdir), HighlightCache.key('foo', 'lexer-1') + '.bin')
+    # too old
+    os.utime(path, (0, 0))
+    cache.evict()
+    assert cache.load('foo', 'lexer-1') is None
+    # too big, the least recently used entries are removed first
+    cache.save('foo', 'lexer-1', blocks)
+    os.utime(path, (0, time.time() - 10))
+    cache.max_size = os.path.getsize(path) + 1
+    cache.save('bar', 'lexer-1', blocks)
+    assert cache.load('foo', 'lexer-1') is None
+    assert cache.load('bar', 'lexer-1') is not None
+    cache.clear()
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_cached_fold_state():
+    s = Cache(suffix='-pytest')
+    s.clear()
+    assert s.get_fold_state(__file__) == []
+    s.set_fold_state(__file__, [(10, 1234), (42, 5678)])
+    s = Cache(suffix='-pytest')
+    assert s.get_fold_state(__file__) == [(10, 1234), (42, 5678)]
+    s.set_fold_state(__file__, [])
+    assert s.get_fold_state(__file__) == []
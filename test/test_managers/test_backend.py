@@ -6,6 +6,7 @@ from pyqode.qt import QtWidgets
 import pytest
 from pyqode.qt.QtTest import QTest
 from pyqode.core import backend
+from pyqode.core.backend import workers
 from pyqode.core.managers.backend import BackendManager
 from ..helpers import cwd_at, python2_path, server_path, wait_for_connected
 
@@ -22,6 +23,33 @@ def test_exit_code(editor):
     assert not editor.backend.running
 
 
+@editor_open(__file__)
+@ensure_connected
+def test_worker_error(editor):
+    received = []
+    errors = []
+
+    def on_receive(results):
+        received.append(results)
+
+    def on_error():
+        errors.append(received[-1])
+
+    # findall raises a KeyError (missing request data)
+    editor.backend.send_request(workers.findall, {}, on_receive=on_receive,
+                                on_error=on_error)
+    while not received:
+        QTest.qWait(10)
+    assert errors == [[]]
+    # no error notification for a worker that succeeds
+    editor.backend.send_request(backend.echo_worker, 'some data',
+                                on_receive=on_receive, on_error=on_error)
+    while len(received) < 2:
+        QTest.qWait(10)
+    assert received[-1] == 'some data'
+    assert errors == [[]]
+
+
 backend_manager = None
 
 
@@ -84,3 +84,40 @@ def test_preferred_encodings(editor, preferred_eol):
         print(f.read())
         assert f.newlines == editor.file.EOL.string(preferred_eol)
     os.remove(fn)
+
+
+def test_fold_state():
+    from pyqode.core.api import CodeEdit, IndentFoldDetector, TextBlockHelper
+    from pyqode.core import modes
+    editor = CodeEdit()
+    highlighter = editor.modes.append(modes.PygmentsSH(editor.document()))
+    highlighter.fold_detector = IndentFoldDetector()
+    panel = editor.panels.append(panels.FoldingPanel())
+    first = ('def a():\n'
+             '    try:\n'
+             '        x = 1\n'
+             '    except:\n'
+             '        pass\n')
+    second = ('def b():\n'
+              '    try:\n'
+              '        y = 2\n'
+              '    except:\n'
+              '        pass\n')
+    editor.setPlainText(first + '\n' + second, 'text/x-python', 'utf-8')
+    doc = editor.document()
+    panel.collapse([doc.findBlockByNumber(7)])
+    regions = editor.file._get_fold_state()
+    assert [line for line, _ in regions] == [7]
+    # the region moved (the file has been modified outside of the editor)
+    editor.setPlainText('import os\n\n' + second + '\n' + first,
+                        'text/x-python', 'utf-8')
+    editor.file._apply_fold_state(regions)
+    assert TextBlockHelper.is_collapsed(doc.findBlockByNumber(3))
+    assert not TextBlockHelper.is_collapsed(doc.findBlockByNumber(9))
+    # the region has been removed, the region that has the same trigger line
+    # must not be collapsed
+    editor.setPlainText(first, 'text/x-python', 'utf-8')
+    editor.file._apply_fold_state(regions)
+    assert not TextBlockHelper.is_collapsed(doc.findBlockByNumber(1))
+    editor.close()
+    del editor
@@ -70,6 +70,135 @@ def test_remove_message(editor):
     mode.clear_messages()
 
 
+@editor_open(__file__)
+def test_update_messages(editor):
+    mode = get_mode(editor)
+    mode.clear_messages()
+
+    def make_messages(lines):
+        return [modes.CheckerMessage('desc %d' % line,
+                                     modes.CheckerMessages.WARNING, line)
+                for line in lines]
+
+    mode.add_messages(make_messages(range(0, 20)))
+    assert mode._finished
+    kept = mode._messages[10]
+    # messages that are still reported are kept, the other ones are removed
+    # and the new ones added
+    mode.add_messages(make_messages(range(10, 30)) + make_messages([10]))
+    assert len(mode._messages) == 20
+    assert any(msg is kept for msg in mode._messages)
+    assert sorted(msg.line for msg in mode._messages) == list(range(10, 30))
+    block = editor.document().findBlockByNumber(10)
+    assert [msg.description for msg in block.userData().messages] == [
+        'desc 10']
+    assert len([deco for deco in editor.decorations
+                if deco.tooltip and deco.tooltip.startswith('desc')]) == 20
+    mode.clear_messages()
+    assert not mode._messages
+    assert not block.userData().messages
+
+
+@editor_open(__file__)
+def test_message_index(editor):
+    mode = get_mode(editor)
+    mode.clear_messages()
+    mode.add_messages([
+        modes.CheckerMessage('info', modes.CheckerMessages.INFO, 2),
+        modes.CheckerMessage('error', modes.CheckerMessages.ERROR, 2),
+        modes.CheckerMessage('warning', modes.CheckerMessages.WARNING, 5),
+        modes.CheckerMessage('info', modes.CheckerMessages.INFO, 20)])
+    index = modes.CheckerMessageIndex.get(editor.document())
+    assert [(line, msg.description) for line, msg in index.query(0, 10)] == [
+        (2, 'error'), (5, 'warning')]
+    assert index.count() == 4
+    assert index.count(modes.CheckerMessages.INFO) == 2
+    assert len(index.messages(2)) == 2
+    revision = index.revision
+    assert index.revision == revision
+    # the index follows the blocks
+    cursor = editor.textCursor()
+    cursor.setPosition(editor.document().findBlockByNumber(3).position())
+    cursor.insertText('\n\n')
+    assert index.revision != revision
+    assert [line for line, _ in index.query()] == [2, 7, 22]
+    editor.document().undo()
+    assert [line for line, _ in index.query()] == [2, 5, 20]
+    mode.clear_messages()
+    assert not index.query()
+    assert index.count() == 0
+
+
+def test_message_index_lifetime():
+    import gc
+    from pyqode.core.api import CodeEdit
+    editor = CodeEdit()
+    mode = modes.CheckerMode(check)
+    editor.modes.append(mode)
+    editor.setPlainText('a = 1\nb = 2\nc = 3\n', 'text/x-python', 'utf-8')
+    mode.add_messages([
+        modes.CheckerMessage('error', modes.CheckerMessages.ERROR, 1)])
+    # the index must outlive the python wrapper of the document
+    gc.collect()
+    index = modes.CheckerMessageIndex.get(editor.document())
+    assert index is not None
+    assert index.count() == 1
+    editor.close()
+    del editor
+
+
+@editor_open(__file__)
+def test_changed_regions(editor):
+    mode = get_mode(editor)
+    mode._changed_regions = []
+    version = mode._version
+    cursor = editor.textCursor()
+    cursor.setPosition(editor.document().findBlockByNumber(10).position())
+    cursor.insertText('foo')
+    assert mode._version > version
+    assert mode._changed_regions == [[10, 10]]
+    cursor.setPosition(editor.document().findBlockByNumber(20).position())
+    cursor.insertText('foo\nbar\n')
+    assert mode._changed_regions == [[10, 10], [20, 22]]
+    # the regions that follow a change are shifted
+    cursor.setPosition(editor.document().findBlockByNumber(2).position())
+    cursor.insertText('\n')
+    assert mode._changed_regions == [[2, 3], [11, 11], [21, 23]]
+    for _ in range(3):
+        editor.document().undo()
+    assert mode._changed_regions == [[2, 2], [10, 10], [20, 20]]
+
+
+@editor_open(__file__)
+def test_incremental_results(editor):
+    mode = get_mode(editor)
+    mode.clear_messages()
+    mode._request_version = mode._version
+    mode._on_work_finished([('desc', 1, line) for line in (2, 5, 10)])
+    assert mode._changed_regions == []
+    kept = mode._messages[0]
+    cursor = editor.textCursor()
+    cursor.setPosition(editor.document().findBlockByNumber(0).position())
+    cursor.insertText('\n')
+    assert mode._changed_regions == [[0, 1]]
+    # outdated results are discarded
+    mode._on_work_finished({'regions': [[0, 1]], 'messages': []})
+    assert len(mode._messages) == 3
+    assert mode._changed_regions == [[0, 1]]
+    # messages of the checked regions are replaced, the other ones are kept
+    mode._request_version = mode._version
+    mode._on_work_finished({'regions': [[0, 1], [5, 8]],
+                            'messages': [('new', 2, 1), ('new', 2, 7)]})
+    assert sorted((msg.block.blockNumber(), msg.description)
+                  for msg in mode._messages) == [
+        (1, 'new'), (3, 'desc'), (7, 'new'), (11, 'desc')]
+    assert any(msg is kept for msg in mode._messages)
+    assert mode._changed_regions == []
+    editor.document().undo()
+    mode.clear_messages()
+    assert mode._changed_regions is None
+
+
 @editor_open(__file__)
 def test_work_finished(editor):
     mode = get_mode(editor)
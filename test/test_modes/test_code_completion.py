@@ -10,6 +10,8 @@ from pyqode.qt.QtTest import QTest
 from pyqode.core.api import TextHelper
 from pyqode.core import modes
 from pyqode.core.modes.code_completion import SubsequenceCompleter
+from pyqode.core.modes.code_completion import CompletionListModel
+from pyqode.core.modes.code_completion import CompletionSession
 from ..helpers import server_path, wait_for_connected
 from ..helpers import ensure_visible, ensure_connected
 
@@ -228,3 +230,51 @@ def test_subsequence_completer(case):
         completer.setCompletionPrefix('action')
         completer.update_model()
         assert completer.completionCount() == 2
+
+
+def test_completion_list_model():
+    model = CompletionListModel()
+    icon = ':/pyqode-icons/rc/edit-undo.png'
+    model.set_completions([{'name': 'foo', 'icon': icon},
+                           {'name': 'bar', 'icon': icon},
+                           {'name': 'spam'}])
+    assert model.rowCount() == 3
+    assert model.data(model.index(1)) == 'bar'
+    assert model.data(model.index(2), QtCore.Qt.DecorationRole) is None
+    # icons are cached by name
+    assert model.data(model.index(0), QtCore.Qt.DecorationRole) is \
+        model.data(model.index(1), QtCore.Qt.DecorationRole)
+    assert model.setData(model.index(0), 5, QtCore.Qt.UserRole)
+    assert model.data(model.index(0), QtCore.Qt.UserRole) == 5
+    # reset in place
+    model.set_completions([{'name': 'eggs'}])
+    assert model.rowCount() == 1
+    assert model.data(model.index(0)) == 'eggs'
+    assert model.data(model.index(0), QtCore.Qt.UserRole) == 0
+
+
+def test_completion_session():
+    session = CompletionSession()
+    assert not session.accepts(0, 0, 'a')
+    session.start(3, 4, 'se', request_id=0)
+    assert session.pending
+    assert session.accepts(3, 4, 'set')
+    session.set_results([{'name': 'setText'}, {'name': 'setToolTip'},
+                         {'name': 'selection'}, {'name': 'SetTip'}])
+    assert not session.pending
+    # prefix is growing, candidates are narrowed locally
+    assert session.accepts(3, 4, 'setT')
+    assert len(session.narrow('setT')) == 3
+    assert len(session.narrow('setT', case_sensitive=True)) == 2
+    assert [c['name'] for c in session.narrow('sttp')] == ['setToolTip',
+                                                           'SetTip']
+    # going back to a shorter prefix uses the full candidate set
+    assert len(session.narrow('se')) == 4
+    # context changes
+    assert not session.accepts(3, 5, 'set')
+    assert not session.accepts(4, 4, 'set')
+    assert not session.accepts(3, 4, 's')
+    session.set_results([{'name': 'setText'}], incomplete=True)
+    assert not session.accepts(3, 4, 'set')
+    session.reset()
+    assert not session.accepts(3, 4, 'set')
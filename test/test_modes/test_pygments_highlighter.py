@@ -20,6 +20,29 @@ def test_lexer_from_filename_tmp_file(editor):
     mode.set_lexer_from_filename("file.py~")
 
 
+def test_lexer_class_lookup():
+    from pygments.util import ClassNotFound
+    from pyqode.core.modes import pygments_sh
+    cls = pygments_sh.get_lexer_class_for_filename('foo.py')
+    assert cls.__name__ == 'PythonLexer'
+    # memoized by extension
+    assert pygments_sh.get_lexer_class_for_filename('/tmp/bar.py') is cls
+    # file names that are not simple extensions
+    assert pygments_sh.get_lexer_class_for_filename(
+        'Makefile').__name__ == 'MakefileLexer'
+    assert pygments_sh.get_lexer_class_for_filename(
+        'CMakeLists.txt').__name__ == 'CMakeLexer'
+    assert pygments_sh.get_lexer_class_for_mimetype(
+        'application/json').__name__ == 'JsonLexer'
+    for _ in range(2):
+        try:
+            pygments_sh.get_lexer_class_for_filename('foo.unknown_ext')
+        except ClassNotFound:
+            pass
+        else:
+            assert False
+
+
 @editor_open(__file__)
 def test_apply_all_pygments_styles(editor):
     mode = get_mode(editor)
@@ -27,3 +50,221 @@ def test_apply_all_pygments_styles(editor):
         mode.pygments_style = style
         assert mode.pygments_style == style
         QTest.qWait(500)
+
+
+@editor_open(__file__)
+def test_lazy_highlighting(editor):
+    mode = get_mode(editor)
+    progress = []
+    mode.highlighting_progress.connect(progress.append)
+    mode.lazy_threshold = 10
+    try:
+        editor.setPlainText(editor.toPlainText(), 'text/x-python', 'utf-8')
+        assert mode.lazy_highlighting_in_progress
+        # the last block is not visible, it is not highlighted yet
+        block = editor.document().lastBlock().previous()
+        assert not block.layout().formats()
+        while mode.lazy_highlighting_in_progress:
+            QTest.qWait(10)
+        assert progress[-1] == 100
+        assert block.layout().formats()
+    finally:
+        mode.lazy_threshold = 10000
+
+
+def test_lazy_highlighting_shifted_blocks():
+    from pyqode.core.api import CodeEdit
+    editor = CodeEdit()
+    editor.resize(800, 600)
+    highlighter = editor.modes.append(modes.PygmentsSH(editor.document()))
+    highlighter.lazy_threshold = 10
+    highlighter.background_tokenization = False
+    editor.setPlainText('x = 1\n' * 500, 'text/x-python', 'utf-8')
+    # highlight the visible blocks only
+    highlighter._lazy_timer.stop()
+    highlighter._update_viewport()
+    highlighter._highlight_viewport()
+    first, last = highlighter._viewports[0]
+    doc = editor.document()
+    assert not doc.findBlockByNumber(last + 1).layout().formats()
+    # remove lines above the viewport end: blocks that were not visible are
+    # now visible, they have the numbers of highlighted blocks
+    cursor = editor.textCursor()
+    cursor.setPosition(0)
+    cursor.setPosition(doc.findBlockByNumber(5).position(),
+                       cursor.KeepAnchor)
+    cursor.removeSelectedText()
+    highlighter._on_viewport_changed()
+    for nbr in range(first, last + 1):
+        assert doc.findBlockByNumber(nbr).layout().formats()
+    highlighter._stop_lazy_highlighting()
+    editor.close()
+    del editor
+
+
+def test_lazy_highlighting_deferred_blocks():
+    from pyqode.core.api import CodeEdit
+    editor = CodeEdit()
+    editor.resize(800, 600)
+    highlighter = editor.modes.append(modes.PygmentsSH(editor.document()))
+    highlighter.lazy_threshold = 10
+    highlighter.background_tokenization = False
+    editor.setPlainText('x = 1\n' * 500, 'text/x-python', 'utf-8')
+    highlighter._lazy_timer.stop()
+    # highlight a block ahead of the frontier (as if it had been visible)
+    nbr = 400
+    doc = editor.document()
+    block = doc.findBlockByNumber(nbr)
+    highlighter._viewports = [(nbr, nbr)]
+    highlighter._highlight_viewport()
+    highlighter._update_viewport()
+    assert nbr in highlighter._highlighted_ahead
+    formats = block.layout().formats()
+    assert formats
+    # rehighlighting the block (e.g. from another mode) keeps its formats
+    highlighter.rehighlightBlock(block)
+    assert block.layout().formats() == formats
+    assert nbr in highlighter._highlighted_ahead
+    # editing the block clears them until the block is highlighted again
+    cursor = editor.textCursor()
+    cursor.setPosition(block.position())
+    cursor.insertText('y')
+    assert not block.layout().formats()
+    assert nbr not in highlighter._highlighted_ahead
+    highlighter._viewports = [(nbr, nbr)]
+    highlighter._highlight_viewport()
+    assert block.layout().formats()
+    highlighter._stop_lazy_highlighting()
+    editor.close()
+    del editor
+
+
+def test_tokenize():
+    from pygments.lexers import PythonLexer
+    from pygments.token import Token
+    from pyqode.core.modes.pygments_sh import tokenize
+    lexer = PythonLexer()
+    runs, stack = tokenize(lexer, 'x = """')
+    assert runs[0] == (0, 1, Token.Name)
+    assert stack[-1] != 'root'
+    # resume from the saved state
+    runs, stack = tokenize(lexer, 'end of string"""', stack)
+    assert stack == ('root', )
+    # whitespaces are split out of the string token (the last run is the
+    # newline added by pygments)
+    assert [run[:2] for run in runs] == [(0, 3), (3, 1), (4, 2), (6, 1),
+                                         (7, 9), (16, 1)]
+    assert runs[1][2] == runs[3][2] == Token.Text.Whitespace
+
+
+def test_background_tokenizer():
+    from pygments.lexers import PythonLexer
+    from pyqode.core.modes.pygments_sh import (
+        BackgroundTokenizer, tokenize, _text_key)
+    lexer = PythonLexer()
+    lines = ['def foo():', '    """', '    doc', '    """'] * 100
+    chunks = []
+    tokenizer = BackgroundTokenizer()
+    tokenizer.tokenized.connect(
+        lambda job_id, first, chunk: chunks.append((job_id, first, chunk)))
+    job_id = tokenizer.start(lexer, lines)
+    while sum(len(c[2]) for c in chunks) < len(lines):
+        QTest.qWait(10)
+    tokenizer.stop()
+    assert [c[1] for c in chunks] == [0, BackgroundTokenizer.CHUNK_SIZE]
+    stack = None
+    results = [tokens for _, _, chunk in chunks for tokens in chunk]
+    for text, (key, start_stack, runs, end_stack) in zip(lines, results):
+        # the text itself is not sent back to the GUI thread
+        assert key == _text_key(text)
+        assert start_stack == stack
+        assert (runs, end_stack) == tokenize(lexer, text, stack)
+        stack = end_stack
+
+
+def test_state_propagation():
+    from pyqode.core.api import CodeEdit, TextBlockHelper
+    editor = CodeEdit()
+    editor.modes.append(modes.PygmentsSH(editor.document()))
+    editor.setPlainText('a = 1\nb = 2\nc = 3\n', 'text/x-python', 'utf-8')
+    doc = editor.document()
+    default = TextBlockHelper.get_state(doc.findBlockByNumber(1))
+    cursor = editor.textCursor()
+    cursor.setPosition(0)
+    cursor.insertText('"""')
+    # the string state has been propagated to the next blocks
+    assert TextBlockHelper.get_state(doc.findBlockByNumber(0)) != default
+    assert TextBlockHelper.get_state(doc.findBlockByNumber(2)) != default
+    cursor.setPosition(doc.findBlockByNumber(1).position())
+    cursor.insertText('"""')
+    assert TextBlockHelper.get_state(doc.findBlockByNumber(1)) == default
+    assert TextBlockHelper.get_state(doc.findBlockByNumber(2)) == default
+    editor.close()
+    del editor
+
+
+def test_state_ids_reset():
+    from pyqode.core.api import CodeEdit
+    from pyqode.core.modes.pygments_sh import tokenize
+    editor = CodeEdit()
+    highlighter = editor.modes.append(modes.PygmentsSH(editor.document()))
+    # a single lexer state id (besides the default state) per generation
+    highlighter.MAX_STATE_ID = 2
+    editor.setPlainText('a = 1\nb = 2\nc = 3\nd = 4\n', 'text/x-python',
+                        'utf-8')
+    doc = editor.document()
+
+    def check():
+        stack = None
+        block = doc.firstBlock()
+        while block.isValid():
+            stack = tokenize(highlighter._lexer, block.text(), stack)[1]
+            assert block.userData().syntax_stack == stack
+            block = block.next()
+
+    cursor = editor.textCursor()
+    cursor.setPosition(0)
+    cursor.insertText('"""')
+    check()
+    # the new state gets a reassigned id, it must still be propagated to the
+    # next blocks
+    cursor.setPosition(0)
+    cursor.setPosition(3, cursor.KeepAnchor)
+    cursor.insertText("'''")
+    check()
+    cursor.setPosition(0)
+    cursor.setPosition(3, cursor.KeepAnchor)
+    cursor.insertText('"""')
+    check()
+    editor.close()
+    del editor
+
+
+def test_shared_highlighting():
+    from pyqode.core.api import CodeEdit
+
+    class Editor(CodeEdit):
+        def __init__(self, parent=None):
+            super(Editor, self).__init__(parent)
+            self.modes.append(modes.PygmentsSH(self.document()))
+
+    original = Editor()
+    original.setPlainText('a = 1\nb = """\nc = 3\n"""\n', 'text/x-python',
+                          'utf-8')
+    clone = original.split()
+    highlighter = original.syntax_highlighter
+    view = clone.syntax_highlighter
+    # the document is highlighted once, by the highlighter of the original
+    assert view.document_highlighter is highlighter
+    assert view.document() is None
+    # settings changed from a view apply to the document
+    view.pygments_style = 'monokai'
+    assert highlighter.pygments_style == 'monokai'
+    # the clone takes over when the original is closed
+    original.close()
+    assert view.document_highlighter is view
+    assert view.document() is clone.document()
+    QTest.qWait(100)
+    block = clone.document().findBlockByNumber(2)
+    assert block.layout().additionalFormats()
+    clone.close()